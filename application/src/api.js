@@ -1,5 +1,40 @@
 const API_BASE_URL = 'http://127.0.0.1:8000';
 
+const NOTE_NAMES = ['-', 'In Scale', 'Wrong Note'];
+
+// Decode a binary /ws/metrics frame (layout: metrics_hub.BINARY_FRAME, little-endian)
+function decodeMetricsFrame(buffer) {
+  const view = new DataView(buffer);
+  const float = (offset) => {
+    const value = view.getFloat32(offset, true);
+    return Number.isNaN(value) ? null : value;
+  };
+  const pitchClass = view.getInt8(37);
+  const inScale = view.getUint8(38);
+  return {
+    seq: view.getUint32(0, true),
+    current_note: NOTE_NAMES[view.getUint8(4)] || '-',
+    pitch_accuracy: float(5),
+    scale_conformity: float(9),
+    timing_stability: float(13),
+    debug_info: {
+      detected_hz: float(17),
+      detected_midi: float(21),
+      raw_pitch: float(25),
+      raw_timing: float(29),
+      scale_coverage: float(33),
+      pitch_class: pitchClass < 0 ? null : pitchClass,
+      in_scale: inScale === 255 ? null : inScale === 1,
+      notes_played_count: view.getUint32(39, true),
+      unique_notes_used: view.getUint16(43, true),
+      scale_total_notes: view.getUint16(45, true),
+      notes_for_timing_analysis: view.getUint16(47, true),
+      correct_notes: view.getUint32(49, true),
+      wrong_notes: view.getUint32(53, true),
+    },
+  };
+}
+
 export const api = {
   // Health check endpoint
   async healthCheck() {
@@ -86,13 +121,34 @@ export const api = {
     return response.json();
   },
 
-  // WebSocket for real-time metrics
-  connectWebSocket(onMessage) {
-    const ws = new WebSocket(`ws://127.0.0.1:8000/ws/metrics`);
-    
+  // WebSocket for real-time metrics. The server pushes a snapshot followed by
+  // deltas (or full binary frames with binary: true); onMessage always
+  // receives the full merged metrics object.
+  connectWebSocket(onMessage, { binary = false } = {}) {
+    const ws = new WebSocket(`ws://127.0.0.1:8000/ws/metrics?format=${binary ? 'binary' : 'json'}`);
+    if (binary) {
+      ws.binaryType = 'arraybuffer';
+    }
+
+    let metrics = { debug_info: {} };
     ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      onMessage(data);
+      if (binary) {
+        metrics = decodeMetricsFrame(event.data);
+      } else {
+        const message = JSON.parse(event.data);
+        if (message.type === 'snapshot') {
+          metrics = message.data;
+        } else {
+          const { debug_info, ...changed } = message.data;
+          metrics = {
+            ...metrics,
+            ...changed,
+            debug_info: debug_info ? { ...metrics.debug_info, ...debug_info } : metrics.debug_info,
+          };
+        }
+        metrics.seq = message.seq;
+      }
+      onMessage(metrics);
     };
 
     ws.onerror = (error) => {
@@ -8,7 +8,7 @@ from fastapi import APIRouter, HTTPException
 from typing import Dict, Any
 from datetime import datetime
 
-from ..services.ai_agent_service import get_ai_practice_session, engine
+from ..services.ai_agent_service import get_ai_practice_session, engine, NOTIFY_USER_SQL
 from sqlalchemy import text
 
 router = APIRouter()
@@ -141,13 +141,16 @@ async def mark_plan_executed(practice_id: str, session_id: str) -> Dict[str, Any
             UPDATE fretcoach.ai_practice_plans
             SET executed_session_id = :session_id
             WHERE practice_id = :practice_id
+            RETURNING user_id
         """)
 
         with engine.begin() as conn:
-            conn.execute(query, {
+            updated = conn.execute(query, {
                 "practice_id": practice_id,
                 "session_id": session_id
             })
+            for row in updated.fetchall():
+                conn.execute(NOTIFY_USER_SQL, {"user_id": row.user_id})
 
         return {
             "success": True,
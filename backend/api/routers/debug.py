@@ -0,0 +1,62 @@
+"""
+Debug endpoints for FretCoach API.
+"""
+
+from fastapi import APIRouter
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
+
+from perf import get_profiler
+import db_pool
+from smart_bulb import get_bulb_actor
+
+from ..services.live_coach_service import feedback_cache, clip_cache
+
+router = APIRouter()
+
+
+@router.get("/debug/perf")
+async def get_perf():
+    """Per-stage latency percentiles (ms) for the analysis loop."""
+    profiler = get_profiler()
+    return {
+        "enabled": profiler.enabled,
+        "stages": profiler.snapshot(),
+    }
+
+
+@router.post("/debug/perf")
+async def set_perf(enabled: bool = True, reset: bool = False):
+    """Enable/disable frame profiling and optionally clear the histograms."""
+    profiler = get_profiler()
+    profiler.set_enabled(enabled)
+    if reset:
+        profiler.reset()
+    return {"enabled": profiler.enabled}
+
+
+@router.get("/debug/db")
+async def get_db_health():
+    """Round-trip check through the shared connection pool, plus pool occupancy."""
+    return db_pool.check_health()
+
+
+@router.get("/debug/bulb")
+async def get_bulb_stats():
+    """Smart bulb actor counters and command latency."""
+    return get_bulb_actor().stats()
+
+
+@router.get("/debug/feedback-cache")
+async def get_feedback_cache_stats():
+    """Live coaching feedback cache hits, misses and coalesced requests."""
+    return feedback_cache.stats()
+
+
+@router.get("/debug/tts-cache")
+async def get_tts_cache_stats():
+    """Synthesised speech clip cache size and hit counters."""
+    return clip_cache.stats()
@@ -13,7 +13,7 @@ from ..services.live_coach_service import (
     generate_and_play_tts,
     stop_audio_playback
 )
-from ..services.config_service import load_user_session_config
+from ..services.config_service import get_user_session_config_cached
 
 router = APIRouter(prefix="/live-coach", tags=["live-coach"])
 
@@ -58,8 +58,8 @@ async def get_coaching_feedback(request: CoachingRequest):
     Returns specific, actionable feedback to help the guitarist improve.
     """
     try:
-        # Load user-specific session config for enabled metrics
-        session_config = load_user_session_config(request.user_id)
+        # Load user-specific session config for enabled metrics (cached briefly)
+        session_config = get_user_session_config_cached(request.user_id)
         enabled_metrics = session_config.get("enabled_metrics", {
             "pitch_accuracy": True,
             "scale_conformity": True,
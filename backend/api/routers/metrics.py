@@ -7,6 +7,7 @@ import asyncio
 
 from ..models import SessionMetrics
 from ..state import session_state
+from ..services.metrics_hub import metrics_hub
 
 router = APIRouter()
 
@@ -26,20 +27,49 @@ async def get_metrics():
 
 
 @router.websocket("/ws/metrics")
-async def websocket_metrics(websocket: WebSocket):
-    """WebSocket endpoint for real-time metrics updates."""
+async def websocket_metrics(websocket: WebSocket, format: str = "json"):
+    """
+    WebSocket endpoint for real-time metrics updates.
+
+    Pushes as soon as the analysis loop publishes a changed result (no polling).
+    With format=json (default) the first message is
+    {"type": "snapshot", "seq", "data"} and later ones are
+    {"type": "delta", "seq", "data"} carrying only changed fields (debug_info
+    fields are merged one level deep); a client that skipped a sequence number
+    is sent a new snapshot. With format=binary every message is a
+    metrics_hub.BINARY_FRAME with the full state.
+    """
     await websocket.accept()
+    subscriber = metrics_hub.subscribe(binary=format == "binary")
+    # Notice disconnects while idle (between sessions nothing is published)
+    reader = asyncio.create_task(_wait_for_disconnect(websocket, subscriber))
+    try:
+        while True:
+            await subscriber.event.wait()
+            subscriber.event.clear()
+            if subscriber.closed:
+                break
+            message = metrics_hub.next_message(subscriber)
+            if message is None:
+                continue
+            if subscriber.binary:
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        metrics_hub.unsubscribe(subscriber)
+        reader.cancel()
+
+
+async def _wait_for_disconnect(websocket: WebSocket, subscriber) -> None:
+    """Drain client messages until the socket closes, then wake the sender to exit."""
     try:
         while True:
-            if session_state.is_running:
-                metrics = {
-                    "current_note": session_state.current_note,
-                    "pitch_accuracy": session_state.pitch_accuracy,
-                    "scale_conformity": session_state.scale_conformity,
-                    "timing_stability": session_state.timing_stability,
-                    "debug_info": session_state.debug_info.to_dict(),
-                }
-                await websocket.send_json(metrics)
-            await asyncio.sleep(0.1)  # Update 10 times per second
-    except WebSocketDisconnect:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except Exception:
         pass
+    subscriber.close()
@@ -3,6 +3,9 @@ FastAPI server for FretCoach
 Provides REST API endpoints for the Electron app to communicate with the Python backend
 """
 
+import asyncio
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -11,7 +14,8 @@ from opik import configure
 configure()
 print("[Opik] Configured successfully")
 
-from .routers import devices, config, session, metrics, scales, ai_mode, live_coach
+from .routers import devices, config, session, metrics, scales, ai_mode, live_coach, debug
+from .services.live_coach_service import warm_tts_cache
 
 app = FastAPI(title="FretCoach API")
 
@@ -33,6 +37,17 @@ app.include_router(scales.router, tags=["scales"])
 app.include_router(ai_mode.router, tags=["ai"])
 app.include_router(live_coach.router, tags=["live-coach"])
 
+# Profiler and cache introspection (POST /debug/perf toggles profiling), opt-in only
+if os.getenv("FRETCOACH_DEBUG_API", "0") == "1":
+    app.include_router(debug.router, tags=["debug"])
+
+
+@app.on_event("startup")
+async def start_tts_warmup():
+    """Pre-synthesise fixed coaching phrases in the background (opt-in with TTS_WARMUP=1)."""
+    if os.getenv("TTS_WARMUP", "0") == "1":
+        app.state.tts_warmup = asyncio.create_task(warm_tts_cache())
+
 
 @app.get("/")
 async def root():
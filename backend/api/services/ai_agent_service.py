@@ -8,16 +8,23 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 import uuid
 from dotenv import load_dotenv, find_dotenv
 
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 # Import Opik for tracking with LangChain integration
 from opik.integrations.langchain import OpikTracer
 
+# Add core directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
+
+from db_pool import get_engine
+from metric_writer import NOTIFY_CHANNEL
+
 # Load environment variables
 load_dotenv(find_dotenv())
 
@@ -25,16 +32,12 @@ load_dotenv(find_dotenv())
 DEPLOYMENT_TYPE = os.getenv("DEPLOYMENT_TYPE", "fretcoach-studio")  # Default to studio
 DEPLOYMENT_PREFIX = "studio" if "studio" in DEPLOYMENT_TYPE.lower() else "portable"
 
-# Get PostgreSQL credentials from environment
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
+# Shared SQLAlchemy engine (one connection pool per process, see core/db_pool.py)
+engine = get_engine()
 
-# Create SQLAlchemy engine (reusable connection pool)
-db_uri = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(db_uri, pool_pre_ping=True)
+# Practice plan writes are announced like session writes, so the web agent's
+# query cache drops that user's results (delivered on commit)
+NOTIFY_USER_SQL = text(f"SELECT pg_notify('{NOTIFY_CHANNEL}', :user_id)")
 
 # Initialize LLM - single instance
 MODEL_NAME = "gpt-4o-mini"
@@ -209,18 +212,18 @@ def get_recent_sessions(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
 def get_session_aggregates(user_id: str) -> Dict[str, Any]:
     """
     Get aggregate statistics across all user sessions.
-    Direct SQL query - no LLM needed.
+    Direct SQL query over the daily rollups - no LLM needed.
     """
     query = text("""
         SELECT
-            COUNT(*) as total_sessions,
-            AVG(pitch_accuracy) as avg_pitch_accuracy,
-            AVG(scale_conformity) as avg_scale_conformity,
-            AVG(timing_stability) as avg_timing_stability,
-            SUM(total_notes_played) as total_notes,
-            SUM(correct_notes_played) as total_correct,
-            SUM(bad_notes_played) as total_bad
-        FROM fretcoach.sessions
+            COALESCE(SUM(session_count), 0) as total_sessions,
+            SUM(pitch_sum) / NULLIF(SUM(pitch_count), 0) as avg_pitch_accuracy,
+            SUM(scale_sum) / NULLIF(SUM(scale_count), 0) as avg_scale_conformity,
+            SUM(timing_sum) / NULLIF(SUM(timing_count), 0) as avg_timing_stability,
+            SUM(total_notes)::bigint as total_notes,
+            SUM(correct_notes)::bigint as total_correct,
+            SUM(bad_notes)::bigint as total_bad
+        FROM fretcoach.session_rollups_daily
         WHERE user_id = :user_id
     """)
 
@@ -252,17 +255,17 @@ def get_session_aggregates(user_id: str) -> Dict[str, Any]:
 def get_practiced_scales(user_id: str) -> List[Dict[str, Any]]:
     """
     Get scales the user has practiced and their performance on each.
-    Direct SQL query - no LLM needed.
+    Direct SQL query over the daily rollups - no LLM needed.
     """
     query = text("""
         SELECT
             scale_chosen, scale_type,
-            COUNT(*) as times_practiced,
-            AVG(pitch_accuracy) as avg_pitch,
-            AVG(scale_conformity) as avg_scale,
-            AVG(timing_stability) as avg_timing,
-            MAX(start_timestamp) as last_practiced
-        FROM fretcoach.sessions
+            SUM(session_count) as times_practiced,
+            SUM(pitch_sum) / NULLIF(SUM(pitch_count), 0) as avg_pitch,
+            SUM(scale_sum) / NULLIF(SUM(scale_count), 0) as avg_scale,
+            SUM(timing_sum) / NULLIF(SUM(timing_count), 0) as avg_timing,
+            MAX(last_practiced) as last_practiced
+        FROM fretcoach.session_rollups_daily
         WHERE user_id = :user_id
         GROUP BY scale_chosen, scale_type
         ORDER BY last_practiced DESC
@@ -467,6 +470,7 @@ def save_practice_plan_sync(user_id: str, recommendation: PracticeRecommendation
                 "practice_plan": practice_plan_json
             }
         )
+        conn.execute(NOTIFY_USER_SQL, {"user_id": user_id})
 
     return practice_id
 
@@ -495,6 +499,8 @@ def delete_pending_plans(user_id: str) -> int:
 
     with engine.begin() as conn:
         result = conn.execute(delete_query, {"user_id": user_id})
+        if result.rowcount:
+            conn.execute(NOTIFY_USER_SQL, {"user_id": user_id})
         return result.rowcount
 
 
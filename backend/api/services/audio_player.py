@@ -0,0 +1,120 @@
+"""
+Interruptible audio playback for FretCoach API.
+OpenAI's LocalAudioPlayer only checks should_stop in play(); play_stream()
+keeps playing whatever it has queued (up to 50 buffers) after a stop. This
+player checks it in the output callback and drops the queue instead.
+"""
+
+import asyncio
+import contextlib
+import queue
+from typing import AsyncIterator, Callable, Optional
+
+import numpy as np
+import sounddevice as sd
+from openai.helpers import LocalAudioPlayer
+
+SAMPLE_RATE = 24000
+# Buffers queued ahead of the output callback
+MAX_QUEUED_BUFFERS = 50
+
+
+class InterruptibleAudioPlayer(LocalAudioPlayer):
+    """
+    LocalAudioPlayer whose play_stream() stops within one output block of
+    should_stop() returning True.
+
+    Args:
+        should_stop: Polled by the output callback and between incoming buffers
+        output_stream: sounddevice.OutputStream-compatible factory (tests pass a fake device)
+    """
+
+    def __init__(
+        self,
+        should_stop: Optional[Callable[[], bool]] = None,
+        output_stream: Callable[..., sd.OutputStream] = sd.OutputStream,
+    ):
+        super().__init__(should_stop=should_stop)
+        self.output_stream = output_stream
+
+    def _stopped(self) -> bool:
+        return callable(self.should_stop) and self.should_stop()
+
+    async def play_stream(self, buffer_stream: AsyncIterator[Optional[np.ndarray]]) -> None:
+        """
+        Play (samples, 1) int16 or float32 buffers as they arrive.
+
+        Returns once the stream is exhausted and played, or as soon as
+        should_stop() is True; queued audio is discarded and the stream closed.
+        """
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        buffers: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=MAX_QUEUED_BUFFERS)
+        current: Optional[np.ndarray] = None
+        position = 0
+
+        async def enqueue(buffer: Optional[np.ndarray]) -> bool:
+            while not done.is_set():
+                try:
+                    buffers.put_nowait(buffer)
+                    return True
+                except queue.Full:
+                    await asyncio.sleep(0.01)
+            return False
+
+        async def producer():
+            async for buffer in buffer_stream:
+                if buffer is None or self._stopped():
+                    break
+                if buffer.dtype == np.int16:
+                    buffer = (buffer.astype(np.float32) / 32767.0).reshape(-1, self.channels)
+                if not await enqueue(buffer):
+                    return
+            await enqueue(None)  # Signal completion
+
+        def finish(outdata: np.ndarray, frames_written: int):
+            outdata[frames_written:] = 0
+            loop.call_soon_threadsafe(done.set)
+            raise sd.CallbackStop
+
+        def callback(outdata, frame_count, _time_info, _status):
+            nonlocal current, position
+            if self._stopped():
+                finish(outdata, 0)
+            frames_written = 0
+            while frames_written < frame_count:
+                if current is None or position >= len(current):
+                    try:
+                        current = buffers.get_nowait()
+                    except queue.Empty:
+                        outdata[frames_written:] = 0  # Underrun: wait for the network
+                        return
+                    if current is None:
+                        finish(outdata, frames_written)
+                    position = 0
+                frames = min(frame_count - frames_written, len(current) - position)
+                outdata[frames_written:frames_written + frames] = current[position:position + frames]
+                position += frames
+                frames_written += frames
+
+        producer_task = asyncio.create_task(producer())
+        try:
+            with self.output_stream(
+                samplerate=SAMPLE_RATE,
+                channels=self.channels,
+                dtype=self.dtype,
+                callback=callback,
+            ):
+                # Also wake up if the producer dies, so a failed stream does not hang playback
+                waiter = asyncio.create_task(done.wait())
+                await asyncio.wait({waiter, producer_task}, return_when=asyncio.FIRST_COMPLETED)
+                if producer_task.done() and producer_task.exception() is not None:
+                    waiter.cancel()
+                else:
+                    await waiter
+        finally:
+            done.set()
+            if not producer_task.done():
+                producer_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer_task
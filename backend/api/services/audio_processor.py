@@ -7,21 +7,24 @@ import sys
 import os
 import numpy as np
 import time
-from collections import deque
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
 
 from audio_metrics import (
     QualityConfig,
-    process_audio_frame,
+    QualityResult,
+    StreamingAnalyzer,
     score_to_hue,
     calculate_bulb_brightness,
 )
-from smart_bulb import set_bulb_hsv, bulb_on, bulb_off
-from scales import MAJOR_DIATONIC, MINOR_DIATONIC, MAJOR_PENTATONIC, MINOR_PENTATONIC
+from analysis_process import AnalysisProcess, QualitySnapshot, record_to_result, record_to_snapshot
+from smart_bulb import get_bulb_actor
+from perf import get_profiler
+from scales import find_scale, Scale
 
 from ..state import SessionState, AudioState, DebugInfo
+from .metrics_hub import metrics_hub
 
 # Import Opik for tracking
 from opik import track
@@ -46,29 +49,31 @@ def audio_callback(indata, outdata, frames, time_info, status, config, audio_sta
     else:
         guitar = indata[:, config["guitar_channel"]]
 
-    with audio_state.buffer_lock:
-        audio_state.buffer.extend(guitar)
-
+    # Lock-free copy into the preallocated ring buffer (single producer);
+    # None once cleanup has detached it
+    buffer = audio_state.buffer
+    if buffer is None:
+        return
+    buffer.write(guitar)
+    get_profiler().note_input()
 
-def get_target_pitch_classes(scale_name: str, scale_type: str) -> set:
-    """Get the pitch classes for a given scale."""
-    is_major = "Major" in scale_name
 
-    if scale_type == "natural":
-        scales_dict = MAJOR_DIATONIC if is_major else MINOR_DIATONIC
-    else:
-        scales_dict = MAJOR_PENTATONIC if is_major else MINOR_PENTATONIC
-
-    return set(scales_dict[scale_name])
+def get_target_pitch_classes(scale_name: str, scale_type: str) -> Scale:
+    """Get the pitch classes for a given scale (set-like, bitmask membership)."""
+    return find_scale(scale_name, scale_type)
 
 def process_audio(session_state: SessionState, audio_state: AudioState, audio_constants: dict):
     """
     Background task to process audio and update metrics.
     Uses shared quality module for calculations.
+
+    With ANALYSIS_MODE "process" the scoring itself runs in a separate worker
+    process and this thread only consumes its results.
     """
     config = session_state.config
     sample_rate = audio_constants["SAMPLE_RATE"]
     buffer_size = int(sample_rate * audio_constants["ANALYSIS_WINDOW_SEC"])
+    chunk = np.empty(buffer_size, dtype=np.float32)  # Reused for every read from the ring buffer
 
     # Get target scale
     scale_name = config["scale_name"]
@@ -81,104 +86,217 @@ def process_audio(session_state: SessionState, audio_state: AudioState, audio_co
         sensitivity=audio_state.sensitivity,
         sample_rate=sample_rate,
         phrase_window=audio_constants["PHRASE_WINDOW"],
+        window_sec=audio_constants["ANALYSIS_WINDOW_SEC"],
+        hop_sec=audio_constants["ANALYSIS_HOP_SEC"],
+        pitch_engine=audio_constants.get("PITCH_ENGINE", "piptrack"),
     )
 
     # Reset quality state for new session
     audio_state.reset()
+    metrics_hub.reset()
 
     print(f"\n[AUDIO] Processing audio for {scale_name} ({scale_type})")
     print(f"Target notes: {sorted(target_pitch_classes)}")
     print(f"Strictness: {quality_config.strictness:.2f} | Sensitivity: {quality_config.sensitivity:.2f}")
     print(f"Ambient lighting: {'Enabled' if audio_state.ambient_lighting else 'Disabled'}")
 
-    # Turn on bulb at start if enabled
+    # Turn on bulb at start if enabled (queued; the bulb actor does the network I/O)
     if audio_state.ambient_lighting:
-        try:
-            bulb_on()
+        bulb = get_bulb_actor()
+        if bulb.enabled:
+            bulb.reset()
+            bulb.power(True)
             print("[BULB] Smart bulb enabled")
-        except Exception as e:
-            print(f"[WARN] Smart bulb not available: {e}")
+        else:
+            print("[WARN] Smart bulb not available: not configured")
+
+    profiler = get_profiler()
+
+    if audio_constants.get("ANALYSIS_MODE") == "process":
+        if _consume_worker_results(session_state, audio_state, target_pitch_classes, quality_config, profiler):
+            return
+        if not session_state.is_running:
+            return
+        print("[WARN] Falling back to in-thread analysis")
+
+    # Results are emitted once per hop of audio, so polling faster than the
+    # hop only reduces latency; it does not change the update rate
+    analyzer = StreamingAnalyzer(
+        target_pitch_classes=target_pitch_classes,
+        config=quality_config,
+        state=audio_state.quality,
+        enabled_metrics=audio_state.enabled_metrics,
+    )
+    buffer = audio_state.buffer  # Held locally: cleanup detaches it from audio_state
+    position = buffer.total_written
 
     while session_state.is_running:
-        time.sleep(0.15)
+        time.sleep(quality_config.hop_sec / 3)
+
+        # Analyse only the samples that arrived since the last poll
+        input_time = profiler.last_input_time
+        samples, new_position = buffer.read_since(position, out=chunk)
+
+        # Samples skipped because we fell behind still count as elapsed time
+        skipped = new_position - position - len(samples)
+        if skipped > 0:
+            audio_state.quality.clock.advance(skipped)
+        position = new_position
 
-        # Get audio from buffer
-        with audio_state.buffer_lock:
-            if len(audio_state.buffer) < buffer_size:
+        results = analyzer.push(samples)
+        for i, result in enumerate(results):
+            if result is None:
+                session_state.current_note = "-"
+                publish_metrics(session_state)
                 continue
-            audio = np.array(audio_state.buffer)
-
-        # Process the audio frame
-        result = process_audio_frame(
-            audio=audio,
-            target_pitch_classes=target_pitch_classes,
-            config=quality_config,
-            state=audio_state.quality,
-            enabled_metrics=audio_state.enabled_metrics
-        )
 
-        if result is None:
-            session_state.current_note = "-"
-            continue
+            if profiler.enabled:
+                # Input time of the window's last sample, back-dated from the newest callback
+                window_end = analyzer.last_emit_position - (len(results) - 1 - i) * analyzer.hop_size
+                profiler.record_latency(input_time - (new_position - window_end) / sample_rate)
 
-        # Update debug info first to calculate cumulative accuracy
-        num_unique_notes = len([c for c in audio_state.quality.note_counts.values() if c > 0])
-        correct_notes = audio_state.quality.notes_in_scale(target_pitch_classes)
-        wrong_notes = audio_state.quality.notes_out_of_scale(target_pitch_classes)
+            publish_result(
+                session_state,
+                audio_state,
+                target_pitch_classes,
+                result,
+                QualitySnapshot.from_state(audio_state.quality, target_pitch_classes),
+            )
 
-        # Calculate cumulative pitch accuracy (percentage of correct notes)
-        total_notes = correct_notes + wrong_notes
-        if total_notes > 0:
-            pitch_accuracy_pct = correct_notes / total_notes
-        else:
-            pitch_accuracy_pct = 0.0
-
-        # Update session state with results (conditionally based on enabled metrics)
-        enabled = audio_state.enabled_metrics
-        session_state.current_note = "In Scale" if result.in_scale else "Wrong Note"
-        session_state.pitch_accuracy = pitch_accuracy_pct if enabled.get("pitch_accuracy", True) else None
-        session_state.scale_conformity = result.scale_coverage if enabled.get("scale_conformity", True) else None
-        session_state.timing_stability = audio_state.quality.ema_timing if enabled.get("timing_stability", True) else None
-        session_state.debug_info = DebugInfo(
-            detected_hz=result.detected_hz,
-            detected_midi=result.detected_midi,
-            pitch_class=result.pitch_class,
-            in_scale=result.in_scale,
-            raw_pitch=result.pitch_score,
-            raw_timing=result.timing_score,
-            scale_coverage=result.scale_coverage,
-            notes_played_count=audio_state.quality.total_notes,
-            unique_notes_used=num_unique_notes,
-            scale_total_notes=len(target_pitch_classes),
-            notes_for_timing_analysis=result.notes_for_timing,
-            correct_notes=correct_notes,
-            wrong_notes=wrong_notes,
+
+def _consume_worker_results(
+    session_state: SessionState,
+    audio_state: AudioState,
+    target_pitch_classes: Scale,
+    quality_config: QualityConfig,
+    profiler,
+):
+    """
+    Process-mode loop: scoring runs in an AnalysisProcess reading the shared
+    ring buffer; this thread only applies its results to SessionState and
+    performs the DB/bulb side effects.
+
+    Returns:
+        True when the session ended normally, False if the worker failed to
+        start or died (the caller then analyses in-thread instead)
+    """
+    worker = AnalysisProcess(
+        buffer=audio_state.buffer,
+        target_pitch_classes=target_pitch_classes,
+        config=quality_config,
+        enabled_metrics=audio_state.enabled_metrics,
+    )
+    audio_state.analysis_process = worker
+
+    try:
+        if not worker.start():
+            print("[ERR] Analysis worker did not become ready")
+            return False
+        print("[AUDIO] Analysis running in worker process")
+
+        while session_state.is_running:
+            time.sleep(quality_config.hop_sec / 3)
+
+            if not worker.is_alive:
+                print("[ERR] Analysis worker exited unexpectedly")
+                return False
+
+            input_time = profiler.last_input_time
+            written = worker.buffer.total_written
+            for record in worker.poll():
+                result = record_to_result(record)
+                if result is None:
+                    session_state.current_note = "-"
+                    publish_metrics(session_state)
+                    continue
+
+                if profiler.enabled:
+                    profiler.record_latency(input_time - (written - int(record["window_end"])) / quality_config.sample_rate)
+
+                publish_result(session_state, audio_state, target_pitch_classes, result, record_to_snapshot(record))
+        return True
+    finally:
+        worker.stop()
+        audio_state.analysis_process = None
+
+
+def publish_result(
+    session_state: SessionState,
+    audio_state: AudioState,
+    target_pitch_classes: Scale,
+    result: QualityResult,
+    snapshot: QualitySnapshot,
+):
+    """Apply one analysis result to the session state, DB log and smart bulb."""
+    profiler = get_profiler()
+    correct_notes = snapshot.notes_in_scale
+    wrong_notes = snapshot.notes_out_of_scale
+
+    # Calculate cumulative pitch accuracy (percentage of correct notes)
+    total_notes = correct_notes + wrong_notes
+    if total_notes > 0:
+        pitch_accuracy_pct = correct_notes / total_notes
+    else:
+        pitch_accuracy_pct = 0.0
+
+    # Update session state with results (conditionally based on enabled metrics)
+    enabled = audio_state.enabled_metrics
+    session_state.current_note = "In Scale" if result.in_scale else "Wrong Note"
+    session_state.pitch_accuracy = pitch_accuracy_pct if enabled.get("pitch_accuracy", True) else None
+    session_state.scale_conformity = result.scale_coverage if enabled.get("scale_conformity", True) else None
+    session_state.timing_stability = snapshot.ema_timing if enabled.get("timing_stability", True) else None
+    session_state.debug_info = DebugInfo(
+        detected_hz=result.detected_hz,
+        detected_midi=result.detected_midi,
+        pitch_class=result.pitch_class,
+        in_scale=result.in_scale,
+        raw_pitch=result.pitch_score,
+        raw_timing=result.timing_score,
+        scale_coverage=result.scale_coverage,
+        notes_played_count=snapshot.total_notes,
+        unique_notes_used=snapshot.unique_notes,
+        scale_total_notes=len(target_pitch_classes),
+        notes_for_timing_analysis=result.notes_for_timing,
+        correct_notes=correct_notes,
+        wrong_notes=wrong_notes,
+    )
+    publish_metrics(session_state)
+
+    # Log metric to database
+    t0 = profiler.now()
+    if audio_state.session_logger and audio_state.session_id:
+        try:
+            audio_state.session_logger.log_metric(
+                session_id=audio_state.session_id,
+                pitch_accuracy=session_state.pitch_accuracy,
+                scale_conformity=result.scale_coverage,
+                timing_stability=session_state.timing_stability,
+                debug_info={
+                    "note_detected": result.note_detected,
+                    "in_scale": result.in_scale,
+                    "pitch_class": result.pitch_class,
+                }
+            )
+        except Exception:
+            pass  # Silently fail to avoid blocking audio processing
+    profiler.record_since("db_log", t0)
+
+    # Update smart bulb if enabled (latest-wins mailbox; throttling happens in the actor)
+    t0 = profiler.now()
+    if audio_state.ambient_lighting:
+        get_bulb_actor().set_hsv(
+            score_to_hue(snapshot.ema_quality),
+            v=calculate_bulb_brightness(snapshot.ema_quality),
         )
+    profiler.record_since("bulb", t0)
+
 
-        # Log metric to database
-        if audio_state.session_logger and audio_state.session_id:
-            try:
-                audio_state.session_logger.log_metric(
-                    session_id=audio_state.session_id,
-                    pitch_accuracy=session_state.pitch_accuracy,
-                    scale_conformity=result.scale_coverage,
-                    timing_stability=session_state.timing_stability,
-                    debug_info={
-                        "note_detected": result.note_detected,
-                        "in_scale": result.in_scale,
-                        "pitch_class": result.pitch_class,
-                    }
-                )
-            except Exception:
-                pass  # Silently fail to avoid blocking audio processing
-
-        # Update smart bulb if enabled
-        if audio_state.ambient_lighting:
-            hue = score_to_hue(audio_state.quality.ema_quality)
-            if audio_state.bulb.should_update(hue):
-                try:
-                    brightness = calculate_bulb_brightness(audio_state.quality.ema_quality)
-                    set_bulb_hsv(hue, v=brightness)
-                    audio_state.bulb.mark_sent(hue)
-                except Exception:
-                    pass  # Silently fail
+def publish_metrics(session_state: SessionState):
+    """Push the current session metrics to /ws/metrics subscribers (no-op if unchanged)."""
+    metrics_hub.publish({
+        "current_note": session_state.current_note,
+        "pitch_accuracy": session_state.pitch_accuracy,
+        "scale_conformity": session_state.scale_conformity,
+        "timing_stability": session_state.timing_stability,
+        "debug_info": session_state.debug_info.to_dict(),
+    })
@@ -3,24 +3,30 @@ Configuration persistence service for FretCoach
 """
 
 import os
+import sys
+import copy
 import json
+import time
+from collections import OrderedDict
 from typing import Optional
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from dotenv import load_dotenv, find_dotenv
 
+# Add core directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
+
+from db_pool import get_engine
+
 # Load environment variables
 load_dotenv(find_dotenv())
 
-# Get PostgreSQL credentials
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
+# Shared connection pool (see core/db_pool.py)
+engine = get_engine()
 
-# Create database engine
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Per-user session config cache for hot paths (live coaching feedback)
+USER_CONFIG_CACHE_TTL_SEC = float(os.getenv("USER_CONFIG_CACHE_TTL", "30"))
+USER_CONFIG_CACHE_SIZE = int(os.getenv("USER_CONFIG_CACHE_SIZE", "256"))
+_user_config_cache = OrderedDict()  # user_id -> (expires_at, config), least recently used first
 
 
 def get_config_file_path() -> str:
@@ -155,6 +161,36 @@ def load_user_session_config(user_id: str) -> dict:
     return load_session_config_from_file()
 
 
+def get_user_session_config_cached(user_id: str) -> dict:
+    """
+    Load a user's session configuration, reusing a recent result.
+
+    Entries live for USER_CONFIG_CACHE_TTL_SEC and are dropped when the config
+    is saved through save_user_session_config, so repeated per-request lookups
+    don't each hit the database. At most USER_CONFIG_CACHE_SIZE users are kept,
+    least recently used evicted first.
+
+    Args:
+        user_id: The user's identifier
+
+    Returns:
+        Session configuration dictionary with enabled_metrics (a copy the
+        caller may modify)
+    """
+    now = time.monotonic()
+    entry = _user_config_cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        _user_config_cache.move_to_end(user_id)
+        return copy.deepcopy(entry[1])
+
+    config = load_user_session_config(user_id)
+    _user_config_cache[user_id] = (now + USER_CONFIG_CACHE_TTL_SEC, copy.deepcopy(config))
+    _user_config_cache.move_to_end(user_id)
+    while len(_user_config_cache) > USER_CONFIG_CACHE_SIZE:
+        _user_config_cache.popitem(last=False)
+    return config
+
+
 def save_user_session_config(user_id: str, config: dict) -> bool:
     """
     Save session configuration for a specific user to database.
@@ -187,6 +223,7 @@ def save_user_session_config(user_id: str, config: dict) -> bool:
                 "user_id": user_id,
                 "enabled_metrics": json.dumps(enabled_metrics)
             })
+        _user_config_cache.pop(user_id, None)
         return True
     except Exception as e:
         print(f"Warning: Could not save user config to database: {e}")
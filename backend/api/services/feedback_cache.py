@@ -0,0 +1,93 @@
+"""
+Async response cache for FretCoach API.
+TTL + LRU cache whose misses are coalesced: concurrent requests for the same
+key share one in-flight computation (e.g. one LLM call) instead of each
+starting their own.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class CoalescingCache:
+    """
+    Bounded TTL cache with single-flight misses.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def fetch(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Start computing `key` with `factory`, or join the computation already in flight.
+
+        The returned task stores its result in the cache when it completes,
+        even if every caller stopped waiting for it (wrap awaits in
+        asyncio.shield to give up on a slow task without cancelling it).
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._compute(key, factory))
+        task.add_done_callback(_consume_exception)
+        self._inflight[key] = task
+        return task
+
+    async def _compute(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await factory()
+            self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    """Mark a failed task's exception as retrieved when nobody awaited it."""
+    if not task.cancelled():
+        task.exception()
@@ -16,12 +16,15 @@ from langchain_core.output_parsers import StrOutputParser
 
 # Import OpenAI for TTS
 from openai import AsyncOpenAI
-from openai.helpers import LocalAudioPlayer
 
 # Import Opik for tracking with LangChain integration
 from opik.integrations.langchain import OpikTracer
 from opik import track
 
+from .audio_player import InterruptibleAudioPlayer
+from .feedback_cache import CoalescingCache
+from .tts_cache import DEFAULT_CACHE_DIR, ClipCache, OpenAITTSBackend, ToneTTSBackend
+
 # Load environment variables
 load_dotenv(find_dotenv())
 
@@ -39,21 +42,56 @@ live_coach_model = ChatOpenAI(
     max_tokens=100  # Room for 30-word feedback with context
 )
 
+# Feedback cache: metric scores are bucketed so requests a point or two apart
+# share an entry; after FEEDBACK_LLM_TIMEOUT_SEC a templated line is returned
+# while the LLM call keeps running and fills the cache for the next request.
+FEEDBACK_SCORE_BUCKET = 5
+FEEDBACK_LLM_TIMEOUT_SEC = float(os.getenv("FEEDBACK_LLM_TIMEOUT", "3.0"))
+feedback_cache = CoalescingCache(
+    max_entries=int(os.getenv("FEEDBACK_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FEEDBACK_CACHE_TTL", "300")),
+)
+
 # Initialize OpenAI client for TTS
 openai_client = AsyncOpenAI()
 
+# TTS voice settings (all part of the clip cache key)
+TTS_VOICE = "coral"  # Coral is more energetic and natural than onyx
+TTS_SPEED = 1.15  # 15% faster for more dynamic delivery
+TTS_INSTRUCTIONS = "You're an energetic guitar coach giving quick, direct feedback during practice. Speak naturally and conversationally, like you're in the room with the student. Keep the energy up and pace brisk."
+
+# TTS backend: "openai" (default) or "local" (offline tone synthesiser for testing)
+if os.getenv("FRETCOACH_TTS_BACKEND", "openai").lower() == "local":
+    tts_backend = ToneTTSBackend()
+else:
+    tts_backend = OpenAITTSBackend(openai_client, TTS_MODEL_NAME)
+
+# Synthesised clips are cached on disk so repeated phrases play without a round trip
+clip_cache = ClipCache(
+    os.getenv("TTS_CACHE_DIR") or DEFAULT_CACHE_DIR,
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024,
+)
+
+# Spoken verbatim when no metric is enabled; every other feedback line embeds
+# live scores, so it is the only phrase worth synthesising ahead of time
+NO_METRICS_FEEDBACK = "Keep playing so I can measure your performance."
+
+# Synthesised by warm_tts_cache() on startup when TTS_WARMUP=1
+TTS_WARMUP_PHRASES = [NO_METRICS_FEEDBACK]
+
 # Global audio player instance
 _audio_player = None
+_stop_requested = False
 
 
 async def get_audio_player():
     """Get or create a singleton audio player instance with optimized settings."""
     global _audio_player
     if _audio_player is None:
-        # LocalAudioPlayer with default settings
-        # Note: OpenAI's LocalAudioPlayer doesn't expose buffer configuration,
+        # OpenAI's LocalAudioPlayer with a play_stream() that honours stop requests
+        # Note: LocalAudioPlayer doesn't expose buffer configuration,
         # but using PCM format with streaming helps reduce latency issues
-        _audio_player = LocalAudioPlayer()
+        _audio_player = InterruptibleAudioPlayer(should_stop=lambda: _stop_requested)
     return _audio_player
 
 
@@ -138,6 +176,41 @@ def format_elapsed_time(seconds: int) -> str:
     return f"{minutes}m {remaining_seconds}s"
 
 
+# Fallback feedback lines, one per metric (mirrors the fixes in COACHING_SYSTEM_PROMPT)
+FEEDBACK_TEMPLATE_FIXES = {
+    "Pitch Accuracy": "ease finger pressure to improve note clarity",
+    "Scale Conformity": "move up the fretboard to discover new notes",
+    "Timing Stability": "slow down and count to create consistent spacing",
+}
+
+
+def feedback_cache_key(metrics: Dict[str, float], strongest_area_name: str, weakest_area_name: str) -> tuple:
+    """
+    Cache key for a feedback request: enabled metrics with bucketed scores
+    plus the strongest and weakest areas.
+    """
+    buckets = tuple((name, int(round(score / FEEDBACK_SCORE_BUCKET))) for name, score in metrics.items())
+    return buckets, strongest_area_name, weakest_area_name
+
+
+def template_feedback(
+    strongest_area_name: str,
+    strongest_score: float,
+    weakest_area_name: str,
+    weakest_score: float
+) -> str:
+    """Build instant feedback in the coaching format without calling the LLM."""
+    fix = FEEDBACK_TEMPLATE_FIXES.get(weakest_area_name)
+    if fix is None:
+        return NO_METRICS_FEEDBACK
+    if strongest_area_name == weakest_area_name:
+        return f"{weakest_area_name} is at {round(weakest_score)}% - {fix}."
+    return (
+        f"{strongest_area_name} is {get_metric_assessment(strongest_score)} at {round(strongest_score)}%, "
+        f"but {weakest_area_name.lower()} is at {round(weakest_score)}% - {fix}."
+    )
+
+
 def get_metric_assessment(score: float) -> str:
     """Get a brief assessment label for a metric score."""
     if score >= 80:
@@ -151,6 +224,11 @@ def get_metric_assessment(score: float) -> str:
     return "very low"
 
 
+def tts_clip_key(text: str) -> str:
+    """Clip cache key for `text` spoken with the current backend and voice settings."""
+    return ClipCache.key(tts_backend.name, text, TTS_VOICE, TTS_SPEED, TTS_INSTRUCTIONS)
+
+
 @track(
     name="live-coach-tts",
     tags=["fretcoach-core", TTS_MODEL_NAME, "live-coach", DEPLOYMENT_TYPE, "tts"]
@@ -161,6 +239,8 @@ async def generate_and_play_tts(
 ) -> Dict[str, Any]:
     """
     Generate and play TTS audio for coaching feedback in real-time.
+    Cached clips are played straight from disk; otherwise audio is played
+    as it streams in and cached for next time.
     Traced with Opik for monitoring.
 
     Args:
@@ -170,28 +250,27 @@ async def generate_and_play_tts(
     Returns:
         Dictionary containing TTS metadata and status
     """
+    global _stop_requested
     try:
         # Get the singleton audio player
         player = await get_audio_player()
+        _stop_requested = False
 
-        # Generate and stream TTS audio
-        async with openai_client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice="coral",  # Coral is more energetic and natural than onyx
-            input=feedback_text,
-            instructions="You're an energetic guitar coach giving quick, direct feedback during practice. Speak naturally and conversationally, like you're in the room with the student. Keep the energy up and pace brisk.",
-            response_format="pcm",
-            speed=1.15,  # 15% faster for more dynamic delivery
-        ) as response:
-            # Play audio in real-time using the singleton player
-            await player.play(response)
+        key = tts_clip_key(feedback_text)
+        clip = clip_cache.load(key)
+        if clip is not None:
+            await player.play(clip)
+        else:
+            chunks = tts_backend.stream(feedback_text, TTS_VOICE, TTS_SPEED, TTS_INSTRUCTIONS)
+            await player.play_stream(clip_cache.stream_and_store(key, chunks, lambda: _stop_requested))
 
         return {
             "status": "played",
+            "cached": clip is not None,
             "text_length": len(feedback_text),
-            "model": "gpt-4o-mini-tts",
-            "voice": "coral",
-            "speed": 1.15,
+            "model": tts_backend.name,
+            "voice": TTS_VOICE,
+            "speed": TTS_SPEED,
             "format": "pcm"
         }
 
@@ -203,14 +282,36 @@ async def generate_and_play_tts(
         }
 
 
+async def warm_tts_cache(phrases: Optional[list] = None) -> int:
+    """
+    Synthesise phrases missing from the clip cache without playing them.
+
+    Args:
+        phrases: Texts to cache (defaults to TTS_WARMUP_PHRASES)
+
+    Returns:
+        Number of clips synthesised
+    """
+    synthesised = 0
+    for text in phrases or TTS_WARMUP_PHRASES:
+        key = tts_clip_key(text)
+        if key in clip_cache:
+            continue
+        try:
+            pcm = b"".join([chunk async for chunk in tts_backend.stream(text, TTS_VOICE, TTS_SPEED, TTS_INSTRUCTIONS)])
+        except Exception as e:
+            print(f"[WARN] TTS warm-up stopped: {e}")
+            break
+        if clip_cache.store(key, pcm):
+            synthesised += 1
+    return synthesised
+
+
 async def stop_audio_playback() -> Dict[str, Any]:
     """Stop any currently playing audio."""
-    try:
-        player = await get_audio_player()
-        await player.stop()
-        return {"status": "stopped"}
-    except Exception as e:
-        return {"status": "failed", "error": str(e)}
+    global _stop_requested
+    _stop_requested = True
+    return {"status": "stopped"}
 
 
 async def generate_coaching_feedback(
@@ -309,15 +410,32 @@ Weakest: {weakest_area_name} ({round(weakest_score)}%)
 
 Give 1-2 sentences (max 30 words) - what's good, what's weak, specific actionable fix:"""
 
-    # Generate feedback with explicit messages (better Opik tracing visibility)
-    response = await live_coach_model.ainvoke(
-        [
-            {"role": "system", "content": COACHING_SYSTEM_PROMPT},
-            {"role": "user", "content": user_message}
-        ],
-        config=opik_config
-    )
-    feedback = response.content
+    async def invoke_llm() -> str:
+        # Generate feedback with explicit messages (better Opik tracing visibility)
+        response = await live_coach_model.ainvoke(
+            [
+                {"role": "system", "content": COACHING_SYSTEM_PROMPT},
+                {"role": "user", "content": user_message}
+            ],
+            config=opik_config
+        )
+        return response.content.strip()
+
+    # Reuse feedback for near-identical metrics; identical concurrent requests
+    # share one LLM call, and a slow or failed call falls back to a template
+    cache_key = feedback_cache_key(metrics, strongest_area_name, weakest_area_name)
+    feedback = feedback_cache.get(cache_key)
+    source = "cache"
+    if feedback is None:
+        task = feedback_cache.fetch(cache_key, invoke_llm)
+        try:
+            feedback = await asyncio.wait_for(asyncio.shield(task), FEEDBACK_LLM_TIMEOUT_SEC)
+            source = "llm"
+        except Exception as e:
+            if not isinstance(e, asyncio.TimeoutError):
+                print(f"[WARN] Live coach LLM call failed: {e}")
+            feedback = template_feedback(strongest_area_name, strongest_score, weakest_area_name, weakest_score)
+            source = "template"
 
     # Map to simple key for frontend
     weakest_key_map = {
@@ -327,10 +445,11 @@ Give 1-2 sentences (max 30 words) - what's good, what's weak, specific actionabl
     }
 
     return {
-        "feedback": feedback.strip(),
+        "feedback": feedback,
+        "feedback_source": source,
         "overall_performance": overall_performance,
         "overall_score": round(overall_score),
-        "weakest_area": weakest_key_map[weakest_area_name],
+        "weakest_area": weakest_key_map.get(weakest_area_name),
         "elapsed_time": elapsed_time,
         "timestamp": datetime.now().isoformat()
     }
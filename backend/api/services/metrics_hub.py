@@ -0,0 +1,203 @@
+"""
+Publish/subscribe fan-out of live session metrics for FretCoach API.
+The analysis thread publishes once per new result; WebSocket subscribers are
+woken on the event loop and sent either a JSON delta or a packed binary frame.
+Each message is encoded once per sequence number and shared by all subscribers.
+"""
+
+import asyncio
+import json
+import math
+import struct
+import threading
+from typing import Any, Dict, Optional, Set
+
+# current_note values are sent as a code in binary frames
+NOTE_CODES = {"-": 0, "In Scale": 1, "Wrong Note": 2}
+
+# Binary frame layout (little-endian, 57 bytes). Floats are NaN for None,
+# pitch_class is -1 and in_scale is 255 when unknown.
+BINARY_FRAME = struct.Struct(
+    "<I"      # seq
+    "B"       # current_note code (NOTE_CODES)
+    "fff"     # pitch_accuracy, scale_conformity, timing_stability
+    "fffff"   # detected_hz, detected_midi, raw_pitch, raw_timing, scale_coverage
+    "bB"      # pitch_class, in_scale
+    "IHHHII"  # notes_played_count, unique_notes_used, scale_total_notes,
+              # notes_for_timing_analysis, correct_notes, wrong_notes
+)
+
+_TOP_LEVEL_KEYS = ("current_note", "pitch_accuracy", "scale_conformity", "timing_stability")
+
+
+class Subscriber:
+    """One connected client: a wake-up event and the last sequence number it was sent."""
+
+    def __init__(self, binary: bool = False):
+        self.binary = binary
+        self.last_seq = 0
+        self.event = asyncio.Event()
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        self.event.set()
+
+
+class MetricsHub:
+    """
+    Latest-value metrics channel between the analysis thread and WebSocket clients.
+
+    publish() is called from the analysis thread and only records the new
+    state and schedules a wake-up on the event loop. Subscribers that fall
+    behind skip intermediate updates and receive a full snapshot instead of
+    an unbounded backlog of deltas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._state: Dict[str, Any] = {"debug_info": {}}
+        self._delta: Dict[str, Any] = {}
+        self._encoded: Dict[str, Any] = {}  # kind -> message for the current seq
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publish(self, metrics: Dict[str, Any]) -> bool:
+        """
+        Record a new metrics state and wake subscribers if anything changed.
+
+        Args:
+            metrics: Dictionary with the /ws/metrics fields (debug_info nested)
+
+        Returns:
+            True if the state changed and a new sequence number was issued
+        """
+        with self._lock:
+            delta = {k: metrics[k] for k in _TOP_LEVEL_KEYS if k in metrics and self._state.get(k) != metrics[k]}
+            old_debug = self._state["debug_info"]
+            debug_delta = {k: v for k, v in metrics.get("debug_info", {}).items() if k not in old_debug or old_debug[k] != v}
+            if not delta and not debug_delta:
+                return False
+
+            self._state.update(delta)
+            if debug_delta:
+                self._state["debug_info"] = {**old_debug, **debug_delta}
+                delta["debug_info"] = debug_delta
+            self._seq += 1
+            self._delta = delta
+            self._encoded = {}
+            loop = self._loop
+
+        if loop is not None and self._subscribers:
+            try:
+                loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                pass  # Event loop closed during shutdown
+        return True
+
+    def _wake(self) -> None:
+        for subscriber in self._subscribers:
+            subscriber.event.set()
+
+    def subscribe(self, binary: bool = False) -> Subscriber:
+        """Register a subscriber (must be called on the event loop); it is woken at once for the initial snapshot."""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(binary)
+        self._subscribers.add(subscriber)
+        if self._seq:
+            subscriber.event.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        subscriber.close()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def next_message(self, subscriber: Subscriber):
+        """
+        Encoded message bringing `subscriber` up to date, or None if it already is.
+
+        JSON subscribers that saw the previous sequence number get a delta,
+        everyone else a snapshot; binary frames always carry the full state.
+        """
+        with self._lock:
+            seq = self._seq
+            if seq == subscriber.last_seq:
+                return None
+            if subscriber.binary:
+                kind = "binary"
+            elif subscriber.last_seq == seq - 1 and subscriber.last_seq > 0:
+                kind = "delta"
+            else:
+                kind = "snapshot"
+
+            message = self._encoded.get(kind)
+            if message is None:
+                message = self._encode(kind, seq)
+                self._encoded[kind] = message
+        subscriber.last_seq = seq
+        return message
+
+    def _encode(self, kind: str, seq: int):
+        """Encode the current state (caller holds the lock)."""
+        if kind == "binary":
+            return encode_binary_frame(seq, self._state)
+        data = self._delta if kind == "delta" else self._state
+        return json.dumps({"type": kind, "seq": seq, "data": data}, default=_json_default)
+
+    def reset(self) -> None:
+        """Forget the published state (new session); sequence numbers keep increasing."""
+        with self._lock:
+            self._state = {"debug_info": {}}
+            self._delta = {}
+            self._encoded = {}
+
+
+def encode_binary_frame(seq: int, state: Dict[str, Any]) -> bytes:
+    """Pack a full metrics state into a BINARY_FRAME."""
+    debug = state.get("debug_info", {})
+    in_scale = debug.get("in_scale")
+    pitch_class = debug.get("pitch_class")
+    return BINARY_FRAME.pack(
+        seq & 0xFFFFFFFF,
+        NOTE_CODES.get(state.get("current_note"), 0),
+        _f(state.get("pitch_accuracy")),
+        _f(state.get("scale_conformity")),
+        _f(state.get("timing_stability")),
+        _f(debug.get("detected_hz")),
+        _f(debug.get("detected_midi")),
+        _f(debug.get("raw_pitch")),
+        _f(debug.get("raw_timing")),
+        _f(debug.get("scale_coverage")),
+        -1 if pitch_class is None else int(pitch_class),
+        255 if in_scale is None else int(bool(in_scale)),
+        int(debug.get("notes_played_count") or 0),
+        min(int(debug.get("unique_notes_used") or 0), 0xFFFF),
+        min(int(debug.get("scale_total_notes") or 0), 0xFFFF),
+        min(int(debug.get("notes_for_timing_analysis") or 0), 0xFFFF),
+        int(debug.get("correct_notes") or 0),
+        int(debug.get("wrong_notes") or 0),
+    )
+
+
+def _f(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _json_default(value):
+    """JSON encoder for numpy scalars in debug info."""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+# Global hub instance
+metrics_hub = MetricsHub()
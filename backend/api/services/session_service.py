@@ -5,7 +5,6 @@ Session lifecycle management service for FretCoach.
 import sys
 import os
 import threading
-from collections import deque
 
 import sounddevice as sd
 
@@ -13,6 +12,7 @@ import sounddevice as sd
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
 
 from session_logger import get_session_logger
+from audio_buffer import RingBuffer, SharedRingBuffer
 from .audio_processor import audio_callback, process_audio, get_target_pitch_classes
 from ..state import SessionState, AudioState
 
@@ -73,8 +73,11 @@ def start_session_impl(session_state: SessionState, audio_state: AudioState, aud
             audio_constants["SAMPLE_RATE"] *
             audio_constants["ANALYSIS_WINDOW_SEC"]
         )
-        audio_state.buffer = deque(maxlen=buffer_size)
-        audio_state.buffer_lock = threading.Lock()
+        if audio_constants.get("ANALYSIS_MODE") == "process":
+            # Shared memory so the analysis worker process can read it directly
+            audio_state.buffer = SharedRingBuffer(buffer_size)
+        else:
+            audio_state.buffer = RingBuffer(buffer_size)
 
         # Start audio stream with callback
         def stream_callback(indata, outdata, frames, time_info, status):
@@ -90,7 +93,7 @@ def start_session_impl(session_state: SessionState, audio_state: AudioState, aud
         )
         audio_state.stream.start()
 
-        # Start processing in background thread
+        # Start processing in background thread (which starts the worker process in process mode)
         session_state.is_running = True
         audio_state.processing_task = threading.Thread(
             target=process_audio,
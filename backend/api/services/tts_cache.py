@@ -0,0 +1,216 @@
+"""
+Synthesised speech clip cache for FretCoach API.
+Clips are stored as raw 24 kHz mono int16 PCM files named by a hash of
+everything that affects the audio (backend, voice, speed, instructions, text),
+so a phrase is synthesised once and replayed from disk through a memory map.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import numpy as np
+
+# OpenAI "pcm" output and LocalAudioPlayer both use this rate
+SAMPLE_RATE = 24000
+PCM_DTYPE = np.dtype("<i2")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", ".tts_cache")
+
+
+class TTSBackend(abc.ABC):
+    """Source of PCM audio (24 kHz mono int16) for a phrase."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def stream(self, text: str, voice: str, speed: float, instructions: str) -> AsyncIterator[bytes]:
+        """Yield the phrase's PCM bytes as they are synthesised."""
+
+
+class OpenAITTSBackend(TTSBackend):
+    """Streams speech from the OpenAI TTS API."""
+
+    name = "openai"
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+        self.name = f"openai:{model}"
+
+    async def stream(self, text: str, voice: str, speed: float, instructions: str) -> AsyncIterator[bytes]:
+        async with self.client.audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            instructions=instructions,
+            response_format="pcm",
+            speed=speed,
+        ) as response:
+            async for chunk in response.iter_bytes(chunk_size=4096):
+                if chunk:
+                    yield chunk
+
+
+class ToneTTSBackend(TTSBackend):
+    """
+    Offline stand-in for development and tests: one short tone per word,
+    pitched from the word so the same text always gives the same audio.
+    """
+
+    name = "local"
+
+    async def stream(self, text: str, voice: str, speed: float, instructions: str) -> AsyncIterator[bytes]:
+        word_samples = int(SAMPLE_RATE * 0.12 / speed)
+        gap = np.zeros(int(SAMPLE_RATE * 0.04 / speed), dtype=PCM_DTYPE)
+        t = np.arange(word_samples) / SAMPLE_RATE
+        envelope = np.hanning(word_samples)
+        for word in text.split():
+            freq = 220 + zlib.crc32(word.encode()) % 440
+            tone = (0.3 * 32767 * envelope * np.sin(2 * np.pi * freq * t)).astype(PCM_DTYPE)
+            yield tone.tobytes() + gap.tobytes()
+            await asyncio.sleep(0)
+
+
+class ClipCache:
+    """
+    Content-addressed on-disk PCM clips with least-recently-played eviction.
+
+    Args:
+        directory: Folder holding the <sha256>.pcm files (created on first store)
+        max_bytes: Total clip size kept before the oldest are deleted
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    @staticmethod
+    def key(backend: str, text: str, voice: str, speed: float, instructions: str) -> str:
+        """Hash of everything that changes the synthesised audio."""
+        material = json.dumps([backend, text, voice, speed, instructions], ensure_ascii=False)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _scan(self) -> None:
+        """Index clips left by previous runs, oldest first."""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pcm"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sizes
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """
+        Memory-map a cached clip.
+
+        Returns:
+            (samples, 1) int16 array backed by the file, or None on a miss
+        """
+        if not self._sizes.get(key):
+            self.misses += 1
+            return None
+        path = self.path(key)
+        try:
+            clip = np.memmap(path, dtype=PCM_DTYPE, mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            self._sizes.pop(key, None)
+            self.misses += 1
+            return None
+        self._sizes.move_to_end(key)
+        self.hits += 1
+        return clip.reshape(-1, 1)
+
+    def store(self, key: str, pcm: bytes) -> bool:
+        """Write a clip atomically and evict old clips past max_bytes."""
+        pcm = pcm[:len(pcm) - len(pcm) % PCM_DTYPE.itemsize]
+        if not pcm or len(pcm) > self.max_bytes:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(pcm)
+            os.replace(tmp_path, self.path(key))
+        except OSError as e:
+            print(f"[WARN] Could not cache TTS clip: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        self._sizes[key] = len(pcm)
+        self._sizes.move_to_end(key)
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        total = self.total_bytes
+        while total > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass  # Still mapped by a playing clip (Windows); dropped from the index anyway
+            total -= size
+            self.evictions += 1
+
+    async def stream_and_store(
+        self,
+        key: str,
+        chunks: AsyncIterator[bytes],
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> AsyncIterator[np.ndarray]:
+        """
+        Pass a backend's PCM stream through as (samples, 1) int16 arrays for
+        playback, storing the full clip once the stream completes. Streams
+        cut short by `should_stop` are not cached.
+        """
+        parts = []
+        pending = b""
+        async for chunk in chunks:
+            if should_stop is not None and should_stop():
+                return
+            parts.append(chunk)
+            data = pending + chunk
+            usable = len(data) - len(data) % PCM_DTYPE.itemsize
+            pending = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=PCM_DTYPE).reshape(-1, 1)
+        self.store(key, b"".join(parts))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "clips": len(self._sizes),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
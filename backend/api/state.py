@@ -5,7 +5,6 @@ Uses dataclasses for cleaner, type-safe state management.
 
 from dataclasses import dataclass, field
 from typing import Optional, Any, Dict
-from collections import deque
 import threading
 import sys
 import os
@@ -13,16 +12,20 @@ import os
 # Add core to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'core'))
 
-from audio_metrics import QualityState, BulbState
+from audio_metrics import QualityState
+from audio_buffer import RingBuffer, SharedRingBuffer
 
 # Application constants
 AUDIO_CONSTANTS = {
     "SAMPLE_RATE": 44100,
     "BLOCK_SIZE": 128,
     "ANALYSIS_WINDOW_SEC": 0.30,
+    "ANALYSIS_HOP_SEC": 0.15,
     "TUYA_UPDATE_INTERVAL": 0.30,
     "HUE_EPSILON": 5,
     "PHRASE_WINDOW": 0.8,
+    "PITCH_ENGINE": os.environ.get("FRETCOACH_PITCH_ENGINE", "piptrack"),  # "piptrack" or "yin"
+    "ANALYSIS_MODE": os.environ.get("FRETCOACH_ANALYSIS_MODE", "thread"),  # "thread" or "process"
 }
 
 
@@ -87,9 +90,9 @@ class AudioState:
     """State for audio processing during a session."""
     # Audio stream resources
     stream: Any = None
-    buffer: Optional[deque] = None
-    buffer_lock: Optional[threading.Lock] = None
+    buffer: Optional[RingBuffer] = None
     processing_task: Optional[threading.Thread] = None
+    analysis_process: Any = None  # AnalysisProcess when ANALYSIS_MODE is "process"
 
     # Session tracking
     session_id: Optional[str] = None
@@ -97,7 +100,6 @@ class AudioState:
 
     # Quality tracking (uses shared module)
     quality: QualityState = field(default_factory=QualityState)
-    bulb: BulbState = field(default_factory=BulbState)
 
     # Config values (copied from session config for easy access)
     strictness: float = 0.5
@@ -112,7 +114,6 @@ class AudioState:
     def reset(self):
         """Reset state for a new session."""
         self.quality.reset()
-        self.bulb = BulbState()
 
     def cleanup(self):
         """Clean up resources when session ends."""
@@ -124,15 +125,39 @@ class AudioState:
                 pass
             self.stream = None
 
-        if self.processing_task is not None:
-            self.processing_task.join(timeout=1.0)
-            self.processing_task = None
-
-        self.buffer = None
-        self.buffer_lock = None
+        # Detach the buffer first so a late audio callback no longer touches it
+        buffer, self.buffer = self.buffer, None
+        task, self.processing_task = self.processing_task, None
+
+        if task is not None:
+            # Process mode also waits for the worker process to exit
+            task.join(timeout=1.0 if self.analysis_process is None else 3.0)
+
+        if isinstance(buffer, SharedRingBuffer):
+            if task is not None and task.is_alive():
+                # The thread (and its worker) still map the buffer; release it once they exit
+                print("[WARN] Audio processing still running; deferring shared buffer release")
+                threading.Thread(
+                    target=_release_when_done, args=(task, buffer), name="buffer-release", daemon=True
+                ).start()
+            else:
+                _close_shared_buffer(buffer)
         self.session_id = None
 
 
+def _close_shared_buffer(buffer: SharedRingBuffer):
+    try:
+        buffer.close()
+    except BufferError:
+        pass  # Still referenced; released when garbage collected
+
+
+def _release_when_done(task: threading.Thread, buffer: SharedRingBuffer):
+    """Close a shared buffer after the processing thread (which stops its worker) has exited."""
+    task.join()
+    _close_shared_buffer(buffer)
+
+
 # Global state instances
 session_state = SessionState()
 audio_state = AudioState()
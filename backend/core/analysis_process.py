@@ -0,0 +1,324 @@
+"""
+Out-of-process audio analysis for FretCoach.
+Runs StreamingAnalyzer in a worker process that reads samples from a
+SharedRingBuffer and returns results through a shared memory ResultChannel,
+so scoring is not slowed by GIL-heavy work (LLM clients, JSON, WebSockets)
+in the host process.
+"""
+
+import multiprocessing as mp
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from audio_buffer import SharedRingBuffer, attach_shared_memory
+from audio_metrics import QualityConfig, QualityResult, QualityState, StreamingAnalyzer
+
+# One fixed-size record per analysis hop
+RESULT_DTYPE = np.dtype([
+    ("window_end", np.int64),       # Absolute sample position the window ended at
+    ("has_result", np.bool_),       # False when the hop was below the energy gate
+    ("pitch_score", np.float64),
+    ("stability_score", np.float64),
+    ("timing_score", np.float64),
+    ("noise_score", np.float64),
+    ("quality_score", np.float64),
+    ("scale_coverage", np.float64),
+    ("note_detected", np.bool_),
+    ("in_scale", np.bool_),
+    ("pitch_class", np.int8),       # -1 for None
+    ("detected_hz", np.float64),
+    ("detected_midi", np.float64),
+    ("notes_for_timing", np.int32),
+    ("ema_quality", np.float64),
+    ("ema_pitch", np.float64),
+    ("ema_timing", np.float64),
+    ("total_notes", np.int32),
+    ("unique_notes", np.int32),
+    ("notes_in_scale", np.int32),
+    ("notes_out_of_scale", np.int32),
+])
+
+
+@dataclass
+class QualitySnapshot:
+    """The QualityState values consumers need alongside each QualityResult."""
+    ema_quality: float = 0.0
+    ema_pitch: float = 0.0
+    ema_timing: float = 0.0
+    total_notes: int = 0
+    unique_notes: int = 0
+    notes_in_scale: int = 0
+    notes_out_of_scale: int = 0
+
+    @classmethod
+    def from_state(cls, state: QualityState, target_pitch_classes: Set[int]) -> "QualitySnapshot":
+        return cls(
+            ema_quality=state.ema_quality,
+            ema_pitch=state.ema_pitch,
+            ema_timing=state.ema_timing,
+            total_notes=state.total_notes,
+            unique_notes=state.note_counts.unique,
+            notes_in_scale=state.notes_in_scale(target_pitch_classes),
+            notes_out_of_scale=state.notes_out_of_scale(target_pitch_classes),
+        )
+
+
+class ResultChannel:
+    """
+    Single-producer/single-consumer ring of RESULT_DTYPE records in shared memory.
+
+    The writer fills a slot and then bumps an int64 sequence counter in the
+    header; the reader only reads that counter, so neither side takes a lock.
+    A reader more than `capacity` records behind skips to the newest ones.
+    """
+
+    def __init__(self, capacity: int = 64, name: str = None, _shm=None):
+        if _shm is None:
+            _shm = shared_memory.SharedMemory(name=name, create=True, size=16 + capacity * RESULT_DTYPE.itemsize)
+            header = np.ndarray((2,), dtype=np.int64, buffer=_shm.buf)
+            header[:] = (0, capacity)
+            self._owner = True
+        else:
+            header = np.ndarray((2,), dtype=np.int64, buffer=_shm.buf)
+            self._owner = False
+
+        self._shm = _shm
+        self._header = header
+        self.capacity = int(header[1])
+        self._records = np.ndarray((self.capacity,), dtype=RESULT_DTYPE, buffer=_shm.buf, offset=16)
+
+    @classmethod
+    def attach(cls, name: str) -> "ResultChannel":
+        """Open an existing channel created by another process."""
+        return cls(_shm=attach_shared_memory(name))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def total_written(self) -> int:
+        return int(self._header[0])
+
+    def write(
+        self,
+        window_end: int,
+        result: Optional[QualityResult],
+        snapshot: QualitySnapshot,
+    ) -> None:
+        """Publish one hop's result (producer side)."""
+        seq = int(self._header[0])
+        record = self._records[seq % self.capacity]
+        record["window_end"] = window_end
+        record["has_result"] = result is not None
+        if result is not None:
+            record["pitch_score"] = result.pitch_score
+            record["stability_score"] = result.stability_score
+            record["timing_score"] = result.timing_score
+            record["noise_score"] = result.noise_score
+            record["quality_score"] = result.quality_score
+            record["scale_coverage"] = result.scale_coverage
+            record["note_detected"] = result.note_detected
+            record["in_scale"] = result.in_scale
+            record["pitch_class"] = -1 if result.pitch_class is None else result.pitch_class
+            record["detected_hz"] = result.detected_hz
+            record["detected_midi"] = result.detected_midi
+            record["notes_for_timing"] = result.notes_for_timing
+        record["ema_quality"] = snapshot.ema_quality
+        record["ema_pitch"] = snapshot.ema_pitch
+        record["ema_timing"] = snapshot.ema_timing
+        record["total_notes"] = snapshot.total_notes
+        record["unique_notes"] = snapshot.unique_notes
+        record["notes_in_scale"] = snapshot.notes_in_scale
+        record["notes_out_of_scale"] = snapshot.notes_out_of_scale
+
+        # Publish only after the record is complete
+        self._header[0] = seq + 1
+
+    def read_since(self, position: int):
+        """
+        Return records published after sequence number `position` (consumer side).
+
+        Returns:
+            Tuple of (records copy, new_position)
+        """
+        written = int(self._header[0])
+        start = max(position, written - self.capacity + 1)
+        if written <= start:
+            return self._records[:0], written
+        indices = np.arange(start, written) % self.capacity
+        return self._records[indices], written
+
+    def close(self) -> None:
+        """Detach from the block; the creating process also unlinks it."""
+        self._records = None
+        self._header = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def record_to_result(record) -> Optional[QualityResult]:
+    """Rebuild a QualityResult from a channel record (None below the energy gate)."""
+    if not record["has_result"]:
+        return None
+    pitch_class = int(record["pitch_class"])
+    return QualityResult(
+        pitch_score=float(record["pitch_score"]),
+        stability_score=float(record["stability_score"]),
+        timing_score=float(record["timing_score"]),
+        noise_score=float(record["noise_score"]),
+        quality_score=float(record["quality_score"]),
+        scale_coverage=float(record["scale_coverage"]),
+        note_detected=bool(record["note_detected"]),
+        in_scale=bool(record["in_scale"]),
+        pitch_class=None if pitch_class < 0 else pitch_class,
+        detected_hz=float(record["detected_hz"]),
+        detected_midi=float(record["detected_midi"]),
+        notes_for_timing=int(record["notes_for_timing"]),
+    )
+
+
+def record_to_snapshot(record) -> QualitySnapshot:
+    """Rebuild the QualitySnapshot carried in a channel record."""
+    return QualitySnapshot(
+        ema_quality=float(record["ema_quality"]),
+        ema_pitch=float(record["ema_pitch"]),
+        ema_timing=float(record["ema_timing"]),
+        total_notes=int(record["total_notes"]),
+        unique_notes=int(record["unique_notes"]),
+        notes_in_scale=int(record["notes_in_scale"]),
+        notes_out_of_scale=int(record["notes_out_of_scale"]),
+    )
+
+
+def run_analysis_worker(
+    buffer_name: str,
+    channel_name: str,
+    stop_event,
+    ready_event,
+    target_pitch_classes: Set[int],
+    config: QualityConfig,
+    enabled_metrics: Optional[Dict[str, bool]] = None,
+) -> None:
+    """
+    Worker process entry point: analyse new samples and publish every hop.
+
+    Mirrors the threaded loop in the studio backend's process_audio, minus the
+    side effects (DB logging, smart bulb) which stay in the host process.
+    Analysis starts at the buffer position reached once the worker is warm.
+    """
+    buffer = SharedRingBuffer.attach(buffer_name)
+    channel = ResultChannel.attach(channel_name)
+    try:
+        _warm_up(target_pitch_classes, config)
+        position = buffer.total_written
+        ready_event.set()
+
+        state = QualityState()
+        analyzer = StreamingAnalyzer(
+            target_pitch_classes=target_pitch_classes,
+            config=config,
+            state=state,
+            enabled_metrics=enabled_metrics,
+        )
+        chunk = np.empty(buffer.window_size, dtype=np.float32)
+
+        while not stop_event.is_set():
+            time.sleep(config.hop_sec / 3)
+
+            samples, new_position = buffer.read_since(position, out=chunk)
+
+            # Samples skipped because we fell behind still count as elapsed time
+            skipped = new_position - position - len(samples)
+            if skipped > 0:
+                state.clock.advance(skipped)
+            position = new_position
+
+            results = analyzer.push(samples)
+            for i, result in enumerate(results):
+                window_end = analyzer.last_emit_position - (len(results) - 1 - i) * analyzer.hop_size
+                channel.write(window_end, result, QualitySnapshot.from_state(state, target_pitch_classes))
+    finally:
+        buffer.close()
+        channel.close()
+
+
+def _warm_up(target_pitch_classes: Set[int], config: QualityConfig) -> None:
+    """Run one throwaway window so lazy imports and first-call setup happen before live audio."""
+    t = np.arange(int(config.sample_rate * config.window_sec) + 1) / config.sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+    StreamingAnalyzer(target_pitch_classes, config, QualityState()).push(tone)
+
+
+class AnalysisProcess:
+    """
+    Host-side handle for a run_analysis_worker process.
+
+    Uses the spawn start method so the worker never inherits the host's
+    audio stream, DB connections or threads.
+    """
+
+    def __init__(
+        self,
+        buffer: SharedRingBuffer,
+        target_pitch_classes: Set[int],
+        config: QualityConfig,
+        enabled_metrics: Optional[Dict[str, bool]] = None,
+        channel_capacity: int = 64,
+    ):
+        self.buffer = buffer
+        self.channel = ResultChannel(channel_capacity)
+        ctx = mp.get_context("spawn")
+        self._stop = ctx.Event()
+        self._ready = ctx.Event()
+        self._process = ctx.Process(
+            target=run_analysis_worker,
+            args=(
+                buffer.name,
+                self.channel.name,
+                self._stop,
+                self._ready,
+                target_pitch_classes,
+                config,
+                enabled_metrics,
+            ),
+            name="fretcoach-analysis",
+            daemon=True,
+        )
+        self._position = 0
+
+    def start(self, timeout: float = 15.0) -> bool:
+        """
+        Start the worker and wait until it is warmed up.
+
+        Returns:
+            True if the worker reported ready within `timeout` seconds
+        """
+        self._process.start()
+        return self._ready.wait(timeout)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def poll(self) -> List:
+        """Return the channel records published since the last poll."""
+        records, self._position = self.channel.read_since(self._position)
+        return records
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the worker and release the result channel."""
+        self._stop.set()
+        self._process.join(timeout=timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=timeout)
+        self.channel.close()
@@ -0,0 +1,206 @@
+"""
+Preallocated audio ring buffer for FretCoach.
+Single-producer/single-consumer: the audio callback writes, the analysis loop reads.
+SharedRingBuffer places the same buffer in shared memory so the reader can be
+another process.
+"""
+
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    NumPy-backed circular buffer of float32 samples.
+
+    The producer (audio callback) copies each block straight into the
+    preallocated array and then publishes it by advancing a monotonic write
+    counter. The consumer only reads that counter, so no lock is needed as
+    long as there is exactly one writer and one reader. The buffer holds
+    `headroom` extra blocks of slack so a block being written never overlaps
+    the window the consumer is copying out.
+    """
+
+    def __init__(self, window_size: int, headroom: int = None, dtype=np.float32):
+        """
+        Args:
+            window_size: Number of samples the consumer reads per analysis frame
+            headroom: Extra samples of slack beyond window_size (default: one window)
+            dtype: Sample dtype
+        """
+        if headroom is None:
+            headroom = window_size
+        self.window_size = window_size
+        self.capacity = window_size + headroom
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._written = 0  # Total samples ever written (only the producer updates this)
+
+    def write(self, block: np.ndarray) -> None:
+        """Copy a block of samples into the buffer (producer side)."""
+        n = len(block)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            # Only the newest samples can fit
+            block = block[-self.capacity:]
+            skipped = n - self.capacity
+            n = self.capacity
+        else:
+            skipped = 0
+
+        start = (self._written + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        if first < n:
+            self._data[:n - first] = block[first:]
+
+        # Publish only after the copy is complete
+        self._written += skipped + n
+
+    def __len__(self) -> int:
+        """Number of valid samples currently held."""
+        return min(self._written, self.capacity)
+
+    @property
+    def total_written(self) -> int:
+        """Total number of samples written since creation or the last clear()."""
+        return self._written
+
+    def read_latest(self, n: int = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        Return the most recent `n` samples in chronological order (consumer side).
+
+        A view into the buffer is returned when the samples are contiguous;
+        otherwise they are gathered with a single copy into `out` (allocated
+        if not given). Callers that keep the result across ticks should pass
+        their own `out` array.
+
+        Args:
+            n: Number of samples to read (default: window_size)
+            out: Optional preallocated destination array of length n
+
+        Returns:
+            Array of the last n samples
+        """
+        if n is None:
+            n = self.window_size
+        written = self._written
+        if n > min(written, self.capacity):
+            raise ValueError(f"Requested {n} samples but only {min(written, self.capacity)} available")
+        return self._copy_out(written, n, out)
+
+    def read_since(self, position: int, out: np.ndarray = None):
+        """
+        Return the samples written after absolute sample `position` (consumer side).
+
+        If the consumer has fallen more than window_size samples behind, the
+        older samples are skipped and only the newest window_size are returned.
+
+        Args:
+            position: Absolute sample position already consumed (see total_written)
+            out: Optional preallocated destination array of at least window_size samples
+
+        Returns:
+            Tuple of (samples, new_position)
+        """
+        written = self._written
+        start = max(position, written - self.window_size, 0)
+        n = written - start
+        if n <= 0:
+            return self._data[:0], written
+        if out is not None:
+            out = out[:n]
+        return self._copy_out(written, n, out), written
+
+    def _copy_out(self, written: int, n: int, out: np.ndarray = None) -> np.ndarray:
+        """Gather the n samples ending at absolute position `written`."""
+        end = written % self.capacity
+        start = end - n
+        if start >= 0 and out is None:
+            return self._data[start:end]
+
+        if out is None:
+            out = np.empty(n, dtype=self._data.dtype)
+        if start >= 0:
+            out[:] = self._data[start:end]
+        else:
+            out[:-start] = self._data[start:]
+            out[-start:] = self._data[:end]
+        return out
+
+    def clear(self) -> None:
+        """Discard all samples. Only call while the producer is stopped."""
+        self._written = 0
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block without registering it for cleanup in this process."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer whose samples and write counter live in a shared memory block.
+
+    The creating process owns the block; a reader process attaches by name
+    with SharedRingBuffer.attach(name). Layout: an int64 header of
+    [written, window_size, capacity] followed by the float32 samples. The
+    write counter is one aligned 8-byte store, published after the sample
+    copy just like in RingBuffer, so the SPSC protocol is unchanged.
+    """
+
+    HEADER_FIELDS = 3
+
+    def __init__(self, window_size: int, headroom: int = None, name: str = None, _shm=None):
+        if _shm is None:
+            if headroom is None:
+                headroom = window_size
+            capacity = window_size + headroom
+            _shm = shared_memory.SharedMemory(
+                name=name, create=True, size=8 * self.HEADER_FIELDS + 4 * capacity
+            )
+            header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=_shm.buf)
+            header[:] = (0, window_size, capacity)
+            self._owner = True
+        else:
+            header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=_shm.buf)
+            self._owner = False
+
+        self._shm = _shm
+        self._header = header
+        self.window_size = int(header[1])
+        self.capacity = int(header[2])
+        self._data = np.ndarray((self.capacity,), dtype=np.float32, buffer=_shm.buf, offset=8 * self.HEADER_FIELDS)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedRingBuffer":
+        """Open an existing shared buffer created by another process."""
+        return cls(0, _shm=attach_shared_memory(name))
+
+    @property
+    def name(self) -> str:
+        """Shared memory block name to pass to attach()."""
+        return self._shm.name
+
+    @property
+    def _written(self) -> int:
+        return int(self._header[0])
+
+    @_written.setter
+    def _written(self, value: int) -> None:
+        self._header[0] = value
+
+    def close(self) -> None:
+        """Detach from the block; the creating process also unlinks it."""
+        self._data = None
+        self._header = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -2,9 +2,11 @@
 Audio Feature Extraction for FretCoach
 Contains AI-powered feature functions for analyzing guitar performance.
 """
+import abc
 import os
 import numpy as np
 import librosa
+from numpy.lib.stride_tricks import sliding_window_view
 
 # NOTE: Opik tracking disabled for audio features - called on every frame, eats quota
 # These functions are called hundreds of times per second during live audio processing
@@ -13,6 +15,233 @@ import librosa
 DEBUG_AUDIO = os.environ.get("FRETCOACH_DEBUG_AUDIO", "0") == "1"
 
 
+class PitchEngine(abc.ABC):
+    """
+    Interface for the monophonic pitch detector behind pitch_correctness/pitch_stability.
+
+    Subclasses implement estimate(), which returns (fundamental_hz, stable_pitches):
+    the single fundamental for the frame (0.0 if none) and the array of pitch
+    values used to judge how steady the note is held.
+    """
+    name = ""
+    uses_spectrogram = False
+
+    @abc.abstractmethod
+    def estimate(self, analysis):
+        """Return (fundamental_hz, stable_pitches) for a FrameAnalysis."""
+
+
+class PiptrackEngine(PitchEngine):
+    """Original detector: strongest librosa.piptrack peak over the whole frame."""
+    name = "piptrack"
+    uses_spectrogram = True
+
+    def estimate(self, analysis):
+        pitches, mags = analysis.pitch_track
+        fundamental = float(pitches.flatten()[mags.argmax()])
+        stable = pitches[mags > np.max(mags) * 0.7]
+        return fundamental, stable
+
+
+class YinEngine(PitchEngine):
+    """
+    Vectorized YIN detector (de Cheveigné & Kawahara, 2002) in plain NumPy.
+
+    The frame is split into short sub-frames and the cumulative mean normalized
+    difference function is computed for all of them at once via FFT
+    cross-correlation. Each sub-frame takes the first trough under `threshold`,
+    which avoids the octave-up errors piptrack makes below its 150 Hz floor
+    (e.g. on the low E string). The fundamental is the median of the voiced
+    sub-frames and the voiced contour is used for stability.
+    """
+    name = "yin"
+    uses_spectrogram = False
+
+    def __init__(
+        self,
+        fmin=70.0,
+        fmax=1400.0,
+        frame_length=1280,
+        hop_length=1280,
+        threshold=0.15,
+        max_aperiodicity=0.35,
+    ):
+        """
+        Args:
+            fmin: Lowest detectable pitch in Hz (below drop-D low string)
+            fmax: Highest detectable pitch in Hz (above the 24th fret, high E)
+            frame_length: Sub-frame length in samples (must exceed two periods of fmin;
+                1280 keeps the correlation FFT at 2048 points for 44.1 kHz)
+            hop_length: Samples between sub-frames
+            threshold: Aperiodicity under which the first trough is accepted
+            max_aperiodicity: Sub-frames whose best trough is above this are unvoiced
+        """
+        self.fmin = fmin
+        self.fmax = fmax
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.threshold = threshold
+        self.max_aperiodicity = max_aperiodicity
+
+    def estimate(self, analysis):
+        f0 = self.contour(analysis.audio, analysis.sample_rate)
+        voiced = f0[f0 > 0]
+        fundamental = float(np.median(voiced)) if len(voiced) else 0.0
+        return fundamental, voiced
+
+    def contour(self, audio, sample_rate):
+        """
+        Per-sub-frame fundamental frequency.
+
+        Returns:
+            Array of f0 values in Hz, 0.0 for unvoiced sub-frames
+        """
+        tau_min = max(2, int(sample_rate / self.fmax))
+        tau_max = int(sample_rate / self.fmin)
+        frame_length = self.frame_length
+        if frame_length <= 2 * tau_max:
+            frame_length = 2 * tau_max + 1
+        if len(audio) < frame_length:
+            return np.zeros(0)
+
+        frames = sliding_window_view(np.asarray(audio, dtype=np.float64), frame_length)[::self.hop_length]
+        n_frames = frames.shape[0]
+        width = frame_length - tau_max
+
+        # Difference function d(tau) = E(0) + E(tau) - 2 r(tau), with the
+        # cross-correlation r computed by FFT for all sub-frames at once
+        n_fft = 1 << int(np.ceil(np.log2(frame_length + width)))
+        spec_head = np.fft.rfft(frames[:, :width], n_fft)
+        spec_full = np.fft.rfft(frames, n_fft)
+        corr = np.fft.irfft(np.conj(spec_head) * spec_full, n_fft)[:, :tau_max + 1]
+
+        power = np.cumsum(frames ** 2, axis=1)
+        power = np.concatenate([np.zeros((n_frames, 1)), power], axis=1)
+        energy = power[:, width:width + tau_max + 1] - power[:, :tau_max + 1]
+
+        diff = np.maximum(energy[:, :1] + energy - 2.0 * corr, 0.0)
+        diff[:, 0] = 0.0
+
+        # Cumulative mean normalized difference
+        cmnd = np.ones_like(diff)
+        taus = np.arange(1, tau_max + 1)
+        cmnd[:, 1:] = diff[:, 1:] * taus / (np.cumsum(diff[:, 1:], axis=1) + 1e-12)
+
+        region = cmnd[:, tau_min:tau_max]
+        is_trough = np.ones_like(region, dtype=bool)
+        is_trough[:, 1:] &= region[:, 1:] <= region[:, :-1]
+        is_trough[:, :-1] &= region[:, :-1] < region[:, 1:]
+        candidates = is_trough & (region < self.threshold)
+
+        has_candidate = candidates.any(axis=1)
+        best = np.where(has_candidate, candidates.argmax(axis=1), region.argmin(axis=1))
+        tau = best + tau_min
+        rows = np.arange(n_frames)
+        aperiodicity = cmnd[rows, tau]
+
+        # Parabolic interpolation around the chosen trough
+        left = cmnd[rows, tau - 1]
+        right = cmnd[rows, np.minimum(tau + 1, tau_max)]
+        denom = left - 2.0 * aperiodicity + right
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1.0, denom), 0.0)
+        shift = np.clip(shift, -1.0, 1.0)
+
+        f0 = sample_rate / (tau + shift)
+        silent = energy[:, 0] < 1e-10 * width
+        f0[(aperiodicity > self.max_aperiodicity) | silent] = 0.0
+        return f0
+
+
+PITCH_ENGINES = {
+    PiptrackEngine.name: PiptrackEngine(),
+    YinEngine.name: YinEngine(),
+}
+
+
+def get_pitch_engine(name):
+    """Look up a registered pitch engine by name."""
+    try:
+        return PITCH_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown pitch engine '{name}'. Available: {sorted(PITCH_ENGINES)}") from None
+
+
+class FrameAnalysis:
+    """
+    Spectral analysis of a single audio frame, shared by all feature functions.
+
+    The magnitude spectrogram, pitch track and pitch estimate are computed
+    lazily on first access and then reused, so each runs at most once per
+    frame no matter how many features consume it. A streaming caller that
+    already holds the STFT columns for this window can pass them in as
+    `spectrogram`.
+    """
+
+    def __init__(self, audio, sample_rate, spectrogram=None, pitch_engine="piptrack"):
+        """
+        Args:
+            audio: Audio buffer (numpy array)
+            sample_rate: Audio sample rate
+            spectrogram: Optional precomputed magnitude STFT of `audio`
+            pitch_engine: Name of a registered pitch engine (see PITCH_ENGINES)
+        """
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.engine = get_pitch_engine(pitch_engine)
+        self._energy = None
+        self._spectrogram = spectrogram
+        self._pitches = None
+        self._mags = None
+        self._estimate = None
+
+    @property
+    def energy(self):
+        """Mean signal power of the frame."""
+        if self._energy is None:
+            self._energy = float(np.mean(self.audio ** 2))
+        return self._energy
+
+    @property
+    def spectrogram(self):
+        """Magnitude STFT of the frame (same parameters piptrack uses by default)."""
+        if self._spectrogram is None:
+            self._spectrogram = np.abs(librosa.stft(self.audio))
+        return self._spectrogram
+
+    @property
+    def pitch_track(self):
+        """Tuple of (pitches, magnitudes) from librosa.piptrack."""
+        if self._pitches is None:
+            self._pitches, self._mags = librosa.piptrack(S=self.spectrogram, sr=self.sample_rate)
+        return self._pitches, self._mags
+
+    @property
+    def pitch_estimate(self):
+        """Tuple of (fundamental_hz, stable_pitches) from the selected pitch engine."""
+        if self._estimate is None:
+            self._estimate = self.engine.estimate(self)
+        return self._estimate
+
+
+def stft_columns(audio, n_fft=2048, hop_length=512):
+    """
+    Magnitude STFT of `audio` without edge padding.
+
+    Frames start at multiples of hop_length from the start of `audio`, so
+    consecutive calls over adjacent segments produce columns that line up
+    with a single STFT over the whole stream.
+
+    Args:
+        audio: Audio buffer (numpy array), at least n_fft samples long
+        n_fft: FFT window size
+        hop_length: Samples between successive frames
+
+    Returns:
+        Array of shape (1 + n_fft // 2, n_frames)
+    """
+    return np.abs(librosa.stft(audio, n_fft=n_fft, hop_length=hop_length, center=False))
+
+
 def detect_note_onset(audio, sample_rate, threshold=0.15):
     """
     Detect if there's a note onset (attack) in the audio frame.
@@ -36,7 +265,7 @@ def detect_note_onset(audio, sample_rate, threshold=0.15):
 
 
 
-def pitch_correctness(audio, sample_rate, target_pitch_classes, debug=False):
+def pitch_correctness(audio, sample_rate, target_pitch_classes, debug=False, analysis=None):
     """
     Evaluate pitch correctness against target scale.
 
@@ -45,15 +274,16 @@ def pitch_correctness(audio, sample_rate, target_pitch_classes, debug=False):
         sample_rate: Audio sample rate
         target_pitch_classes: Set of valid pitch classes for the scale
         debug: If True, print debug information
+        analysis: Optional FrameAnalysis for this frame (avoids recomputing the STFT)
 
     Returns:
         Tuple of (score, debug_dict) where:
         - score: float between 0.0 and 1.0 (0.0 for wrong notes, 0.0-1.0 for intonation quality)
         - debug_dict: dict with detected_hz, detected_midi, pitch_class, in_scale, note_detected
     """
-    pitches, mags = librosa.piptrack(y=audio, sr=sample_rate)
-    idx = mags.argmax()
-    pitch = pitches.flatten()[idx]
+    if analysis is None:
+        analysis = FrameAnalysis(audio, sample_rate)
+    pitch, _ = analysis.pitch_estimate
 
     debug_dict = {
         "detected_hz": float(pitch),
@@ -86,19 +316,21 @@ def pitch_correctness(audio, sample_rate, target_pitch_classes, debug=False):
     return score, debug_dict
 
 
-def pitch_stability(audio, sample_rate):
+def pitch_stability(audio, sample_rate, analysis=None):
     """
     Evaluate pitch stability (how steady the note is held).
 
     Args:
         audio: Audio buffer (numpy array)
         sample_rate: Audio sample rate
+        analysis: Optional FrameAnalysis for this frame (avoids recomputing the STFT)
 
     Returns:
         Score between 0.0 and 1.0
     """
-    pitches, mags = librosa.piptrack(y=audio, sr=sample_rate)
-    stable = pitches[mags > np.max(mags) * 0.7]
+    if analysis is None:
+        analysis = FrameAnalysis(audio, sample_rate)
+    _, stable = analysis.pitch_estimate
     if len(stable) < 5:
         return 0.5
     return np.exp(-np.std(stable))
@@ -112,13 +344,143 @@ def timing_cleanliness(audio, sample_rate, onset_history=None):
     return 0.5
 
 
+class OnsetHistory:
+    """
+    Fixed-capacity circular store of note onset times (ms).
+
+    Alongside the raw onsets it keeps the intervals between the last
+    `window_size` notes in a preallocated sorted array, updated by insertion
+    on each new onset. The median and in-range ratio used for timing
+    stability then come from index lookups on that array, and the score is
+    cached until the next onset, so per-frame calls allocate nothing and
+    memory stays flat for any session length.
+    """
+
+    def __init__(self, window_size=15, capacity=64):
+        """
+        Args:
+            window_size: Number of most recent notes the timing statistics cover
+            capacity: Number of onset times retained (at least window_size)
+        """
+        self.window_size = window_size
+        self.capacity = max(capacity, window_size)
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._count = 0
+
+        n_intervals = max(window_size - 1, 1)
+        self._intervals = np.zeros(n_intervals, dtype=np.float64)  # Circular, oldest at _interval_pos when full
+        self._interval_pos = 0
+        self._sorted = np.zeros(n_intervals, dtype=np.float64)
+        self._n_sorted = 0
+        self._cached = None
+
+    def __len__(self):
+        """Number of onset times currently retained."""
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self):
+        """Total onsets appended since creation or the last clear()."""
+        return self._count
+
+    @property
+    def last(self):
+        """Most recent onset time, or None if empty."""
+        if self._count == 0:
+            return None
+        return float(self._times[(self._count - 1) % self.capacity])
+
+    def append(self, onset_ms):
+        """Record a new onset time."""
+        if self._count > 0:
+            self._add_interval(onset_ms - self._times[(self._count - 1) % self.capacity])
+        self._times[self._count % self.capacity] = onset_ms
+        self._count += 1
+        self._cached = None
+
+    def recent(self, n=None):
+        """Copy of the last n retained onset times in chronological order."""
+        n = len(self) if n is None else min(n, len(self))
+        idx = (np.arange(self._count - n, self._count)) % self.capacity
+        return self._times[idx]
+
+    def clear(self):
+        """Forget all onsets."""
+        self._count = 0
+        self._interval_pos = 0
+        self._n_sorted = 0
+        self._cached = None
+
+    def _add_interval(self, interval):
+        """Push an interval into the window, evicting the oldest when full."""
+        n = self._n_sorted
+        sorted_ = self._sorted
+        if n == len(self._intervals):
+            oldest = self._intervals[self._interval_pos]
+            i = np.searchsorted(sorted_[:n], oldest)
+            sorted_[i:n - 1] = sorted_[i + 1:n]
+            n -= 1
+
+        self._intervals[self._interval_pos] = interval
+        self._interval_pos = (self._interval_pos + 1) % len(self._intervals)
+
+        i = np.searchsorted(sorted_[:n], interval)
+        sorted_[i + 1:n + 1] = sorted_[i:n]
+        sorted_[i] = interval
+        self._n_sorted = n + 1
+
+    def timing_stability(self):
+        """
+        Timing stability over the last window_size notes.
+
+        Same scoring as calculate_note_timing_stability, computed from the
+        incrementally maintained interval statistics.
+
+        Returns:
+            Tuple of (score, notes_analyzed)
+        """
+        if self._cached is None:
+            self._cached = self._compute_timing_stability()
+        return self._cached
+
+    def _compute_timing_stability(self):
+        if self._count < 3:
+            return 0.0, self._count
+
+        window = min(self.window_size, self._count)
+        n = self._n_sorted
+        if n < 2:
+            return 0.0, window
+
+        intervals = self._sorted[:n]
+        mid = n // 2
+        median_interval = intervals[mid] if n % 2 else 0.5 * (intervals[mid - 1] + intervals[mid])
+
+        if median_interval < 50.0:  # Less than 50ms = too fast to be intentional
+            return 0.0, window
+
+        if DEBUG_AUDIO:
+            import random
+            if random.random() < 0.1:  # Print 10% of the time
+                print(f"[TIMING DEBUG] {window} notes, median interval: {median_interval:.0f}ms")
+
+        lower = np.searchsorted(intervals, median_interval * 0.5, side="left")
+        upper = np.searchsorted(intervals, median_interval * 1.5, side="right")
+        timing_score = (upper - lower) / n
+
+        if window >= 8:
+            timing_score = min(1.0, timing_score * 1.1)  # 10% bonus for 8+ notes
+
+        return float(np.clip(timing_score, 0.0, 1.0)), window
+
+
 def calculate_note_timing_stability(onset_times_ms, window_size=15, consistency_threshold=0.15):
     """
     Calculate timing stability based on note onset times.
     SIMPLIFIED: Measures what percentage of intervals are reasonably consistent.
 
     Args:
-        onset_times_ms: List of note onset times in milliseconds
+        onset_times_ms: OnsetHistory or list of note onset times in milliseconds
         window_size: Number of notes to analyze (default 15)
         consistency_threshold: Not used in simplified version
 
@@ -127,6 +489,11 @@ def calculate_note_timing_stability(onset_times_ms, window_size=15, consistency_
         - score: Float between 0.0 and 1.0 (0.0 = very inconsistent, 1.0 = perfectly consistent)
         - notes_analyzed: Number of notes that could be analyzed
     """
+    if isinstance(onset_times_ms, OnsetHistory):
+        if onset_times_ms.window_size == window_size:
+            return onset_times_ms.timing_stability()
+        onset_times_ms = onset_times_ms.recent(window_size)
+
     if len(onset_times_ms) < 3:
         # Need at least 3 notes to calculate timing (2 intervals)
         return 0.0, len(onset_times_ms)
@@ -177,21 +544,146 @@ def calculate_note_timing_stability(onset_times_ms, window_size=15, consistency_
     return float(np.clip(timing_score, 0.0, 1.0)), window
 
 
-def noise_control(audio):
+def noise_control(audio, analysis=None):
     """
     Evaluate noise control (signal-to-noise ratio).
 
     Args:
         audio: Audio buffer (numpy array)
+        analysis: Optional FrameAnalysis for this frame (reuses its energy)
 
     Returns:
         Score between 0.0 and 1.0
     """
-    total = np.mean(audio ** 2)
+    total = analysis.energy if analysis is not None else np.mean(audio ** 2)
     noise = np.mean((audio - np.mean(audio)) ** 2)
     return np.clip(1 - noise / (total + 1e-9), 0, 1)
 
 
+def pitch_class_mask(pitch_classes):
+    """12-bit mask with bit `pc` set for every pitch class in the collection."""
+    mask = getattr(pitch_classes, "mask", None)  # scales.Scale carries its mask
+    if mask is not None:
+        return mask
+    mask = 0
+    for pc in pitch_classes:
+        mask |= 1 << int(pc)
+    return mask
+
+
+class NoteHistogram:
+    """
+    12-bin pitch-class histogram with running totals for one target scale.
+
+    Counts live in a fixed NumPy int array and the scale is held as a 12-bit
+    mask. Every add() updates the total, in-scale count, unique-note count
+    and the sum of squared in-scale counts, so in/out-of-scale counts and
+    scale coverage are O(1) reads instead of passes over a dict each frame.
+
+    Also supports the read-only dict interface (get/items/values/[pc]) of
+    the plain {pitch_class: count} dict it replaces.
+    """
+
+    def __init__(self, target_pitch_classes=()):
+        self.counts = np.zeros(12, dtype=np.int64)
+        self.total = 0
+        self.unique = 0
+        self.in_scale = 0
+        self._in_scale_sumsq = 0
+        self._target = None
+        self.scale_mask = 0
+        self._scale_size = 0
+        self._coverage = None
+        self.set_scale(target_pitch_classes)
+
+    @property
+    def out_of_scale(self):
+        """Notes played outside the target scale."""
+        return self.total - self.in_scale
+
+    def set_scale(self, target_pitch_classes):
+        """Select the target scale; running totals are recomputed if it changed."""
+        if target_pitch_classes is self._target:
+            return
+        self._target = target_pitch_classes
+        mask = pitch_class_mask(target_pitch_classes)
+        if mask == self.scale_mask and self._scale_size:
+            return
+
+        self.scale_mask = mask
+        self._scale_size = bin(mask).count("1")
+        in_scale_bins = self.counts[[(mask >> pc) & 1 == 1 for pc in range(12)]]
+        self.in_scale = int(in_scale_bins.sum())
+        self._in_scale_sumsq = int((in_scale_bins ** 2).sum())
+        self._coverage = None
+
+    def add(self, pitch_class):
+        """Count one detected note."""
+        count = int(self.counts[pitch_class])
+        self.counts[pitch_class] = count + 1
+        self.total += 1
+        if count == 0:
+            self.unique += 1
+        if (self.scale_mask >> pitch_class) & 1:
+            self.in_scale += 1
+            self._in_scale_sumsq += 2 * count + 1
+        self._coverage = None
+
+    def clear(self):
+        """Reset all counts (the target scale is kept)."""
+        self.counts[:] = 0
+        self.total = 0
+        self.unique = 0
+        self.in_scale = 0
+        self._in_scale_sumsq = 0
+        self._coverage = None
+
+    def coverage(self):
+        """
+        Scale coverage for the target scale (same formula as calculate_scale_coverage).
+
+        Uses the running sums: with S in-scale notes over k scale bins, the
+        std of the per-note shares c_i / S is sqrt(sum(c_i^2) / (k S^2) - 1 / k^2).
+        """
+        if self._coverage is None:
+            self._coverage = self._compute_coverage()
+        return self._coverage
+
+    def _compute_coverage(self):
+        k = self._scale_size
+        scale_total = self.in_scale
+        if k == 0 or self.total == 0 or scale_total == 0:
+            return 0.0
+
+        mean_share = 1.0 / k
+        variance = self._in_scale_sumsq / (k * scale_total * scale_total) - mean_share * mean_share
+        cv = np.sqrt(max(variance, 0.0)) / mean_share
+        evenness_score = np.exp(-2.0 * cv)
+        final_score = evenness_score * (scale_total / self.total)
+        return float(np.clip(final_score, 0.0, 1.0))
+
+    # Read-only dict interface
+    def __getitem__(self, pitch_class):
+        return int(self.counts[pitch_class])
+
+    def get(self, pitch_class, default=0):
+        if 0 <= pitch_class < 12:
+            return int(self.counts[pitch_class])
+        return default
+
+    def items(self):
+        return [(pc, int(c)) for pc, c in enumerate(self.counts) if c > 0]
+
+    def values(self):
+        return [int(c) for c in self.counts if c > 0]
+
+    def __len__(self):
+        return self.unique
+
+    def __bool__(self):
+        return self.total > 0
+
+
 def calculate_scale_coverage(note_counts, target_pitch_classes):
     """
     Calculate how evenly distributed the played notes are across the scale.
@@ -200,7 +692,7 @@ def calculate_scale_coverage(note_counts, target_pitch_classes):
     means each note is played equally. Playing only one note repeatedly = low score.
 
     Args:
-        note_counts: Dict with pitch_class as key and play count as value
+        note_counts: NoteHistogram, or dict with pitch_class as key and play count as value
                      e.g., {0: 50, 2: 40, 5: 60} for uneven playing
         target_pitch_classes: Set of pitch classes in the target scale
 
@@ -213,6 +705,10 @@ def calculate_scale_coverage(note_counts, target_pitch_classes):
     if not target_pitch_classes or not note_counts:
         return 0.0
 
+    if isinstance(note_counts, NoteHistogram):
+        note_counts.set_scale(target_pitch_classes)
+        return note_counts.coverage()
+
     num_scale_notes = len(target_pitch_classes)
 
     # Get counts for scale notes
@@ -5,15 +5,23 @@ Used by both the API (audio_processor.py) and CLI (fret_coach.py).
 
 import time
 import numpy as np
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, Set, Optional, Tuple, Dict
+from typing import Any, Dict, Set, Optional, Tuple, Dict, List
 
+from audio_buffer import RingBuffer
+from perf import get_profiler
 from audio_features import (
+    FrameAnalysis,
+    get_pitch_engine,
+    stft_columns,
     pitch_correctness,
     pitch_stability,
     calculate_note_timing_stability,
+    OnsetHistory,
     noise_control,
     calculate_scale_coverage,
+    NoteHistogram,
     detect_note_onset,
     DEBUG_AUDIO,
 )
@@ -26,6 +34,48 @@ class QualityConfig:
     sensitivity: float = 0.5
     sample_rate: int = 44100
     phrase_window: float = 0.8
+    window_sec: float = 0.30  # Analysis window length (streaming mode)
+    hop_sec: float = 0.15  # Interval between results (streaming mode)
+    pitch_engine: str = "piptrack"  # "piptrack" or "yin" (see audio_features.PITCH_ENGINES)
+
+
+class SampleClock:
+    """
+    Session clock driven by the number of audio samples consumed.
+
+    Timestamps are the position of the end of the latest analysed audio, so
+    onset timing reflects when notes were played rather than when the
+    processing thread woke up, and offline replay is reproducible.
+    """
+
+    def __init__(self, sample_rate: int = 44100):
+        self.sample_rate = sample_rate
+        self.samples = 0
+
+    def advance(self, n_samples: int):
+        """Account for n_samples of newly consumed audio."""
+        self.samples += n_samples
+
+    def now(self) -> float:
+        """Current time in seconds since the session started."""
+        return self.samples / self.sample_rate
+
+    def reset(self):
+        """Restart the clock at zero."""
+        self.samples = 0
+
+
+class WallClock:
+    """Clock based on time.time(); ignores sample counts (legacy behaviour)."""
+
+    def advance(self, n_samples: int):
+        pass
+
+    def now(self) -> float:
+        return time.time()
+
+    def reset(self):
+        pass
 
 
 @dataclass
@@ -34,17 +84,23 @@ class QualityState:
     ema_quality: float = 0.0
     ema_pitch: float = 0.0
     ema_timing: float = 0.0
-    last_phrase_time: float = field(default_factory=time.time)
-    note_counts: Dict[int, int] = field(default_factory=dict)
-    note_onset_times_ms: list = field(default_factory=list)
+    last_phrase_time: float = 0.0
+    note_counts: NoteHistogram = field(default_factory=NoteHistogram)
+    note_onset_times_ms: OnsetHistory = field(default_factory=OnsetHistory)
     last_pitch_class: Optional[int] = None
+    clock: Any = field(default_factory=SampleClock)  # SampleClock, WallClock or any object with advance/now/reset
+
+    def __post_init__(self):
+        if isinstance(self.clock, WallClock):
+            self.last_phrase_time = self.clock.now()
 
     def reset(self):
         """Reset state for a new session."""
         self.ema_quality = 0.0
         self.ema_pitch = 0.0
         self.ema_timing = 0.0
-        self.last_phrase_time = time.time()
+        self.clock.reset()
+        self.last_phrase_time = self.clock.now()
         self.note_counts.clear()
         self.note_onset_times_ms.clear()
         self.last_pitch_class = None
@@ -52,21 +108,17 @@ class QualityState:
     @property
     def total_notes(self) -> int:
         """Total notes played."""
-        return sum(self.note_counts.values())
+        return self.note_counts.total
 
     def notes_in_scale(self, target_pitch_classes: Set[int]) -> int:
         """Count of notes played that are in the target scale."""
-        return sum(
-            count for pc, count in self.note_counts.items()
-            if pc in target_pitch_classes
-        )
+        self.note_counts.set_scale(target_pitch_classes)
+        return self.note_counts.in_scale
 
     def notes_out_of_scale(self, target_pitch_classes: Set[int]) -> int:
         """Count of notes played that are outside the target scale."""
-        return sum(
-            count for pc, count in self.note_counts.items()
-            if pc not in target_pitch_classes
-        )
+        self.note_counts.set_scale(target_pitch_classes)
+        return self.note_counts.out_of_scale
 
 
 @dataclass
@@ -176,7 +228,9 @@ def process_audio_frame(
     target_pitch_classes: Set[int],
     config: QualityConfig,
     state: QualityState,
-    enabled_metrics: Optional[Dict[str, bool]] = None
+    enabled_metrics: Optional[Dict[str, bool]] = None,
+    analysis: Optional[FrameAnalysis] = None,
+    now: Optional[float] = None,
 ) -> Optional[QualityResult]:
     """
     Process a single audio frame and update quality metrics.
@@ -186,17 +240,32 @@ def process_audio_frame(
         target_pitch_classes: Set of valid pitch classes for the scale
         config: Quality configuration
         state: Mutable quality state (will be updated)
+        enabled_metrics: Optional dict of enabled metric flags
+        analysis: Optional precomputed FrameAnalysis of `audio`
+        now: Timestamp of the frame in seconds (default: state.clock.now())
 
     Returns:
         QualityResult if audio has sufficient energy, None otherwise
     """
+    if now is None:
+        now = state.clock.now()
+
+    profiler = get_profiler()
+    profiler.start_frame()
+
+    # Spectral analysis is computed once and shared by every feature below
+    if analysis is None:
+        analysis = FrameAnalysis(audio, config.sample_rate, pitch_engine=config.pitch_engine)
+
     # Check if there's enough energy
-    energy = np.mean(audio ** 2)
-    if energy < calculate_energy_threshold(config.sensitivity):
+    if analysis.energy < calculate_energy_threshold(config.sensitivity):
+        profiler.mark("energy_gate")
         return None
+    profiler.mark("energy_gate")
 
     # Calculate pitch correctness
-    p, debug_info = pitch_correctness(audio, config.sample_rate, target_pitch_classes)
+    p, debug_info = pitch_correctness(audio, config.sample_rate, target_pitch_classes, analysis=analysis)
+    profiler.mark("pitch")
 
     # Track notes played
     note_detected = debug_info.get("note_detected", False)
@@ -206,12 +275,13 @@ def process_audio_frame(
     # Track note onsets for timing analysis
     # ONLY track when pitch class CHANGES (different note played)
     # Also track silence to handle same-note-after-pause (C → silence → C)
-    current_time_ms = time.time() * 1000.0
+    current_time_ms = now * 1000.0
 
     last_pitch = state.last_pitch_class
 
     if note_detected and pitch_class is not None:
-        state.note_counts[pitch_class] = state.note_counts.get(pitch_class, 0) + 1
+        state.note_counts.set_scale(target_pitch_classes)
+        state.note_counts.add(pitch_class)
 
         # Track as onset if:
         # 1. Different pitch than last time (C → D)
@@ -220,8 +290,8 @@ def process_audio_frame(
 
         if is_new_note:
             time_since_last = 0
-            if len(state.note_onset_times_ms) > 0:
-                time_since_last = current_time_ms - state.note_onset_times_ms[-1]
+            if state.note_onset_times_ms.last is not None:
+                time_since_last = current_time_ms - state.note_onset_times_ms.last
 
             state.note_onset_times_ms.append(current_time_ms)
             state.last_pitch_class = pitch_class
@@ -230,7 +300,7 @@ def process_audio_frame(
             if DEBUG_AUDIO:
                 import random
                 if random.random() < 0.15:  # 15% of the time
-                    print(f"[ONSET DEBUG] Onset #{len(state.note_onset_times_ms)}: {last_pitch}→{pitch_class}, gap={time_since_last:.0f}ms")
+                    print(f"[ONSET DEBUG] Onset #{state.note_onset_times_ms.total}: {last_pitch}→{pitch_class}, gap={time_since_last:.0f}ms")
     else:
         # No note detected = silence
         # Reset last_pitch so next note (even if same pitch class) triggers onset
@@ -238,14 +308,18 @@ def process_audio_frame(
             state.last_pitch_class = None  # Mark silence
 
     # Calculate other metrics
-    s = pitch_stability(audio, config.sample_rate)
+    s = pitch_stability(audio, config.sample_rate, analysis=analysis)
+    profiler.mark("stability")
     timing_score, notes_for_timing = calculate_note_timing_stability(
         state.note_onset_times_ms,
         window_size=15,  # Analyze last 15 notes for better timing consistency assessment
         consistency_threshold=0.15
     )
-    n = noise_control(audio)
+    profiler.mark("timing")
+    n = noise_control(audio, analysis=analysis)
+    profiler.mark("noise")
     scale_coverage = calculate_scale_coverage(state.note_counts, target_pitch_classes)
+    profiler.mark("coverage")
 
     # Calculate weighted quality score
     strictness = config.strictness
@@ -267,7 +341,6 @@ def process_audio_frame(
 
     # Apply wrong note penalty based on strictness
     ema_alpha = calculate_ema_alpha(strictness)
-    now = time.time()
 
     if p == 0.0:
         # Wrong note
@@ -292,6 +365,7 @@ def process_audio_frame(
     metric_alpha = 0.25  # Increased from 0.15 for faster response
     state.ema_pitch = metric_alpha * p + (1 - metric_alpha) * state.ema_pitch
     state.ema_timing = metric_alpha * timing_score + (1 - metric_alpha) * state.ema_timing
+    profiler.mark("scoring")
 
     return QualityResult(
         pitch_score=p,
@@ -309,6 +383,131 @@ def process_audio_frame(
     )
 
 
+class StreamingAnalyzer:
+    """
+    Hop-based streaming front end for process_audio_frame.
+
+    Audio is pushed in chunks of any size. Each STFT column is computed once,
+    when its samples arrive, and reused by every analysis window that overlaps
+    it. A result is emitted every `config.hop_sec` seconds of audio over the
+    last `config.window_sec` seconds, counted in samples rather than wall-clock
+    time, so the output is deterministic for a given input and does not
+    depend on how often the caller wakes up.
+
+    Every pushed sample advances `state.clock`, so with the default
+    SampleClock the frames are also timestamped by sample position.
+    """
+
+    def __init__(
+        self,
+        target_pitch_classes: Set[int],
+        config: QualityConfig,
+        state: QualityState,
+        enabled_metrics: Optional[Dict[str, bool]] = None,
+        n_fft: int = 2048,
+        stft_hop: int = 512,
+    ):
+        self.target_pitch_classes = target_pitch_classes
+        self.config = config
+        self.state = state
+        self.enabled_metrics = enabled_metrics
+        self.n_fft = n_fft
+        self.stft_hop = stft_hop
+        self.window_size = int(config.sample_rate * config.window_sec)
+        self.hop_size = max(1, int(config.sample_rate * config.hop_sec))
+
+        self._samples = RingBuffer(self.window_size, headroom=n_fft + self.hop_size)
+        self._frame = np.empty(self.window_size, dtype=np.float32)
+        self._columns = deque()  # (frame start sample, magnitude column)
+        self._next_column_start = 0
+        self._next_emit = self.window_size
+        # Engines that work on the raw waveform don't need the STFT at all
+        self._use_stft = get_pitch_engine(config.pitch_engine).uses_spectrogram
+
+        if isinstance(state.clock, SampleClock):
+            state.clock.sample_rate = config.sample_rate
+
+    @property
+    def samples_consumed(self) -> int:
+        """Total number of samples pushed so far."""
+        return self._samples.total_written
+
+    @property
+    def last_emit_position(self) -> int:
+        """Absolute sample position at which the most recent window ended."""
+        return self._next_emit - self.hop_size
+
+    def reset(self):
+        """Drop all buffered audio and STFT state."""
+        self._samples.clear()
+        self._columns.clear()
+        self._next_column_start = 0
+        self._next_emit = self.window_size
+
+    def push(self, samples: np.ndarray) -> List[Optional[QualityResult]]:
+        """
+        Consume new samples and return one entry per completed hop.
+
+        Entries are QualityResult, or None for hops without enough energy
+        (same semantics as process_audio_frame).
+        """
+        results = []
+        offset = 0
+        while offset < len(samples):
+            take = min(len(samples) - offset, self._next_emit - self.samples_consumed)
+            self._samples.write(samples[offset:offset + take])
+            self.state.clock.advance(take)
+            offset += take
+            if self._use_stft:
+                self._update_columns()
+
+            if self.samples_consumed == self._next_emit:
+                results.append(self._emit())
+                self._next_emit += self.hop_size
+        return results
+
+    def _update_columns(self):
+        """Compute STFT columns for every frame that is now complete."""
+        total = self.samples_consumed
+        n_new = (total - self._next_column_start - self.n_fft) // self.stft_hop + 1
+        if n_new <= 0:
+            return
+
+        profiler = get_profiler()
+        t0 = profiler.now()
+        segment_len = (n_new - 1) * self.stft_hop + self.n_fft
+        segment = self._samples.read_latest(total - self._next_column_start)[:segment_len]
+        columns = stft_columns(segment, n_fft=self.n_fft, hop_length=self.stft_hop)
+        profiler.record_since("stft", t0)
+        for i in range(columns.shape[1]):
+            self._columns.append((self._next_column_start + i * self.stft_hop, columns[:, i]))
+        self._next_column_start += n_new * self.stft_hop
+
+    def _emit(self) -> Optional[QualityResult]:
+        """Analyse the current window using the cached STFT columns."""
+        window_start = self.samples_consumed - self.window_size
+        while self._columns and self._columns[0][0] < window_start:
+            self._columns.popleft()
+
+        audio = self._samples.read_latest(self.window_size, out=self._frame)
+        spectrogram = np.stack([column for _, column in self._columns], axis=1) if self._columns else None
+        analysis = FrameAnalysis(
+            audio,
+            self.config.sample_rate,
+            spectrogram=spectrogram,
+            pitch_engine=self.config.pitch_engine,
+        )
+
+        return process_audio_frame(
+            audio=audio,
+            target_pitch_classes=self.target_pitch_classes,
+            config=self.config,
+            state=self.state,
+            enabled_metrics=self.enabled_metrics,
+            analysis=analysis,
+        )
+
+
 @dataclass
 class BulbState:
     """State for smart bulb throttling."""
@@ -319,13 +518,15 @@ class BulbState:
 
     def should_update(self, new_hue: int) -> bool:
         """Check if bulb should be updated based on throttling rules."""
-        now = time.time()
-        hue_changed = (
-            self.last_sent_hue is None or
-            abs(new_hue - self.last_sent_hue) >= self.hue_epsilon
-        )
-        time_elapsed = (now - self.last_send_time) >= self.update_interval
-        return hue_changed and time_elapsed
+        return self.hue_changed(new_hue) and self.time_until_next() <= 0
+
+    def hue_changed(self, new_hue: int) -> bool:
+        """Check if the hue moved far enough from the last sent one to be worth sending."""
+        return self.last_sent_hue is None or abs(new_hue - self.last_sent_hue) >= self.hue_epsilon
+
+    def time_until_next(self) -> float:
+        """Seconds until the update interval allows another send (<= 0 if it already does)."""
+        return self.update_interval - (time.time() - self.last_send_time)
 
     def mark_sent(self, hue: int):
         """Mark that a bulb update was sent."""
@@ -0,0 +1,492 @@
+"""
+Benchmark suite for the FretCoach scoring pipeline.
+Runs process_audio_frame, the streaming analyzer and the individual features over
+synthetic plucked-string audio, so it needs no audio device and gives the same
+input on every machine.
+
+Timings are also reported relative to a fixed NumPy calibration workload measured
+on the same machine, which is what gets compared when a baseline was recorded on
+a different CPU architecture (e.g. an x86 laptop baseline checked on a Pi).
+
+Usage:
+    python backend/core/benchmark.py --save bench/baseline.json
+    python backend/core/benchmark.py --compare bench/baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_features import (
+    FrameAnalysis,
+    NoteHistogram,
+    calculate_scale_coverage,
+    pitch_correctness,
+    pitch_stability,
+)
+from audio_metrics import QualityConfig, QualityState, StreamingAnalyzer, process_audio_frame
+from perf import get_profiler
+from scales import find_scale
+
+BENCHMARK_VERSION = 1
+
+# Standard-tuning guitar range, open low E (E2) to the 24th fret of high E (E6)
+LOWEST_MIDI = 40
+HIGHEST_MIDI = 88
+
+DEFAULT_SEED = 1234
+DEFAULT_DURATION_SEC = 20.0
+DEFAULT_ENGINES = ["piptrack", "yin"]
+DEFAULT_SCALE = ("A Minor", "natural")
+
+
+# =========================================================
+# SYNTHETIC SIGNALS
+# =========================================================
+
+def synthesize_pluck(
+    midi: float,
+    duration_sec: float,
+    sample_rate: int,
+    rng: np.random.Generator,
+    n_harmonics: int = 12,
+    decay_sec: float = 1.2,
+    vibrato_cents: float = 0.0,
+    vibrato_hz: float = 5.5,
+    inharmonicity: float = 1e-4,
+) -> np.ndarray:
+    """
+    Additive model of a plucked string.
+
+    Harmonics are slightly stretched (string stiffness), higher partials decay
+    faster, the pluck position gives a comb-shaped spectrum, and a short noise
+    burst models the pick attack.
+
+    Args:
+        midi: MIDI note number (fractional values allowed)
+        duration_sec: Note length in seconds
+        sample_rate: Audio sample rate
+        rng: Random generator (pluck position, phases, attack noise)
+        n_harmonics: Number of partials
+        decay_sec: Decay time constant of the fundamental
+        vibrato_cents: Vibrato depth (0 for none)
+        vibrato_hz: Vibrato rate
+        inharmonicity: String stiffness coefficient B (f_k = k f0 sqrt(1 + B k^2))
+
+    Returns:
+        float64 array of length duration_sec * sample_rate
+    """
+    n = int(round(duration_sec * sample_rate))
+    t = np.arange(n) / sample_rate
+    f0 = 440.0 * 2.0 ** ((midi - 69) / 12.0)
+
+    # Instantaneous frequency ratio with vibrato, integrated to a phase
+    ratio = 2.0 ** (vibrato_cents / 1200.0 * np.sin(2 * np.pi * vibrato_hz * t)) if vibrato_cents else 1.0
+    base_phase = 2 * np.pi * f0 * np.cumsum(np.broadcast_to(ratio, t.shape)) / sample_rate
+
+    pluck_position = rng.uniform(0.08, 0.25)
+    out = np.zeros(n)
+    for k in range(1, n_harmonics + 1):
+        stretch = k * np.sqrt(1.0 + inharmonicity * k * k)
+        if f0 * stretch >= sample_rate / 2:
+            break
+        amplitude = abs(np.sin(np.pi * k * pluck_position)) / k
+        envelope = np.exp(-t * k ** 0.7 / decay_sec)
+        out += amplitude * envelope * np.sin(stretch * base_phase + rng.uniform(0, 2 * np.pi))
+
+    attack = min(n, int(0.01 * sample_rate))
+    out[:attack] += rng.normal(0, 0.3, attack) * np.linspace(1, 0, attack)
+    return out / np.max(np.abs(out))
+
+
+def synthesize_session(
+    sample_rate: int = 44100,
+    duration_sec: float = DEFAULT_DURATION_SEC,
+    seed: int = DEFAULT_SEED,
+    noise_level: float = 0.003,
+) -> Tuple[np.ndarray, List[Tuple[int, int, Optional[int]]]]:
+    """
+    Build a practice take: notes across the fretboard with gaps, vibrato and noise.
+
+    Returns:
+        Tuple of (float32 audio, note list of (start_sample, end_sample, midi))
+        where midi is None for silence gaps
+    """
+    rng = np.random.default_rng(seed)
+    total = int(duration_sec * sample_rate)
+    audio = np.zeros(total)
+    notes = []
+
+    # Walk the range low to high and back so every register is covered
+    sweep = list(range(LOWEST_MIDI, HIGHEST_MIDI + 1, 2)) + list(range(HIGHEST_MIDI - 1, LOWEST_MIDI, -3))
+    position = 0
+    i = 0
+    while position < total:
+        if rng.random() < 0.15:
+            gap = int(rng.uniform(0.2, 0.6) * sample_rate)
+            notes.append((position, min(position + gap, total), None))
+            position += gap
+            continue
+
+        midi = sweep[i % len(sweep)]
+        i += 1
+        length = min(int(rng.uniform(0.35, 0.9) * sample_rate), total - position)
+        note = synthesize_pluck(
+            midi,
+            length / sample_rate,
+            sample_rate,
+            rng,
+            vibrato_cents=rng.choice([0.0, 0.0, 15.0, 35.0]),
+            vibrato_hz=rng.uniform(4.5, 6.5),
+        )
+        audio[position:position + length] += rng.uniform(0.2, 0.6) * note
+        notes.append((position, position + length, midi))
+        position += length
+
+    audio += rng.normal(0, noise_level, total)
+    return audio.astype(np.float32), notes
+
+
+def frame_windows(audio: np.ndarray, sample_rate: int, window_sec: float, hop_sec: float) -> List[np.ndarray]:
+    """Cut audio into the analysis windows the live apps would see."""
+    window = int(sample_rate * window_sec)
+    hop = int(sample_rate * hop_sec)
+    return [audio[start:start + window] for start in range(0, len(audio) - window + 1, hop)]
+
+
+def frame_truth(notes, n_frames: int, sample_rate: int, window_sec: float, hop_sec: float) -> List[Optional[int]]:
+    """Ground-truth MIDI note at the end of each analysis window (None in gaps)."""
+    window = int(sample_rate * window_sec)
+    hop = int(sample_rate * hop_sec)
+    truth = []
+    for k in range(n_frames):
+        end = window + k * hop - 1
+        truth.append(next((midi for start, stop, midi in notes if start <= end < stop), None))
+    return truth
+
+
+# =========================================================
+# MEASUREMENT
+# =========================================================
+
+def calibrate(repeats: int = 5) -> float:
+    """
+    Time a fixed NumPy workload (FFTs and vector math) in milliseconds.
+
+    Dividing benchmark times by this gives a machine-relative cost, which is
+    the comparable number between different CPUs.
+    """
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((64, 2048))
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(4):
+            spectrum = np.abs(np.fft.rfft(data * np.hanning(2048), axis=1))
+            np.sort(spectrum, axis=1)
+            np.cumsum(spectrum ** 2, axis=1)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def time_per_frame(run: Callable[[], int], repeats: int) -> Dict[str, float]:
+    """
+    Run `run` (which processes a batch and returns its frame count) `repeats`
+    times after one warm-up run, and summarise the per-frame time of each run.
+
+    The fastest run is the figure compared against baselines: scheduler and
+    thermal noise only ever add time, so the minimum is the most repeatable.
+    """
+    run()
+    per_frame = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        frames = run()
+        per_frame.append((time.perf_counter() - start) / max(frames, 1))
+    per_frame_ms = np.array(per_frame) * 1000.0
+    best = float(per_frame_ms.min())
+    return {
+        "min_ms": best,
+        "median_ms": float(np.median(per_frame_ms)),
+        "max_ms": float(per_frame_ms.max()),
+        "frames_per_sec": 1000.0 / best if best > 0 else 0.0,
+    }
+
+
+def allocations_per_frame(step: Callable[[int], Any], n_frames: int) -> Dict[str, float]:
+    """
+    Memory allocated per frame, measured with tracemalloc (NumPy buffers included).
+
+    Reports the mean peak traced memory while one frame is processed and the
+    mean number of bytes still live afterwards (a leak indicator).
+    """
+    step(0)  # Warm caches so one-time allocations are not counted
+    tracemalloc.start()
+    try:
+        peaks = []
+        retained = []
+        for i in range(n_frames):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step(i)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kib_per_frame": float(np.mean(peaks)) / 1024.0,
+        "retained_bytes_per_frame": float(np.mean(retained)),
+    }
+
+
+# =========================================================
+# BENCHMARKS
+# =========================================================
+
+def run_benchmarks(
+    engines: List[str] = DEFAULT_ENGINES,
+    duration_sec: float = DEFAULT_DURATION_SEC,
+    seed: int = DEFAULT_SEED,
+    repeats: int = 5,
+    sample_rate: int = 44100,
+) -> Dict[str, Any]:
+    """
+    Run the full suite and return a JSON-serialisable report.
+
+    For each pitch engine this measures:
+      - process_audio_frame end to end on precut windows (fresh analysis per frame)
+      - StreamingAnalyzer fed in poll-sized chunks (the studio app's path)
+      - pitch_correctness, pitch_stability and calculate_scale_coverage alone
+      - per-stage time from the frame profiler and tracemalloc allocations
+      - detection rate against the synthetic ground truth
+    """
+    target = find_scale(*DEFAULT_SCALE)
+    audio, notes = synthesize_session(sample_rate, duration_sec, seed)
+    calibration_ms = calibrate()
+
+    report: Dict[str, Any] = {
+        "version": BENCHMARK_VERSION,
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.system(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "librosa": _librosa_version(),
+            "seed": seed,
+            "duration_sec": duration_sec,
+            "sample_rate": sample_rate,
+            "repeats": repeats,
+        },
+        "calibration_ms": calibration_ms,
+        "engines": {},
+    }
+
+    for engine in engines:
+        config = QualityConfig(sample_rate=sample_rate, pitch_engine=engine)
+        frames = frame_windows(audio, sample_rate, config.window_sec, config.hop_sec)
+        truth = frame_truth(notes, len(frames), sample_rate, config.window_sec, config.hop_sec)
+        print(f"[BENCH] {engine}: {len(frames)} frames of {config.window_sec * 1000:.0f} ms")
+
+        def run_frames():
+            state = QualityState()
+            state.clock.sample_rate = sample_rate
+            for i, frame in enumerate(frames):
+                process_audio_frame(frame, target, config, state, now=i * config.hop_sec)
+            return len(frames)
+
+        def run_streaming():
+            state = QualityState()
+            analyzer = StreamingAnalyzer(target, config, state)
+            chunk = analyzer.hop_size // 3  # The studio loop polls three times per hop
+            emitted = 0
+            for start in range(0, len(audio), chunk):
+                emitted += len(analyzer.push(audio[start:start + chunk]))
+            return emitted
+
+        def run_pitch():
+            for frame in frames:
+                pitch_correctness(frame, sample_rate, target, analysis=FrameAnalysis(frame, sample_rate, pitch_engine=engine))
+            return len(frames)
+
+        def run_stability():
+            for frame in frames:
+                pitch_stability(frame, sample_rate, analysis=FrameAnalysis(frame, sample_rate, pitch_engine=engine))
+            return len(frames)
+
+        def run_coverage():
+            histogram = NoteHistogram(target)
+            for i, midi in enumerate(truth):
+                if midi is not None:
+                    histogram.add(midi % 12)
+                calculate_scale_coverage(histogram, target)
+            return len(truth)
+
+        results = {
+            "process_audio_frame": time_per_frame(run_frames, repeats),
+            "streaming": time_per_frame(run_streaming, repeats),
+            "pitch_correctness": time_per_frame(run_pitch, repeats),
+            "pitch_stability": time_per_frame(run_stability, repeats),
+            "calculate_scale_coverage": time_per_frame(run_coverage, repeats),
+        }
+        for stats in results.values():
+            stats["relative"] = stats["min_ms"] / calibration_ms
+
+        state = QualityState()
+        report["engines"][engine] = {
+            "benchmarks": results,
+            "stages": _stage_times(run_frames),
+            "allocations": allocations_per_frame(
+                lambda i: process_audio_frame(frames[i], target, config, state, now=i * config.hop_sec),
+                min(len(frames), 40),
+            ),
+            "detection": _detection_rate(frames, truth, target, config),
+        }
+        print(
+            f"[BENCH] {engine}: {results['process_audio_frame']['frames_per_sec']:.0f} frames/s, "
+            f"streaming {results['streaming']['frames_per_sec']:.0f} frames/s"
+        )
+
+    return report
+
+
+def _librosa_version() -> str:
+    import librosa
+    return librosa.__version__
+
+
+def _stage_times(run: Callable[[], int]) -> Dict[str, Dict[str, float]]:
+    """Per-stage times of one pass, taken from the global frame profiler."""
+    profiler = get_profiler()
+    was_enabled = profiler.enabled
+    profiler.set_enabled(True)
+    profiler.reset()
+    try:
+        run()
+        return {stage: stats for stage, stats in profiler.snapshot().items() if stats.get("count")}
+    finally:
+        profiler.reset()
+        profiler.set_enabled(was_enabled)
+
+
+def _detection_rate(frames, truth, target, config) -> Dict[str, float]:
+    """Fraction of voiced frames whose detected MIDI is within half a semitone of the truth."""
+    state = QualityState()
+    voiced = correct = silent_rejected = silent = 0
+    for i, (frame, midi) in enumerate(zip(frames, truth)):
+        result = process_audio_frame(frame, target, config, state, now=i * config.hop_sec)
+        if midi is None:
+            silent += 1
+            silent_rejected += result is None or not result.note_detected
+            continue
+        voiced += 1
+        if result is not None and result.note_detected and abs(result.detected_midi - midi) < 0.5:
+            correct += 1
+    return {
+        "voiced_frames": voiced,
+        "pitch_detection_rate": correct / voiced if voiced else 0.0,
+        "silence_rejection_rate": silent_rejected / silent if silent else 1.0,
+    }
+
+
+# =========================================================
+# BASELINES
+# =========================================================
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.15) -> List[str]:
+    """
+    Compare a run against a saved baseline.
+
+    Raw per-frame times are compared when both runs come from the same machine
+    type; otherwise calibration-relative times are used.
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    same_machine = current["meta"]["machine"] == baseline["meta"]["machine"]
+    key = "min_ms" if same_machine else "relative"
+    print(f"[BENCH] Comparing {key} against baseline from {baseline['meta']['created']} "
+          f"({baseline['meta']['machine']}), tolerance {tolerance:.0%}")
+
+    regressions = []
+    for engine, data in current["engines"].items():
+        old_engine = baseline["engines"].get(engine)
+        if old_engine is None:
+            print(f"[WARN] No baseline for engine {engine}")
+            continue
+
+        for name, stats in data["benchmarks"].items():
+            old = old_engine["benchmarks"].get(name)
+            if not old or not old.get(key):
+                continue
+            change = stats[key] / old[key] - 1.0
+            flag = "REGRESSION" if change > tolerance else "improved" if change < -tolerance else "ok"
+            print(f"  {engine:<9} {name:<26} {old[key]:>10.4f} -> {stats[key]:>10.4f}  {change:+7.1%}  {flag}")
+            if change > tolerance:
+                regressions.append(f"{engine}/{name}: {change:+.1%}")
+
+        old_rate = old_engine.get("detection", {}).get("pitch_detection_rate")
+        new_rate = data["detection"]["pitch_detection_rate"]
+        if old_rate is not None and new_rate < old_rate - 0.02:
+            regressions.append(f"{engine}/pitch_detection_rate: {old_rate:.3f} -> {new_rate:.3f}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the FretCoach scoring pipeline on synthetic guitar audio.")
+    parser.add_argument("--engines", default=",".join(DEFAULT_ENGINES), help="Comma-separated pitch engines")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SEC, help="Seconds of synthetic audio")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", help="Write the report to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before failing (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        engines=[e.strip() for e in args.engines.split(",") if e.strip()],
+        duration_sec=args.duration,
+        seed=args.seed,
+        repeats=args.repeats,
+    )
+
+    for engine, data in report["engines"].items():
+        print(f"\n[{engine}] per-stage p50 (ms):")
+        for stage, stats in data["stages"].items():
+            print(f"  {stage:<12} {stats['p50_ms']:>8.3f}")
+        alloc = data["allocations"]
+        print(f"  allocations: {alloc['peak_kib_per_frame']:.1f} KiB peak/frame, "
+              f"{alloc['retained_bytes_per_frame']:.0f} B retained/frame")
+        print(f"  detection:   {data['detection']['pitch_detection_rate']:.1%} of voiced frames")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OK] Saved benchmark report to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[ERR] {len(regressions)} regression(s): " + "; ".join(regressions))
+            return 1
+        print("\n[OK] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
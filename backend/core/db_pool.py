@@ -0,0 +1,164 @@
+"""
+Shared PostgreSQL connection pool for FretCoach.
+One SQLAlchemy engine per process, used by SessionLogger, the metric writer,
+the AI agent and the config service, so they share a bounded set of
+connections instead of each opening their own.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, Engine
+
+# backend/.env, loaded when the engine is first created (never overrides variables already set)
+ENV_PATH = os.path.join(os.path.dirname(__file__), "..", ".env")
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_pool_limits: Dict[str, Any] = {}
+
+
+def _load_env() -> None:
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(ENV_PATH)
+    except ImportError:
+        print("[WARN] python-dotenv not installed. Make sure to set environment variables.")
+
+
+def database_url() -> URL:
+    """SQLAlchemy URL built from the DB_* environment variables (credentials are escaped)."""
+    return URL.create(
+        "postgresql+psycopg2",
+        username=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+        database=os.getenv("DB_NAME", "postgres"),
+    )
+
+
+def describe() -> str:
+    """host:port/dbname of the configured database, for log messages."""
+    url = database_url()
+    return f"{url.host}:{url.port}/{url.database}"
+
+
+def get_engine() -> Engine:
+    """
+    Get or create the process-wide engine.
+
+    Settings are read from the environment on first use, so configuration
+    loaded by the caller beforehand always applies.
+
+    Connections are checked with a ping on checkout (pool_pre_ping), so one
+    dropped by the server or a network blip is replaced transparently instead
+    of failing the next query, and recycled before idle timeouts hit.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _load_env()
+                # Pool sizing (Supabase's session pooler allows few connections per client)
+                _pool_limits.update(
+                    size=int(os.getenv("DB_POOL_SIZE", "5")),
+                    max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+                )
+                _engine = create_engine(
+                    database_url(),
+                    pool_size=_pool_limits["size"],
+                    max_overflow=_pool_limits["max_overflow"],
+                    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+                    pool_pre_ping=True,
+                )
+    return _engine
+
+
+def raw_connection():
+    """
+    Check out a pooled psycopg2 connection for callers that need the DBAPI
+    directly (execute_values, COPY). close() returns it to the pool.
+    """
+    return get_engine().raw_connection()
+
+
+@contextmanager
+def connection():
+    """
+    Context manager yielding a pooled psycopg2 connection.
+
+    Commits on success and rolls back on error. A connection that failed with
+    a connection-level error is invalidated so the pool opens a fresh one.
+
+    Example:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+    """
+    conn = raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception as e:
+        if is_disconnect(e):
+            conn.invalidate(e)
+        else:
+            try:
+                conn.rollback()
+            except Exception as rollback_error:
+                conn.invalidate(rollback_error)
+        raise
+    finally:
+        conn.close()
+
+
+def is_disconnect(error: BaseException) -> bool:
+    """True if `error` means the connection itself is unusable."""
+    try:
+        import psycopg2
+    except ImportError:
+        return False
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def check_health() -> Dict[str, Any]:
+    """
+    Run a round-trip query through the pool.
+
+    Returns:
+        Dictionary with ok flag, round-trip latency and pool status (plus the error if not ok)
+    """
+    start = time.perf_counter()
+    health = {"ok": True}
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        health = {"ok": False, "error": str(e)}
+    health["latency_ms"] = (time.perf_counter() - start) * 1000
+    health["pool"] = pool_status()
+    return health
+
+
+def pool_status() -> Dict[str, Any]:
+    """Current pool occupancy and configured limits."""
+    pool = get_engine().pool
+    return {
+        "size": _pool_limits["size"],
+        "max_overflow": _pool_limits["max_overflow"],
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+def dispose() -> None:
+    """Close all idle pooled connections (e.g. at shutdown)."""
+    if _engine is not None:
+        _engine.dispose()
@@ -0,0 +1,188 @@
+"""
+Fake Tuya LAN device for FretCoach.
+Speaks enough of the Tuya v3.3 local protocol (55AA framing, CRC32,
+AES-ECB with the device's local key) for tinytuya.BulbDevice to control it,
+so the local smart bulb transport can be exercised without hardware.
+
+Usage:
+    python fake_tuya_device.py --port 6668 --key 0123456789abcdef
+    # then set HAVELLS_LOCAL_IP=127.0.0.1 and HAVELLS_LOCAL_KEY to the same key
+"""
+
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import tinytuya
+from tinytuya import AESCipher, TuyaMessage, pack_message, unpack_message
+
+# Tuya command codes (see tinytuya.core.command_types)
+CONTROL = 7
+STATUS = 8
+HEART_BEAT = 9
+DP_QUERY = 10
+
+VERSION_HEADER = b"3.3" + b"\0" * 12
+PREFIX = 0x55AA
+HEADER = struct.Struct(">4I")  # prefix, seqno, cmd, length
+
+
+class FakeTuyaDevice:
+    """
+    Threaded TCP server emulating a type B (colour_data_v2) Tuya bulb.
+
+    Args:
+        device_id: Device id the client must use
+        local_key: 16-character AES key shared with the client
+        host: Interface to listen on
+        port: TCP port (0 picks a free one; see `address` after start())
+        latency: Seconds to wait before answering each command
+    """
+
+    def __init__(
+        self,
+        device_id: str = "fake-bulb",
+        local_key: str = "0123456789abcdef",
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+    ):
+        self.device_id = device_id
+        self.cipher = AESCipher(local_key.encode())
+        self.latency = latency
+        self.dps: Dict[str, object] = {"20": False, "21": "white", "22": 1000, "23": 0, "24": "000003e803e8"}
+        self.commands: List[Tuple[float, dict]] = []  # (time, dps) for every CONTROL received
+        self.connections = 0
+
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(0.2)
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.getsockname()[:2]
+
+    def start(self) -> Tuple[str, int]:
+        """Start accepting connections in a background thread; returns (host, port)."""
+        self._running = True
+        thread = threading.Thread(target=self._accept_loop, name="fake-tuya", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self.address
+
+    def stop(self) -> None:
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._server.close()
+
+    def _accept_loop(self) -> None:
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self.connections += 1
+            thread = threading.Thread(target=self._serve, args=(conn,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _serve(self, conn: socket.socket) -> None:
+        conn.settimeout(0.2)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = b""
+        with conn:
+            while self._running:
+                try:
+                    data = conn.recv(4096)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                if not data:
+                    return
+                buffer += data
+                while len(buffer) >= HEADER.size:
+                    _, _, _, length = HEADER.unpack_from(buffer)
+                    end = HEADER.size + length
+                    if len(buffer) < end:
+                        break
+                    message = unpack_message(buffer[:end], no_retcode=True)
+                    buffer = buffer[end:]
+                    conn.sendall(b"".join(self._handle(message)))
+
+    def _handle(self, message) -> List[bytes]:
+        """Apply one client message and return the framed replies."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        if message.cmd == HEART_BEAT:
+            return [self._frame(message.seqno, HEART_BEAT, b"")]
+
+        if message.cmd == DP_QUERY:
+            return [self._frame(message.seqno, DP_QUERY, self._encrypt(self._status_body()))]
+
+        if message.cmd == CONTROL:
+            payload = message.payload
+            if payload.startswith(VERSION_HEADER[:3]):
+                payload = payload[len(VERSION_HEADER):]
+            request = json.loads(self.cipher.decrypt(payload, False))
+            dps = request.get("dps", {})
+            with self._lock:
+                self.dps.update(dps)
+                self.commands.append((time.time(), dps))
+            return [
+                self._frame(message.seqno, CONTROL, b""),
+                self._frame(0, STATUS, VERSION_HEADER + self._encrypt({"dps": dps, "t": int(time.time())})),
+            ]
+
+        return [self._frame(message.seqno, message.cmd, b"")]
+
+    def _status_body(self) -> dict:
+        with self._lock:
+            return {"devId": self.device_id, "dps": dict(self.dps), "t": int(time.time())}
+
+    def _encrypt(self, body: dict) -> bytes:
+        return self.cipher.encrypt(json.dumps(body).encode(), False)
+
+    @staticmethod
+    def _frame(seqno: int, cmd: int, payload: bytes) -> bytes:
+        """Device-to-client frame: 4-byte return code (0) before the payload."""
+        return pack_message(TuyaMessage(seqno, cmd, 0, struct.pack(">I", 0) + payload, 0, True, PREFIX, None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Tuya v3.3 bulb for testing the local bulb transport")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=tinytuya.TCPPORT)
+    parser.add_argument("--device-id", default="fake-bulb")
+    parser.add_argument("--key", default="0123456789abcdef", help="16-character local key")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    args = parser.parse_args()
+
+    device = FakeTuyaDevice(args.device_id, args.key, args.host, args.port, args.latency)
+    host, port = device.start()
+    print(f"[OK] Fake Tuya device '{args.device_id}' listening on {host}:{port} (Ctrl+C to stop)")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.2)
+            for _, dps in device.commands[seen:]:
+                print(f"  dps {dps}")
+            seen = len(device.commands)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+
+
+if __name__ == "__main__":
+    main()
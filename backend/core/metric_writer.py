@@ -0,0 +1,511 @@
+"""
+Write-behind pipeline for FretCoach session metrics.
+Rows are queued without blocking the caller, written in batches by a background
+thread, and appended to a local spool file whenever PostgreSQL is unreachable.
+The spool is replayed on the next start (or as soon as the database is back).
+
+Frame rows are bulk-loaded with binary COPY into the monthly-partitioned
+fretcoach.session_frames table. Every session write also refreshes the
+per-user, per-scale daily rollups in fretcoach.session_rollups_daily.
+"""
+
+import io
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+SPOOL_DIR = os.getenv("FRETCOACH_SPOOL_DIR", os.path.join(os.path.dirname(__file__), "..", ".spool"))
+
+# Errors meaning the database (or the connection to it) is unavailable; rows are
+# spooled and retried. Anything else is a problem with the rows themselves.
+UNAVAILABLE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+FRAME_COLUMNS = (
+    "session_id", "user_id", "frame_index", "frame_timestamp",
+    "pitch_accuracy", "scale_conformity", "timing_stability",
+    "note_detected", "in_scale", "pitch_class",
+)
+
+# Binary COPY encoders, one per FRAME_COLUMNS entry (PostgreSQL wire format)
+_PG_EPOCH = datetime(2000, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+_FRAME_ENCODERS = (
+    lambda v: v.encode("utf-8"),                                 # session_id varchar
+    lambda v: v.encode("utf-8"),                                 # user_id varchar
+    lambda v: struct.pack(">i", v),                              # frame_index integer
+    lambda v: struct.pack(">q", (v - _PG_EPOCH) // _ONE_MICROSECOND),  # timestamp (us since 2000)
+    lambda v: struct.pack(">d", v),                              # metrics double precision
+    lambda v: struct.pack(">d", v),
+    lambda v: struct.pack(">d", v),
+    lambda v: b"\x01" if v else b"\x00",                         # flags boolean
+    lambda v: b"\x01" if v else b"\x00",
+    lambda v: struct.pack(">h", v),                              # pitch_class smallint
+)
+
+SESSION_COLUMNS = (
+    "session_id", "user_id", "start_timestamp", "end_timestamp",
+    "pitch_accuracy", "scale_conformity", "timing_stability",
+    "scale_chosen", "scale_type", "sensitivity", "strictness",
+    "total_notes_played", "correct_notes_played", "bad_notes_played",
+    "total_inscale_notes", "duration_seconds", "ambient_light_option",
+)
+
+# Frames are COPYed into a per-connection staging table, then merged so that
+# replaying a partly written spool stays idempotent
+CREATE_FRAMES_STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS session_frames_stage
+    (LIKE fretcoach.session_frames) ON COMMIT DELETE ROWS
+"""
+
+COPY_FRAMES_SQL = f"COPY session_frames_stage ({', '.join(FRAME_COLUMNS)}) FROM STDIN WITH (FORMAT binary)"
+
+INSERT_FRAMES_SQL = f"""
+    INSERT INTO fretcoach.session_frames ({", ".join(FRAME_COLUMNS)})
+    SELECT {", ".join(FRAME_COLUMNS)} FROM session_frames_stage
+    ON CONFLICT (session_id, frame_index, frame_timestamp) DO NOTHING
+"""
+
+CREATE_FRAMES_PARTITION_SQL = """
+    CREATE TABLE IF NOT EXISTS fretcoach.session_frames_{year:04d}_{month:02d}
+    PARTITION OF fretcoach.session_frames
+    FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')
+"""
+
+# Sessions are upserted so periodic checkpoints and the final row share one key;
+# a row never replaces a later one (end_timestamp only grows within a session)
+UPSERT_SESSIONS_SQL = f"""
+    INSERT INTO fretcoach.sessions ({", ".join(SESSION_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (session_id, user_id) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in SESSION_COLUMNS[2:])}
+    WHERE fretcoach.sessions.end_timestamp IS NULL
+       OR fretcoach.sessions.end_timestamp <= EXCLUDED.end_timestamp
+"""
+
+ROLLUP_COLUMNS = (
+    "user_id", "day", "scale_chosen", "scale_type",
+    "session_count", "total_duration_seconds",
+    "pitch_sum", "pitch_count", "scale_sum", "scale_count", "timing_sum", "timing_count",
+    "total_notes", "correct_notes", "bad_notes", "last_practiced",
+)
+
+# Sums and non-null counts (not averages) so any set of buckets can be
+# combined into exact per-user or per-scale averages
+_ROLLUP_INSERT = f"""
+    INSERT INTO fretcoach.session_rollups_daily ({", ".join(ROLLUP_COLUMNS)})
+    SELECT
+        s.user_id, s.start_timestamp::date, s.scale_chosen, COALESCE(s.scale_type, 'natural'),
+        COUNT(*), COALESCE(SUM(s.duration_seconds), 0),
+        COALESCE(SUM(s.pitch_accuracy), 0), COUNT(s.pitch_accuracy),
+        COALESCE(SUM(s.scale_conformity), 0), COUNT(s.scale_conformity),
+        COALESCE(SUM(s.timing_stability), 0), COUNT(s.timing_stability),
+        COALESCE(SUM(s.total_notes_played), 0), COALESCE(SUM(s.correct_notes_played), 0),
+        COALESCE(SUM(s.bad_notes_played), 0), MAX(s.start_timestamp)
+    FROM fretcoach.sessions s
+    {{join}}
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (user_id, day, scale_chosen, scale_type) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in ROLLUP_COLUMNS[4:])},
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Daily buckets touched by a batch are recomputed from their sessions, so
+# checkpoints, final rows and spool replays all leave them exact
+REFRESH_ROLLUPS_SQL = _ROLLUP_INSERT.format(join="""JOIN (VALUES %s) AS b(user_id, day)
+      ON s.user_id = b.user_id AND s.start_timestamp >= b.day AND s.start_timestamp < b.day + 1""")
+
+# One-off fill from existing sessions when the rollup table is created
+BACKFILL_ROLLUPS_SQL = _ROLLUP_INSERT.format(join="")
+
+# Session writes are announced per user (delivered on commit) so the web
+# backend can drop cached agent query results for that user; practice plan
+# writes in ai_agent_service/ai_mode use the same channel
+NOTIFY_CHANNEL = "fretcoach_sessions"
+NOTIFY_SESSIONS_SQL = f"SELECT pg_notify('{NOTIFY_CHANNEL}', v.user_id) FROM (VALUES %s) AS v(user_id)"
+
+
+class _FlushMarker:
+    """Queued behind pending rows; set once they have been written or spooled."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+
+
+class MetricWriter:
+    """
+    Background batch writer for session and per-frame rows.
+
+    enqueue() never blocks: if the bounded queue is full the row is dropped
+    and counted. The writer thread owns its own connection, groups rows by
+    kind and writes each kind with one execute_values call per batch. A batch
+    that cannot be written because the database is unavailable is appended to
+    an fsync'd JSON-lines spool; inserts are idempotent (ON CONFLICT), so
+    replaying a partly written spool is safe. A batch the database rejects
+    (bad row, constraint or permission error) is moved to a .rejected file
+    instead, so it can never block the rows behind it.
+    While a spool exists new rows are appended to it rather than written, so
+    rows always reach the database in the order they were queued.
+
+    Frame batches go through binary COPY (one round trip, no per-row SQL
+    parsing), and the monthly partition for each batch is created on first use.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        spool_dir: str = SPOOL_DIR,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        sessions_sql: str = UPSERT_SESSIONS_SQL,
+        prepare: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            connect: Callable returning a new psycopg2 connection
+            spool_dir: Directory for the local spool file
+            max_queue: Maximum queued rows before new rows are dropped
+            batch_size: Maximum rows per database write
+            flush_interval: Seconds to wait for more rows before writing a partial batch
+            sessions_sql: execute_values statement for session rows
+            prepare: Run once before the first write (e.g. create tables when
+                the database was unreachable at startup); retried until it succeeds
+        """
+        self._connect = connect
+        self.spool_path = os.path.join(spool_dir, "metrics.jsonl")
+        self.rejected_path = os.path.join(spool_dir, "metrics.rejected.jsonl")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._sessions_sql = sessions_sql
+        self._prepare = prepare
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._conn = None
+        self._staged_conn = None  # Connection the temp staging table exists on
+        self._partitions = set()  # (year, month) partitions known to exist
+        self._retry_at = 0.0
+        self._backoff = 1.0
+        self._stopping = False
+        self.dropped = 0
+        self.written = 0
+        self.spooled = 0
+        self.rejected = 0
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="metric-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, kind: str, row: Sequence[Any]) -> bool:
+        """
+        Queue one row ("frame" or "session") without blocking.
+
+        Returns:
+            False if the queue was full and the row was dropped
+        """
+        try:
+            self._queue.put_nowait((kind, tuple(row)))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until everything queued so far has been written or spooled.
+
+        Returns:
+            True if it reached the database (or was rejected by it),
+            False if spooled or timed out
+        """
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.event.wait(timeout) and marker.ok
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending rows and stop the writer thread."""
+        self.flush(timeout)
+        self._stopping = True
+        self._thread.join(timeout)
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def has_spool(self) -> bool:
+        """True if rows are waiting in the spool for the database."""
+        return os.path.exists(self.spool_path) or os.path.exists(self.spool_path + ".replay")
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        self._replay_spool()
+        while not self._stopping:
+            batch, markers = self._next_batch()
+            ok = True
+            if batch:
+                if self.has_spool():
+                    # Rows stay in write order: new ones queue behind the spool
+                    self._spool(batch)
+                    ok = False
+                else:
+                    ok = self._write(batch)
+                    if not ok:
+                        self._spool(batch)
+            if self.has_spool() and time.monotonic() >= self._retry_at:
+                ok = self._replay_spool()
+            for marker in markers:
+                marker.ok = ok
+                marker.event.set()
+
+    def _next_batch(self):
+        """Collect up to batch_size rows, stopping early at a flush marker."""
+        batch, markers = [], []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, markers
+
+        while True:
+            if isinstance(item, _FlushMarker):
+                markers.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, markers
+
+    def _write(self, batch: List) -> bool:
+        """
+        Write one batch.
+
+        Returns:
+            False (after backing off) if the database is unavailable; True once
+            the batch is written or, where the database rejected it, quarantined
+        """
+        if time.monotonic() < self._retry_at:
+            return False
+
+        frames = [row for kind, row in batch if kind == "frame"]
+        # A checkpoint and the final row of a session may share a batch; keep the latest
+        sessions = {}
+        for kind, row in batch:
+            if kind == "session":
+                sessions[(row[0], row[1])] = row
+
+        try:
+            if self._conn is None or self._conn.closed:
+                try:
+                    self._conn = self._connect()
+                except Exception as e:
+                    # Pool wrappers re-raise connect failures as their own types
+                    raise psycopg2.OperationalError(str(e)) from e
+            if self._prepare is not None:
+                try:
+                    self._prepare()
+                except Exception as e:
+                    raise psycopg2.OperationalError(f"prepare failed: {e}") from e
+                self._prepare = None
+            # Sessions and frames commit separately, so frames the database
+            # refuses (e.g. no partition for their month) never cost session rows
+            if sessions:
+                self._commit_part([("session", row) for row in sessions.values()], self._write_sessions)
+            if frames:
+                self._commit_part([("frame", row) for row in frames], self._write_frames)
+            self._backoff = 1.0
+            return True
+        except UNAVAILABLE_ERRORS as e:
+            print(f"[WARN] Metric writer: database unavailable ({e}); spooling to {self.spool_path}")
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+            self._conn = None
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, 60.0)
+            return False
+
+    def _commit_part(self, part: List, write: Callable[[Any, List], None]) -> None:
+        """Write and commit one kind of row; quarantine it if the database rejects it."""
+        try:
+            write(self._conn.cursor(), [row for _, row in part])
+            self._conn.commit()
+            self.written += len(part)
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as e:
+            # The rollback also drops a staging table created in this transaction
+            self._staged_conn = None
+            try:
+                self._conn.rollback()
+            except Exception as rollback_error:
+                raise psycopg2.InterfaceError(str(rollback_error)) from rollback_error
+            self._reject(part, e)
+
+    def _write_sessions(self, cursor, sessions: List) -> None:
+        """Upsert session rows, refresh their daily rollups and announce the users."""
+        execute_values(cursor, self._sessions_sql, sessions)
+        buckets = {(row[1], row[2].date()) for row in sessions}
+        execute_values(cursor, REFRESH_ROLLUPS_SQL, list(buckets), template="(%s, %s::date)")
+        execute_values(cursor, NOTIFY_SESSIONS_SQL, list({(user_id,) for user_id, _ in buckets}))
+
+    def _write_frames(self, cursor, frames: List) -> None:
+        """Create any missing monthly partitions, then bulk-load the frames."""
+        self._ensure_partitions(frame[3] for frame in frames)
+        self._copy_frames(cursor, frames)
+
+    def _reject(self, batch: List, error: Exception) -> None:
+        """Quarantine rows the database refused, with the error, for inspection."""
+        print(f"[ERR] Metric writer: database rejected {len(batch)} rows ({error}); moved to {self.rejected_path}")
+        lines = "".join(
+            json.dumps({"kind": kind, "row": row, "error": str(error)}, default=_json_default) + "\n"
+            for kind, row in batch
+        )
+        try:
+            with open(self.rejected_path, "a") as f:
+                f.write(lines)
+            self.rejected += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"[ERR] Metric writer: failed to quarantine {len(batch)} rows: {e}")
+
+    def _copy_frames(self, cursor, frames: List) -> None:
+        """Bulk-load frame rows: binary COPY into the staging table, then merge."""
+        if self._staged_conn is not self._conn:
+            cursor.execute(CREATE_FRAMES_STAGE_SQL)
+            self._staged_conn = self._conn
+        cursor.copy_expert(COPY_FRAMES_SQL, io.BytesIO(encode_frames_binary(frames)))
+        cursor.execute(INSERT_FRAMES_SQL)
+
+    def _ensure_partitions(self, timestamps: Iterable[datetime]) -> None:
+        """Create the monthly session_frames partitions these rows fall into."""
+        months = {(ts.year, ts.month) for ts in timestamps} - self._partitions
+        for year, month in sorted(months):
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute(CREATE_FRAMES_PARTITION_SQL.format(
+                    year=year,
+                    month=month,
+                    next_year=year + month // 12,
+                    next_month=month % 12 + 1,
+                ))
+                self._conn.commit()
+            except Exception as e:
+                # Retried on the next batch for this month; meanwhile the COPY reports it
+                self._conn.rollback()
+                print(f"[WARN] Metric writer: could not create frames partition {year:04d}-{month:02d}: {e}")
+                continue
+            self._partitions.add((year, month))
+
+    def _spool(self, batch: List) -> None:
+        """Append rows to the spool file and fsync so they survive a power loss."""
+        lines = "".join(
+            json.dumps({"kind": kind, "row": row}, default=_json_default) + "\n"
+            for kind, row in batch
+        )
+        try:
+            with open(self.spool_path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.spooled += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"[ERR] Metric writer: failed to spool {len(batch)} rows: {e}")
+
+    def _replay_spool(self) -> bool:
+        """
+        Write spooled rows to the database, oldest first.
+
+        The spool is renamed before replay so rows spooled meanwhile go to a
+        fresh file (replayed next); a replay file left by a crash is picked up first.
+
+        Returns:
+            True once the spool is empty, False if the database went away again
+        """
+        replay_path = self.spool_path + ".replay"
+        while self.has_spool():
+            if not os.path.exists(replay_path):
+                os.replace(self.spool_path, replay_path)
+
+            batch = []
+            total = 0
+            with open(replay_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from a crash mid-write
+                    batch.append(_decode_spooled(record["kind"], record["row"]))
+                    if len(batch) >= self.batch_size:
+                        if not self._write(batch):
+                            return False
+                        total += len(batch)
+                        batch = []
+            if batch and not self._write(batch):
+                return False
+            total += len(batch)
+
+            os.remove(replay_path)
+            print(f"[OK] Replayed {total} spooled metric rows")
+        return True
+
+
+def encode_frames_binary(rows: Iterable[Sequence[Any]]) -> bytes:
+    """Encode frame rows (FRAME_COLUMNS order) as a PostgreSQL binary COPY stream."""
+    out = [b"PGCOPY\n\xff\r\n\x00", struct.pack(">ii", 0, 0)]
+    field_count = struct.pack(">h", len(FRAME_COLUMNS))
+    null = struct.pack(">i", -1)
+    for row in rows:
+        out.append(field_count)
+        for value, encode in zip(row, _FRAME_ENCODERS):
+            if value is None:
+                out.append(null)
+            else:
+                data = encode(value)
+                out.append(struct.pack(">i", len(data)))
+                out.append(data)
+    out.append(struct.pack(">h", -1))
+    return b"".join(out)
+
+
+def _decode_spooled(kind: str, row: list) -> tuple:
+    """Restore timestamps in a spooled row (they are stored as ISO strings)."""
+    timestamp_fields = (3,) if kind == "frame" else (2, 3)
+    for i in timestamp_fields:
+        if isinstance(row[i], str):
+            row[i] = datetime.fromisoformat(row[i])
+    return kind, tuple(row)
+
+
+def _json_default(value):
+    """JSON encoder for spooled rows (timestamps are written as ISO strings)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
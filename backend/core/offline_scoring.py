@@ -0,0 +1,273 @@
+"""
+Offline batch scoring for FretCoach.
+Streams recorded audio files through the same QualityConfig/QualityState pipeline
+used by the live apps, so archived practice takes can be re-scored and scoring
+changes can be regression-tested without an audio device.
+
+Usage:
+    python backend/core/offline_scoring.py takes/*.wav --scale "A Minor" \
+        --scale-type pentatonic --out results/ --format csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from audio_metrics import QualityConfig, QualityState, StreamingAnalyzer
+from scales import get_scale_pitch_classes
+
+# Samples read from disk per block (about 1 s at 44.1 kHz)
+READ_BLOCK_SIZE = 44100
+
+FRAME_FIELDS = [
+    "file", "frame_index", "time_sec",
+    "pitch_score", "stability_score", "timing_score", "noise_score", "quality_score",
+    "scale_coverage", "note_detected", "in_scale", "pitch_class",
+    "detected_hz", "detected_midi", "notes_for_timing",
+    "ema_quality", "ema_pitch", "ema_timing",
+]
+
+SESSION_FIELDS = [
+    "file", "duration_sec", "frames_total", "frames_scored",
+    "total_notes_played", "correct_notes_played", "bad_notes_played",
+    "pitch_accuracy", "scale_conformity", "timing_stability", "final_quality",
+]
+
+
+def read_audio_blocks(path: str, sample_rate: int, block_size: int = READ_BLOCK_SIZE) -> Iterable[np.ndarray]:
+    """
+    Yield mono float32 blocks of an audio file at `sample_rate`.
+
+    Files already at the target rate are streamed block by block; anything
+    else is loaded in full and resampled with librosa.
+    """
+    import soundfile as sf
+
+    with sf.SoundFile(path) as f:
+        native_rate = f.samplerate
+        if native_rate == sample_rate:
+            for block in f.blocks(blocksize=block_size, dtype="float32", always_2d=True):
+                yield block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            return
+
+    import librosa
+    audio, _ = librosa.load(path, sr=sample_rate, mono=True)
+    for start in range(0, len(audio), block_size):
+        yield audio[start:start + block_size].astype(np.float32, copy=False)
+
+
+def score_file(
+    path: str,
+    target_pitch_classes: Set[int],
+    config: Optional[QualityConfig] = None,
+    enabled_metrics: Optional[Dict[str, bool]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Score one recording.
+
+    QualityState's default SampleClock timestamps frames by sample position,
+    so the same file and config always produce identical results.
+
+    Args:
+        path: Path to an audio file readable by soundfile/librosa
+        target_pitch_classes: Set of valid pitch classes for the scale
+        config: Quality configuration (default: QualityConfig())
+        enabled_metrics: Optional dict of enabled metric flags
+
+    Returns:
+        Tuple of (frame_rows, session_row)
+    """
+    if config is None:
+        config = QualityConfig()
+
+    state = QualityState()
+    analyzer = StreamingAnalyzer(
+        target_pitch_classes=target_pitch_classes,
+        config=config,
+        state=state,
+        enabled_metrics=enabled_metrics,
+    )
+
+    file_name = os.path.basename(path)
+    frames = []
+    frame_index = 0
+    sums = {"pitch": 0.0, "scale": 0.0, "timing": 0.0}
+    notes = {"total": 0, "correct": 0, "bad": 0}
+
+    for block in read_audio_blocks(path, config.sample_rate):
+        for result in analyzer.push(block):
+            # Result k covers the window ending at sample window_size + k * hop_size
+            end_sample = analyzer.window_size + frame_index * analyzer.hop_size
+            frame_index += 1
+            if result is None:
+                continue
+
+            # Per-session accumulation mirrors SessionLogger.log_metric
+            sums["pitch"] += state.ema_pitch
+            sums["scale"] += result.scale_coverage
+            sums["timing"] += state.ema_timing
+            if result.note_detected:
+                notes["total"] += 1
+                if result.in_scale:
+                    notes["correct"] += 1
+                else:
+                    notes["bad"] += 1
+
+            row = asdict(result)
+            row.update({
+                "file": file_name,
+                "frame_index": frame_index - 1,
+                "time_sec": end_sample / config.sample_rate,
+                "ema_quality": state.ema_quality,
+                "ema_pitch": state.ema_pitch,
+                "ema_timing": state.ema_timing,
+            })
+            frames.append({k: _to_native(row[k]) for k in FRAME_FIELDS})
+
+    scored = len(frames)
+    session = {
+        "file": file_name,
+        "duration_sec": analyzer.samples_consumed / config.sample_rate,
+        "frames_total": frame_index,
+        "frames_scored": scored,
+        "total_notes_played": notes["total"],
+        "correct_notes_played": notes["correct"],
+        "bad_notes_played": notes["bad"],
+        "pitch_accuracy": sums["pitch"] / scored if scored else None,
+        "scale_conformity": sums["scale"] / scored if scored else None,
+        "timing_stability": sums["timing"] / scored if scored else None,
+        "final_quality": state.ema_quality,
+    }
+    return frames, session
+
+
+def _to_native(value):
+    """Convert numpy scalars to plain Python values for CSV/Parquet output."""
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _score_file_worker(args):
+    """ProcessPoolExecutor entry point (must be a top-level function to be picklable)."""
+    path, target_pitch_classes, config, enabled_metrics = args
+    return score_file(path, target_pitch_classes, config, enabled_metrics)
+
+
+def score_files(
+    paths: List[str],
+    target_pitch_classes: Set[int],
+    config: Optional[QualityConfig] = None,
+    enabled_metrics: Optional[Dict[str, bool]] = None,
+    max_workers: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Score many recordings in parallel, one file per worker process.
+
+    Args:
+        paths: Audio file paths
+        target_pitch_classes: Set of valid pitch classes for the scale
+        config: Quality configuration shared by all files
+        enabled_metrics: Optional dict of enabled metric flags
+        max_workers: Worker processes (default: one per CPU core)
+
+    Returns:
+        Tuple of (frame_rows, session_rows), ordered as `paths`
+    """
+    if config is None:
+        config = QualityConfig()
+
+    results: Dict[str, Tuple[list, dict]] = {}
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_score_file_worker, (path, target_pitch_classes, config, enabled_metrics)): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+                print(f"[OK] Scored {path}")
+            except Exception as e:
+                failures.append(path)
+                print(f"[ERR] Failed to score {path}: {e}")
+
+    frames, sessions = [], []
+    for path in paths:
+        if path in results:
+            frames.extend(results[path][0])
+            sessions.append(results[path][1])
+
+    if failures:
+        print(f"[WARN] {len(failures)} of {len(paths)} files failed")
+    return frames, sessions
+
+
+def write_rows(rows: List[Dict[str, Any]], fields: List[str], path: str, fmt: str = "csv") -> None:
+    """Write result rows as CSV or Parquet (Parquet requires pyarrow)."""
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow), or use --format csv")
+        pq.write_table(pa.table({f: [row[f] for row in rows] for f in fields}), path)
+        return
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Score recorded guitar takes offline with the FretCoach pipeline.")
+    parser.add_argument("files", nargs="+", help="Audio files to score")
+    parser.add_argument("--scale", required=True, help='Scale name, e.g. "A Minor"')
+    parser.add_argument("--scale-type", default="natural", choices=["natural", "pentatonic"])
+    parser.add_argument("--strictness", type=float, default=0.5)
+    parser.add_argument("--sensitivity", type=float, default=0.5)
+    parser.add_argument("--pitch-engine", default="piptrack", help='Pitch engine ("piptrack" or "yin")')
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--out", default=".", help="Output directory")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    try:
+        target_pitch_classes = get_scale_pitch_classes(args.scale, args.scale_type)
+    except KeyError:
+        print(f"[ERR] Unknown scale: {args.scale}")
+        return 2
+
+    config = QualityConfig(
+        strictness=args.strictness,
+        sensitivity=args.sensitivity,
+        sample_rate=args.sample_rate,
+        pitch_engine=args.pitch_engine,
+    )
+
+    frames, sessions = score_files(args.files, target_pitch_classes, config, max_workers=args.workers)
+
+    os.makedirs(args.out, exist_ok=True)
+    ext = "parquet" if args.format == "parquet" else "csv"
+    frames_path = os.path.join(args.out, f"frames.{ext}")
+    sessions_path = os.path.join(args.out, f"sessions.{ext}")
+    write_rows(frames, FRAME_FIELDS, frames_path, args.format)
+    write_rows(sessions, SESSION_FIELDS, sessions_path, args.format)
+
+    print(f"[OK] {len(sessions)} sessions, {len(frames)} frames -> {frames_path}, {sessions_path}")
+    return 0 if len(sessions) == len(args.files) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Frame-level profiling for the FretCoach analysis loop.
+Records per-stage durations and end-to-end latency into HDR-style histograms.
+
+Disabled by default; enable with FRETCOACH_PERF=1 or get_profiler().set_enabled(True).
+When disabled every hook returns after a single attribute check.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+PERF_ENABLED = os.environ.get("FRETCOACH_PERF", "0") == "1"
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of durations in microseconds (HdrHistogram layout).
+
+    Values below 2**sub_bucket_bits are counted exactly; above that each
+    power-of-two range is split into 2**(sub_bucket_bits - 1) equal buckets,
+    so every recorded value is kept to within about 1.5% (for the default 7
+    bits) with a fixed-size counts array and O(1) recording.
+    """
+
+    def __init__(self, max_value_us: int = 60_000_000, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count // 2
+        self.max_value_us = max_value_us
+        self.counts = np.zeros(self._index(max_value_us) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + ((value >> shift) - self.half_count)
+
+    def _bucket_value(self, index: int) -> int:
+        """Midpoint of the bucket at `index`, in microseconds."""
+        if index < self.sub_bucket_count:
+            return index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.half_count + 1
+        mantissa = offset % self.half_count + self.half_count
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, value_us: int):
+        """Record one duration in microseconds."""
+        value_us = min(max(int(value_us), 0), self.max_value_us)
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentile(self, p: float) -> int:
+        """Value (microseconds) at percentile p (0-100)."""
+        if self.total == 0:
+            return 0
+        rank = max(1, int(np.ceil(p / 100.0 * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._bucket_value(index), self.max_us)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        """Summary in milliseconds."""
+        if self.total == 0:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_us / self.total / 1000.0,
+            "min_ms": self.min_us / 1000.0,
+            "p50_ms": self.percentile(50) / 1000.0,
+            "p90_ms": self.percentile(90) / 1000.0,
+            "p99_ms": self.percentile(99) / 1000.0,
+            "max_ms": self.max_us / 1000.0,
+        }
+
+
+class FrameProfiler:
+    """
+    Per-stage timers for process_audio_frame and the loop around it.
+
+    Sequential stages use start_frame()/mark(stage); stages timed elsewhere
+    use now()/record_since(stage, t0). The audio callback stamps note_input()
+    and the loop reports record_latency() once a result is published.
+    """
+
+    def __init__(self, enabled: bool = PERF_ENABLED):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.last_input_time = 0.0
+        self._last_mark = 0.0
+        self._lock = threading.Lock()
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+
+    def now(self) -> float:
+        """perf_counter() when enabled, else 0.0."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def start_frame(self):
+        """Start timing a new frame's sequential stages."""
+        if self.enabled:
+            self._last_mark = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Record the time since the previous mark (or start_frame) under `stage`."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._record(stage, now - self._last_mark)
+        self._last_mark = now
+
+    def record_since(self, stage: str, t0: float):
+        """Record the time since t0 (from now()) under `stage`."""
+        if self.enabled and t0:
+            self._record(stage, time.perf_counter() - t0)
+
+    def note_input(self):
+        """Called from the audio callback when new samples arrive."""
+        if self.enabled:
+            self.last_input_time = time.perf_counter()
+
+    def record_latency(self, input_time: float, stage: str = "end_to_end"):
+        """Record latency from an input timestamp (perf_counter) to now."""
+        if self.enabled and input_time:
+            self._record(stage, time.perf_counter() - input_time)
+
+    def _record(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(seconds * 1e6)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage summaries in milliseconds."""
+        with self._lock:
+            return {stage: h.to_dict() for stage, h in self.histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+
+# Global profiler instance
+_profiler_instance: Optional[FrameProfiler] = None
+
+
+def get_profiler() -> FrameProfiler:
+    """Get or create the global frame profiler"""
+    global _profiler_instance
+    if _profiler_instance is None:
+        _profiler_instance = FrameProfiler()
+    return _profiler_instance
@@ -3,6 +3,12 @@ Musical scales and pitch class definitions.
 Contains all major and minor keys with their pitch classes.
 """
 
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Tuple
+
+import numpy as np
+
 # Pitch class numbers: C=0, C#=1, D=2, D#=3, E=4, F=5, F#=6, G=7, G#=8, A=9, A#=10, B=11
 
 # Natural scales (7 notes)
@@ -73,6 +79,142 @@ MINOR_SCALES = MINOR_DIATONIC
 ALL_SCALES = {**MAJOR_DIATONIC, **MINOR_DIATONIC}
 
 
+# =========================================================
+# SCALE INDEX (built once at import)
+# =========================================================
+
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+
+@dataclass(frozen=True)
+class Scale:
+    """
+    Immutable scale entry: pitch classes as a 12-bit mask plus a sorted tuple.
+
+    Behaves like a read-only set of pitch classes (`in`, iteration, len), with
+    membership answered by a single bit test.
+    """
+    root: str
+    mode: str  # "Major" or "Minor"
+    scale_type: str  # "natural" or "pentatonic"
+    mask: int
+    pitch_classes: Tuple[int, ...]
+
+    @property
+    def name(self) -> str:
+        """Scale name as used throughout the app, e.g. "A Minor"."""
+        return f"{self.root} {self.mode}"
+
+    def __contains__(self, pitch_class) -> bool:
+        try:
+            return (self.mask >> int(pitch_class)) & 1 == 1
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        return iter(self.pitch_classes)
+
+    def __len__(self) -> int:
+        return len(self.pitch_classes)
+
+
+def _build_scale_index() -> Dict[Tuple[str, str, str], Scale]:
+    index = {}
+    for scale_type, dicts in (
+        ("natural", (MAJOR_DIATONIC, MINOR_DIATONIC)),
+        ("pentatonic", (MAJOR_PENTATONIC, MINOR_PENTATONIC)),
+    ):
+        for scales_dict in dicts:
+            for name, pitch_classes in scales_dict.items():
+                root, mode = name.split(" ")
+                mask = 0
+                for pc in pitch_classes:
+                    mask |= 1 << pc
+                index[(root, mode, scale_type)] = Scale(
+                    root=root,
+                    mode=mode,
+                    scale_type=scale_type,
+                    mask=mask,
+                    pitch_classes=tuple(sorted(pitch_classes)),
+                )
+    return index
+
+
+# (root, mode, scale_type) -> Scale, e.g. SCALE_INDEX[("A", "Minor", "pentatonic")]
+SCALE_INDEX = MappingProxyType(_build_scale_index())
+
+# Row i is the 12-bin membership vector of _INDEXED_SCALES[i], for reverse lookup
+_INDEXED_SCALES = tuple(SCALE_INDEX.values())
+_SCALE_MATRIX = np.array(
+    [[(scale.mask >> pc) & 1 for pc in range(12)] for scale in _INDEXED_SCALES],
+    dtype=np.float64,
+)
+_SCALE_MATRIX.flags.writeable = False
+
+
+def find_scale(scale_name: str, scale_type: str = "natural") -> Scale:
+    """
+    Look up a scale by name and type.
+
+    Args:
+        scale_name: Scale name, e.g. "A Minor" (a " (Natural)"/" (Pentatonic)" suffix is ignored)
+        scale_type: 'natural' or 'pentatonic'
+
+    Returns:
+        Scale entry from SCALE_INDEX
+
+    Raises:
+        KeyError: If the scale is unknown
+    """
+    clean_name = scale_name.replace(" (Natural)", "").replace(" (Pentatonic)", "")
+    try:
+        root, mode = clean_name.split(" ")
+    except ValueError:
+        raise KeyError(scale_name)
+    return SCALE_INDEX[(root, mode, scale_type)]
+
+
+def best_matching_scales(note_counts, scale_type: str = None, top_n: int = 3) -> List[Tuple[Scale, float]]:
+    """
+    Rank scales by how well they explain an observed pitch-class histogram.
+
+    Scales are ordered by the fraction of played notes that fall inside them,
+    then by the fraction of their own notes that were played.
+
+    Args:
+        note_counts: 12-element array/list of counts, or a {pitch_class: count} mapping
+        scale_type: Restrict to 'natural' or 'pentatonic' (default: both)
+        top_n: Number of scales to return
+
+    Returns:
+        List of (Scale, in_scale_fraction) tuples, best first
+    """
+    if hasattr(note_counts, "items"):
+        histogram = np.zeros(12, dtype=np.float64)
+        for pc, count in note_counts.items():
+            histogram[int(pc)] = count
+    else:
+        histogram = np.asarray(note_counts, dtype=np.float64)
+
+    total = histogram.sum()
+    if total <= 0:
+        return []
+
+    in_fraction = _SCALE_MATRIX @ histogram / total
+    covered = (_SCALE_MATRIX @ (histogram > 0)) / _SCALE_MATRIX.sum(axis=1)
+
+    order = np.lexsort((-covered, -in_fraction))
+    results = []
+    for i in order:
+        scale = _INDEXED_SCALES[i]
+        if scale_type is not None and scale.scale_type != scale_type:
+            continue
+        results.append((scale, float(in_fraction[i])))
+        if len(results) == top_n:
+            break
+    return results
+
+
 def get_scale_choices():
     """Return a list of all available scale names."""
     return sorted(ALL_SCALES.keys())
@@ -83,6 +225,23 @@ def get_pitch_classes(scale_name):
     return ALL_SCALES.get(scale_name)
 
 
+def get_scale_pitch_classes(scale_name, scale_type="natural"):
+    """
+    Get pitch classes for a scale by name and type.
+
+    Args:
+        scale_name: Scale name, e.g. "A Minor" (a " (Natural)"/" (Pentatonic)" suffix is ignored)
+        scale_type: 'natural' or 'pentatonic'
+
+    Returns:
+        Scale entry (a read-only, set-like collection of pitch classes)
+
+    Raises:
+        KeyError: If the scale name is unknown
+    """
+    return find_scale(scale_name, scale_type)
+
+
 def select_scale_interactive():
     """
     Interactive scale selection with two-step process:
@@ -147,14 +306,8 @@ def select_scale_interactive():
             print("Invalid choice. Please enter 1 or 2.")
     
     # Get the appropriate pitch classes
-    is_major = "Major" in selected_scale
-    
-    if scale_type == "natural":
-        pitch_classes = MAJOR_DIATONIC[selected_scale] if is_major else MINOR_DIATONIC[selected_scale]
-        full_name = f"{selected_scale} (Natural)"
-    else:
-        pitch_classes = MAJOR_PENTATONIC[selected_scale] if is_major else MINOR_PENTATONIC[selected_scale]
-        full_name = f"{selected_scale} (Pentatonic)"
+    pitch_classes = find_scale(selected_scale, scale_type)
+    full_name = f"{selected_scale} ({scale_type.capitalize()})"
     
     print(f"\n✓ Final selection: {full_name}")
     print(f"  Pitch classes: {sorted(pitch_classes)}")
@@ -5,30 +5,18 @@ Handles database schema creation and session data logging to PostgreSQL.
 
 import os
 import uuid
-import psycopg2
-from psycopg2 import sql
 from datetime import datetime
 from typing import Optional, Dict, Any
 import json
 
+import db_pool
+from metric_writer import MetricWriter, UPSERT_SESSIONS_SQL, BACKFILL_ROLLUPS_SQL
+
 # NOTE: Opik tracking removed from session_logger - no LLM calls here
 # Only DB writes which don't need tracing
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    # Load .env from backend directory
-    env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
-    load_dotenv(env_path)
-except ImportError:
-    print("[WARN] python-dotenv not installed. Make sure to set environment variables.")
-
-# Database configuration from environment
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = int(os.getenv("DB_PORT", "5432"))
-DB_NAME = os.getenv("DB_NAME", "postgres")
+# How often an in-progress session row is upserted, so a crash loses at most this much
+CHECKPOINT_INTERVAL_SEC = 10.0
 
 
 class SQLLoader:
@@ -97,7 +85,14 @@ class SQLLoader:
 
 
 class SessionLogger:
-    """Handles session logging to PostgreSQL"""
+    """
+    Handles session logging to PostgreSQL.
+
+    Thread-safe: every database call checks a connection out of the shared
+    db_pool instead of holding one, so the audio thread, API handlers and
+    the metric writer never share a connection, and a dropped connection is
+    replaced on the next checkout.
+    """
 
     @staticmethod
     def _convert_numpy_types(value):
@@ -110,35 +105,49 @@ class SessionLogger:
         return value
 
     def __init__(self):
-        """Initialize database connection and load SQL"""
-        self.conn = None
+        """
+        Load SQL and start the metric writer.
+
+        If the database is unreachable, sessions are still logged: the writer
+        spools rows locally and creates the tables once the database is back.
+        """
         # Load SQL from files
         sql_dir = os.path.join(os.path.dirname(__file__), "..", "sql")
         self.sql_loader = SQLLoader(sql_dir)
-        self.connect()
-        self.ensure_tables_exist()
+        connected = self.connect()
+        if connected:
+            self.ensure_tables_exist()
         # In-memory accumulator for session metrics
         self.session_data = {}  # session_id -> accumulated metrics
+        # Background write-behind for frames and session rows (replays any spool left by a crash)
+        # (holds one pooled connection while the database is reachable)
+        self.writer = MetricWriter(
+            connect=db_pool.raw_connection,
+            sessions_sql=self.sql_loader.get_query("upsert_sessions") or UPSERT_SESSIONS_SQL,
+            prepare=None if connected else self.ensure_tables_exist,
+        )
+
+    def connect(self) -> bool:
+        """
+        Check that the database is reachable through the shared pool.
 
-    def connect(self):
-        """Establish database connection"""
+        Returns:
+            True if reachable; False (with a warning) if rows will be spooled for now
+        """
         try:
-            self.conn = psycopg2.connect(
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_NAME
-            )
-            print(f"[OK] Connected to PostgreSQL at {DB_HOST}:{DB_PORT}/{DB_NAME}")
+            with db_pool.connection() as conn:
+                conn.cursor().execute("SELECT 1")
+            print(f"[OK] Connected to PostgreSQL at {db_pool.describe()}")
+            return True
         except Exception as e:
-            print(f"[ERR] Failed to connect to PostgreSQL: {e}")
-            raise
+            print(f"[WARN] PostgreSQL unavailable ({e}); session data will be spooled until it is back")
+            return False
 
     def ensure_tables_exist(self):
         """Create tables if they don't exist"""
+        conn = db_pool.raw_connection()
         try:
-            cursor = self.conn.cursor()
+            cursor = conn.cursor()
 
             # Check if the sessions table exists and has the new schema
             check_schema_sql = self.sql_loader.get_query("check_new_schema")
@@ -178,7 +187,7 @@ class SessionLogger:
                         ALTER TABLE fretcoach.sessions
                         ADD COLUMN scale_type VARCHAR(20) DEFAULT 'natural';
                     """)
-                self.conn.commit()
+                conn.commit()
 
             # Create tables using schema file or inline SQL
             if self.sql_loader.schema:
@@ -218,12 +227,87 @@ class SessionLogger:
                     ON fretcoach.sessions(start_timestamp DESC);
                 """)
 
-            self.conn.commit()
+            # Per-frame history written by the MetricWriter: range-partitioned by
+            # month (partitions are created on demand), BRIN on the timestamp
+            cursor.execute("""
+                SELECT c.relkind FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'fretcoach' AND c.relname = 'session_frames';
+            """)
+            frames_kind = cursor.fetchone()
+            if frames_kind and frames_kind[0] == 'r':
+                print("[WARN] Moving unpartitioned session_frames to session_frames_unpartitioned...")
+                cursor.execute("ALTER TABLE fretcoach.session_frames RENAME TO session_frames_unpartitioned;")
+                cursor.execute("""
+                    ALTER TABLE fretcoach.session_frames_unpartitioned
+                    RENAME CONSTRAINT session_frames_pkey TO session_frames_unpartitioned_pkey;
+                """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS fretcoach.session_frames (
+                    session_id VARCHAR(255) NOT NULL,
+                    user_id VARCHAR(255) NOT NULL,
+                    frame_index INT NOT NULL,
+                    frame_timestamp TIMESTAMP NOT NULL,
+                    pitch_accuracy FLOAT,
+                    scale_conformity FLOAT,
+                    timing_stability FLOAT,
+                    note_detected BOOLEAN,
+                    in_scale BOOLEAN,
+                    pitch_class SMALLINT,
+                    CONSTRAINT session_frames_pkey PRIMARY KEY (session_id, frame_index, frame_timestamp)
+                ) PARTITION BY RANGE (frame_timestamp);
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_session_frames_timestamp_brin
+                ON fretcoach.session_frames USING brin (frame_timestamp) WITH (pages_per_range = 32);
+            """)
+
+            # Daily per-user, per-scale rollups read by the dashboard and agents;
+            # kept current by the MetricWriter, backfilled once when created
+            cursor.execute("SELECT to_regclass('fretcoach.session_rollups_daily');")
+            has_rollups = cursor.fetchone()[0] is not None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS fretcoach.session_rollups_daily (
+                    user_id VARCHAR(255) NOT NULL,
+                    day DATE NOT NULL,
+                    scale_chosen VARCHAR(100) NOT NULL,
+                    scale_type VARCHAR(20) NOT NULL,
+                    session_count INT NOT NULL,
+                    total_duration_seconds FLOAT NOT NULL DEFAULT 0,
+                    pitch_sum FLOAT NOT NULL DEFAULT 0,
+                    pitch_count INT NOT NULL DEFAULT 0,
+                    scale_sum FLOAT NOT NULL DEFAULT 0,
+                    scale_count INT NOT NULL DEFAULT 0,
+                    timing_sum FLOAT NOT NULL DEFAULT 0,
+                    timing_count INT NOT NULL DEFAULT 0,
+                    total_notes BIGINT NOT NULL DEFAULT 0,
+                    correct_notes BIGINT NOT NULL DEFAULT 0,
+                    bad_notes BIGINT NOT NULL DEFAULT 0,
+                    last_practiced TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (user_id, day, scale_chosen, scale_type)
+                );
+            """)
+            # Serves keyset pagination of a user's history (newest first) and the
+            # per-day rollup refresh
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sessions_user_recent
+                ON fretcoach.sessions(user_id, start_timestamp DESC, session_id DESC);
+            """)
+            cursor.execute("DROP INDEX IF EXISTS fretcoach.idx_sessions_user_start;")
+            if not has_rollups:
+                print("[WARN] Backfilling session_rollups_daily from existing sessions...")
+                cursor.execute(BACKFILL_ROLLUPS_SQL)
+
+            conn.commit()
             print("[OK] Database tables verified/created")
         except Exception as e:
             print(f"[ERR] Error creating tables: {e}")
-            self.conn.rollback()
+            conn.rollback()
             raise
+        finally:
+            conn.close()
 
     def start_session(
         self,
@@ -282,6 +366,9 @@ class SessionLogger:
             "correct_notes_played": 0,
             "bad_notes_played": 0,
             "total_inscale_notes": 0,  # This is the total number of notes in the scale (e.g., 5 for pentatonic)
+            # Write-behind bookkeeping
+            "frame_index": 0,
+            "last_checkpoint": now,
         }
 
         print(f"[OK] Session started in memory: {session_id}")
@@ -296,8 +383,10 @@ class SessionLogger:
         debug_info: Optional[Dict[str, Any]] = None
     ) -> None:
         """
-        Accumulate performance metrics in memory (NOT written to database yet).
-        Database write happens only at end_session().
+        Accumulate performance metrics in memory and queue a per-frame row.
+
+        Never blocks on the database: the frame row (and a session checkpoint
+        every CHECKPOINT_INTERVAL_SEC) is handed to the background MetricWriter.
 
         Args:
             session_id: Session UUID
@@ -333,6 +422,79 @@ class SessionLogger:
             else:
                 session["bad_notes_played"] += 1
 
+        # Queue per-frame history
+        now = datetime.now()
+        debug_info = debug_info or {}
+        self.writer.enqueue("frame", (
+            session_id,
+            session["user_id"],
+            session["frame_index"],
+            now,
+            pitch_accuracy,
+            scale_conformity,
+            timing_stability,
+            debug_info.get("note_detected"),
+            debug_info.get("in_scale"),
+            self._convert_numpy_types(debug_info.get("pitch_class")),
+        ))
+        session["frame_index"] += 1
+
+        # Checkpoint the session row so a crash keeps everything up to here
+        if (now - session["last_checkpoint"]).total_seconds() >= CHECKPOINT_INTERVAL_SEC:
+            self.writer.enqueue("session", self._session_row(session, now))
+            session["last_checkpoint"] = now
+
+    def _session_row(self, session: Dict[str, Any], end_time: datetime) -> tuple:
+        """Build the fretcoach.sessions row (metric averages up to end_time)."""
+        # Get enabled metrics from session
+        enabled_metrics = session.get("enabled_metrics", {
+            "pitch_accuracy": True,
+            "scale_conformity": True,
+            "timing_stability": True
+        })
+
+        # Calculate averages only for enabled metrics
+        metric_count = session["metric_count"]
+
+        # Calculate or set to None based on enabled metrics
+        if metric_count > 0 and enabled_metrics.get("pitch_accuracy", True):
+            avg_pitch_accuracy = self._convert_numpy_types(session["pitch_accuracy_sum"] / metric_count)
+        else:
+            avg_pitch_accuracy = None
+
+        if metric_count > 0 and enabled_metrics.get("scale_conformity", True):
+            avg_scale_conformity = self._convert_numpy_types(session["scale_conformity_sum"] / metric_count)
+        else:
+            avg_scale_conformity = None
+
+        if metric_count > 0 and enabled_metrics.get("timing_stability", True):
+            avg_timing_stability = self._convert_numpy_types(session["timing_stability_sum"] / metric_count)
+        else:
+            avg_timing_stability = None
+
+        # Calculate duration
+        duration = (end_time - session["start_timestamp"]).total_seconds()
+
+        return (
+            session["session_id"],
+            session["user_id"],
+            session["start_timestamp"],
+            end_time,
+            avg_pitch_accuracy,
+            avg_scale_conformity,
+            avg_timing_stability,
+            session["scale_chosen"],
+            session["scale_type"],
+            session["sensitivity"],
+            session["strictness"],
+            session["total_notes_played"],
+            session["correct_notes_played"],
+            session["bad_notes_played"],
+            session["total_inscale_notes"],
+            duration,
+            session["ambient_light_option"]
+        )
+
     def end_session(
         self,
         session_id: str,
@@ -340,7 +502,9 @@ class SessionLogger:
     ) -> None:
         """
         End a session, calculate final averages, and save to database.
-        This is the ONLY time data is written to the database.
+        The final row goes through the MetricWriter (upserting any checkpoint)
+        and is flushed before returning; if the database is unreachable it is
+        spooled locally and written on the next successful connection.
 
         Args:
             session_id: Session UUID
@@ -355,105 +519,28 @@ class SessionLogger:
             session = self.session_data[session_id]
             now = datetime.now()
 
-            # Get enabled metrics from session
-            enabled_metrics = session.get("enabled_metrics", {
-                "pitch_accuracy": True,
-                "scale_conformity": True,
-                "timing_stability": True
-            })
-
-            # Calculate averages only for enabled metrics
-            metric_count = session["metric_count"]
-
-            # Calculate or set to None based on enabled metrics
-            if metric_count > 0 and enabled_metrics.get("pitch_accuracy", True):
-                avg_pitch_accuracy = self._convert_numpy_types(session["pitch_accuracy_sum"] / metric_count)
-            else:
-                avg_pitch_accuracy = None
-
-            if metric_count > 0 and enabled_metrics.get("scale_conformity", True):
-                avg_scale_conformity = self._convert_numpy_types(session["scale_conformity_sum"] / metric_count)
-            else:
-                avg_scale_conformity = None
-
-            if metric_count > 0 and enabled_metrics.get("timing_stability", True):
-                avg_timing_stability = self._convert_numpy_types(session["timing_stability_sum"] / metric_count)
-            else:
-                avg_timing_stability = None
-
-            # Calculate duration
-            start_time = session["start_timestamp"]
-            duration = (now - start_time).total_seconds()
-
             # Set total_inscale_notes
             session["total_inscale_notes"] = total_inscale_notes
 
-            # Insert single row into database
-            cursor = self.conn.cursor()
-            insert_sql = self.sql_loader.get_query("insert_session")
-            if insert_sql:
-                cursor.execute(insert_sql, (
-                    session["session_id"],
-                    session["user_id"],
-                    session["start_timestamp"],
-                    now,
-                    avg_pitch_accuracy,
-                    avg_scale_conformity,
-                    avg_timing_stability,
-                    session["scale_chosen"],
-                    session["scale_type"],
-                    session["sensitivity"],
-                    session["strictness"],
-                    session["total_notes_played"],
-                    session["correct_notes_played"],
-                    session["bad_notes_played"],
-                    session["total_inscale_notes"],
-                    duration,
-                    session["ambient_light_option"]
-                ))
-            else:
-                cursor.execute("""
-                    INSERT INTO fretcoach.sessions
-                    (session_id, user_id, start_timestamp, end_timestamp,
-                     pitch_accuracy, scale_conformity, timing_stability,
-                     scale_chosen, scale_type, sensitivity, strictness,
-                     total_notes_played, correct_notes_played, bad_notes_played,
-                     total_inscale_notes, duration_seconds, ambient_light_option)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    session["session_id"],
-                    session["user_id"],
-                    session["start_timestamp"],
-                    now,
-                    avg_pitch_accuracy,
-                    avg_scale_conformity,
-                    avg_timing_stability,
-                    session["scale_chosen"],
-                    session["scale_type"],
-                    session["sensitivity"],
-                    session["strictness"],
-                    session["total_notes_played"],
-                    session["correct_notes_played"],
-                    session["bad_notes_played"],
-                    session["total_inscale_notes"],
-                    duration,
-                    session["ambient_light_option"]
-                ))
-
-            self.conn.commit()
+            row = self._session_row(session, now)
+            self.writer.enqueue("session", row)
+            saved = self.writer.flush()
 
             # Clean up memory
             del self.session_data[session_id]
 
-            print(f"[OK] Session ended and saved to database: {session_id}")
+            if saved:
+                print(f"[OK] Session ended and saved to database: {session_id}")
+            else:
+                print(f"[WARN] Session ended but database unavailable; spooled to {self.writer.spool_path}: {session_id}")
             # Format metrics display, showing N/A for disabled metrics
+            duration, avg_pitch_accuracy, avg_scale_conformity, avg_timing_stability = row[15], row[4], row[5], row[6]
             pitch_display = f"{avg_pitch_accuracy*100:.1f}%" if avg_pitch_accuracy is not None else "N/A"
             scale_display = f"{avg_scale_conformity*100:.1f}%" if avg_scale_conformity is not None else "N/A"
             timing_display = f"{avg_timing_stability*100:.1f}%" if avg_timing_stability is not None else "N/A"
             print(f"  Duration: {duration:.1f}s | Pitch: {pitch_display} | Scale: {scale_display} | Timing: {timing_display}")
         except Exception as e:
             print(f"[ERR] Error ending session: {e}")
-            self.conn.rollback()
             # Clean up memory even on error
             if session_id in self.session_data:
                 del self.session_data[session_id]
@@ -468,8 +555,10 @@ class SessionLogger:
         Returns:
             Dictionary with session stats or None if not found
         """
+        conn = None
         try:
-            cursor = self.conn.cursor()
+            conn = db_pool.raw_connection()
+            cursor = conn.cursor()
             get_stats_sql = self.sql_loader.get_query("get_session_stats")
             if get_stats_sql:
                 cursor.execute(get_stats_sql, (session_id,))
@@ -510,6 +599,9 @@ class SessionLogger:
         except Exception as e:
             print(f"[ERR] Error retrieving session stats: {e}")
             return None
+        finally:
+            if conn is not None:
+                conn.close()
 
     def get_user_sessions(self, user_id: str, limit: int = 10) -> list:
         """
@@ -522,8 +614,10 @@ class SessionLogger:
         Returns:
             List of session records
         """
+        conn = None
         try:
-            cursor = self.conn.cursor()
+            conn = db_pool.raw_connection()
+            cursor = conn.cursor()
             get_sessions_sql = self.sql_loader.get_query("get_user_sessions")
             if get_sessions_sql:
                 cursor.execute(get_sessions_sql, (user_id, limit))
@@ -560,12 +654,15 @@ class SessionLogger:
         except Exception as e:
             print(f"[ERR] Error retrieving user sessions: {e}")
             return []
+        finally:
+            if conn is not None:
+                conn.close()
 
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            print("[OK] Database connection closed")
+        """Flush queued metrics and release pooled database connections"""
+        self.writer.close()
+        db_pool.dispose()
+        print("[OK] Database connection closed")
 
 
 # Global session logger instance
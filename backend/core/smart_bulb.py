@@ -2,10 +2,17 @@
 Smart Bulb Controller for FretCoach
 Handles Tuya smart bulb operations including on/off and color control.
 """
+import abc
 import tinytuya
 import os
+import threading
+import time
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv, find_dotenv
 
+from audio_metrics import BulbState
+from perf import LatencyHistogram
+
 # Load environment variables
 load_dotenv(find_dotenv())
 
@@ -17,12 +24,25 @@ ACCESS_SECRET = os.getenv("HAVELLS_ACCESS_SECRET")
 DEVICE_ID = os.getenv("HAVELLS_DEVICE_ID")
 REGION = os.getenv("HAVELLS_REGION", "in")
 
+# =========================================================
+# TUYA LOCAL (LAN) CONFIGURATION
+# =========================================================
+LOCAL_IP = os.getenv("HAVELLS_LOCAL_IP")
+LOCAL_KEY = os.getenv("HAVELLS_LOCAL_KEY")
+LOCAL_VERSION = float(os.getenv("HAVELLS_LOCAL_VERSION", "3.3"))
+LOCAL_PORT = int(os.getenv("HAVELLS_LOCAL_PORT", str(tinytuya.TCPPORT)))
+
 # Check if credentials are configured
 SMART_BULB_ENABLED = bool(ACCESS_ID and ACCESS_SECRET and DEVICE_ID)
+LOCAL_BULB_ENABLED = bool(DEVICE_ID and LOCAL_IP and LOCAL_KEY)
+
+if LOCAL_BULB_ENABLED:
+    print(f"✅ Smart bulb local control at {LOCAL_IP}:{LOCAL_PORT}")
 
 if not SMART_BULB_ENABLED:
-    print("⚠️  Smart bulb credentials not configured. Light features will be disabled.")
-    print("   Set HAVELLS_ACCESS_ID, HAVELLS_ACCESS_SECRET, and HAVELLS_DEVICE_ID in .env file")
+    if not LOCAL_BULB_ENABLED:
+        print("⚠️  Smart bulb credentials not configured. Light features will be disabled.")
+        print("   Set HAVELLS_ACCESS_ID, HAVELLS_ACCESS_SECRET, and HAVELLS_DEVICE_ID in .env file")
     cloud = None
 else:
     # Initialize Tuya Cloud connection
@@ -90,3 +110,459 @@ def set_bulb_hsv(h, s=1000, v=1000):
         v: Value/Brightness (0-1000), default 1000
     """
     set_bulb_color(h, s, v)
+
+
+# =========================================================
+# TRANSPORTS
+# =========================================================
+
+class BulbTransport(abc.ABC):
+    """
+    Sends commands to the bulb. Methods block for the network round trip
+    and raise on failure; only the BulbActor thread should call them.
+    """
+    name = "none"
+
+    @abc.abstractmethod
+    def set_power(self, on: bool) -> None:
+        """Switch the bulb on or off."""
+
+    @abc.abstractmethod
+    def set_hsv(self, h: int, s: int, v: int) -> None:
+        """Set the colour (hue 0-360, saturation and value 0-1000)."""
+
+    def keepalive(self) -> None:
+        """Called when the actor has been idle for a while."""
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class CloudTransport(BulbTransport):
+    """
+    Tuya Cloud API via tinytuya.Cloud.
+
+    One client is reused for every command so its access token is fetched
+    once rather than per colour change.
+    """
+    name = "cloud"
+
+    def __init__(self, client: tinytuya.Cloud, device_id: str):
+        self.client = client
+        self.device_id = device_id
+
+    def _send(self, commands: list) -> None:
+        result = self.client.sendcommand(self.device_id, {"commands": commands})
+        if isinstance(result, dict) and not result.get("success", True):
+            raise RuntimeError(result.get("msg") or result.get("Error") or "Tuya Cloud command failed")
+
+    def set_power(self, on: bool) -> None:
+        self._send([{"code": "switch_led", "value": on}])
+
+    def set_hsv(self, h: int, s: int, v: int) -> None:
+        self._send([{"code": "colour_data_v2", "value": {"h": int(h), "s": int(s), "v": int(v)}}])
+
+
+class LocalTransport(BulbTransport):
+    """
+    Direct LAN control via tinytuya.BulbDevice over one persistent socket.
+
+    Commands go straight to the bulb (a few ms on the LAN instead of a cloud
+    round trip). The socket is kept open with heartbeats while idle and
+    reopened on the next command after a failure.
+
+    Args:
+        device_id: Tuya device id
+        address: Bulb IP address
+        local_key: Device local key
+        version: Tuya protocol version (3.3 for most colour_data_v2 bulbs)
+        port: TCP port (6668)
+        timeout: Socket timeout in seconds; keep it short so fallback is quick
+    """
+    name = "local"
+
+    def __init__(self, device_id: str, address: str, local_key: str, version: float = 3.3, port: int = tinytuya.TCPPORT, timeout: float = 1.0):
+        self.device_id = device_id
+        self.address = address
+        self.local_key = local_key
+        self.version = version
+        self.port = port
+        self.timeout = timeout
+        self.device: Optional[tinytuya.BulbDevice] = None
+
+    def _connect(self) -> tinytuya.BulbDevice:
+        if self.device is None:
+            device = tinytuya.BulbDevice(
+                self.device_id,
+                self.address,
+                self.local_key,
+                version=self.version,
+                port=self.port,
+                persist=True,
+                connection_timeout=self.timeout,
+                connection_retry_limit=1,
+                connection_retry_delay=0,
+            )
+            # colour_data_v2 bulbs use the type B data points (20-24); setting
+            # the type avoids a status round trip to detect it
+            device.set_bulb_type("B")
+            self.device = device
+        return self.device
+
+    def _check(self, result) -> None:
+        if isinstance(result, dict) and "Error" in result:
+            self.close()
+            raise ConnectionError(result["Error"])
+
+    def set_power(self, on: bool) -> None:
+        device = self._connect()
+        self._check(device.set_status(on, device.dpset["switch"]))
+
+    def set_hsv(self, h: int, s: int, v: int) -> None:
+        self._check(self._connect().set_hsv(h / 360.0, s / 1000.0, v / 1000.0))
+
+    def keepalive(self) -> None:
+        if self.device is not None:
+            self._check(self.device.heartbeat())
+
+    def close(self) -> None:
+        if self.device is not None:
+            try:
+                self.device.close()
+            except Exception:
+                pass
+            self.device = None
+
+
+class FallbackTransport(BulbTransport):
+    """
+    Prefer `primary` (LAN) and fall back to `fallback` (cloud) when it fails.
+
+    After a primary failure the fallback is used for `retry_after` seconds
+    before the primary is tried again. Latency and failures are recorded
+    per transport.
+    """
+
+    def __init__(self, primary: BulbTransport, fallback: BulbTransport, retry_after: float = 30.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self.name = f"{primary.name}+{fallback.name}"
+        self._primary_down_until = 0.0
+        self.metrics = {
+            t.name: {"sent": 0, "failures": 0, "latency": LatencyHistogram()}
+            for t in (primary, fallback)
+        }
+
+    @property
+    def active(self) -> BulbTransport:
+        return self.primary if time.monotonic() >= self._primary_down_until else self.fallback
+
+    def _call(self, transport: BulbTransport, method: str, *args) -> None:
+        metrics = self.metrics[transport.name]
+        start = time.perf_counter()
+        try:
+            getattr(transport, method)(*args)
+        except Exception:
+            metrics["failures"] += 1
+            raise
+        metrics["latency"].record((time.perf_counter() - start) * 1e6)
+        metrics["sent"] += 1
+
+    def _send(self, method: str, *args) -> None:
+        if self.active is self.primary:
+            try:
+                self._call(self.primary, method, *args)
+                return
+            except Exception as e:
+                self.primary.close()
+                self._primary_down_until = time.monotonic() + self.retry_after
+                print(f"⚠️  Bulb {self.primary.name} control failed ({e}); using {self.fallback.name} for {self.retry_after:.0f}s")
+        self._call(self.fallback, method, *args)
+
+    def set_power(self, on: bool) -> None:
+        self._send("set_power", on)
+
+    def set_hsv(self, h: int, s: int, v: int) -> None:
+        self._send("set_hsv", h, s, v)
+
+    def keepalive(self) -> None:
+        if self.active is self.primary:
+            try:
+                self.primary.keepalive()
+            except Exception:
+                self.primary.close()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active.name,
+            "transports": {
+                name: {"sent": m["sent"], "failures": m["failures"], "latency": m["latency"].to_dict()}
+                for name, m in self.metrics.items()
+            },
+        }
+
+    def close(self) -> None:
+        self.primary.close()
+        self.fallback.close()
+
+
+class MockTransport(BulbTransport):
+    """
+    Offline stand-in that records commands instead of sending them.
+
+    Args:
+        latency: Seconds each command blocks for (simulated round trip)
+        fail: Number of upcoming commands that raise ConnectionError
+    """
+    name = "mock"
+
+    def __init__(self, latency: float = 0.0, fail: int = 0):
+        self.latency = latency
+        self.fail = fail
+        self.commands: List[Tuple[float, str, tuple]] = []  # (time, command, args)
+
+    def _send(self, command: str, args: tuple) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail > 0:
+            self.fail -= 1
+            raise ConnectionError("mock bulb unreachable")
+        self.commands.append((time.time(), command, args))
+
+    def set_power(self, on: bool) -> None:
+        self._send("power", (on,))
+
+    def set_hsv(self, h: int, s: int, v: int) -> None:
+        self._send("hsv", (int(h), int(s), int(v)))
+
+
+def get_transport() -> Optional[BulbTransport]:
+    """
+    Transport selected by FRETCOACH_BULB_TRANSPORT.
+
+    "auto" (default) uses LAN control with cloud fallback when both are
+    configured, otherwise whichever one is; "local", "cloud" and "mock"
+    force a single transport.
+
+    Returns:
+        The transport, or None if the bulb is not configured
+    """
+    name = os.getenv("FRETCOACH_BULB_TRANSPORT", "auto").lower()
+    if name == "mock":
+        return MockTransport()
+
+    local = LocalTransport(DEVICE_ID, LOCAL_IP, LOCAL_KEY, LOCAL_VERSION, LOCAL_PORT) if LOCAL_BULB_ENABLED else None
+    remote = CloudTransport(cloud, DEVICE_ID) if SMART_BULB_ENABLED and cloud else None
+    if name == "local":
+        return local
+    if name == "cloud":
+        return remote
+    if local and remote:
+        return FallbackTransport(local, remote)
+    return local or remote
+
+
+# =========================================================
+# BULB ACTOR
+# =========================================================
+
+# Idle time after which the actor pings the transport to keep its connection open
+KEEPALIVE_SEC = 10.0
+
+
+class BulbActor:
+    """
+    Background thread that owns all bulb network I/O.
+
+    Callers only drop the latest command into a single-slot mailbox (one
+    slot for power, one for colour) and return immediately; a newer colour
+    replaces an unsent one, so stale hues are never queued. Colour changes
+    are rate-limited by a BulbState (update_interval, hue_epsilon) and
+    failures back off exponentially up to max_backoff seconds.
+    """
+
+    def __init__(self, transport: Optional[BulbTransport], state: Optional[BulbState] = None, max_backoff: float = 30.0):
+        self.transport = transport
+        self.state = state or BulbState()
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._power: Optional[bool] = None
+        self._colour: Optional[Tuple[int, int, int]] = None
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._backoff = 0.5
+        self._retry_at = 0.0
+
+        self.sent = 0
+        self.superseded = 0  # Colours replaced by a newer one before sending
+        self.skipped = 0     # Colours within hue_epsilon of the bulb's current hue
+        self.failures = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def enabled(self) -> bool:
+        return self.transport is not None
+
+    def power(self, on: bool) -> None:
+        """Queue a power change (never blocks)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._power = on
+        self._notify()
+
+    def set_hsv(self, h: int, s: int = 1000, v: int = 1000) -> None:
+        """Queue a colour change, replacing any colour not yet sent (never blocks)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._colour is not None:
+                self.superseded += 1
+            self._colour = (int(h), int(s), int(v))
+        self._notify()
+
+    def reset(self) -> None:
+        """Forget the last sent hue (new session), keeping the throttle settings."""
+        with self._lock:
+            self.state = BulbState(update_interval=self.state.update_interval, hue_epsilon=self.state.hue_epsilon)
+            self._colour = None
+
+    def _notify(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="fretcoach-bulb", daemon=True)
+                    self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """
+        Send any queued power change (one attempt), then stop the thread.
+
+        The thread closes the transport as it exits, so a command still in
+        flight after `timeout` is never cut off and no second thread starts.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is not None:
+                self._closing = True
+        if thread is None:
+            if self.transport is not None:
+                self.transport.close()
+            return
+        self._wakeup.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"⚠️  Bulb command still in progress after {timeout:.1f}s; bulb thread will close on its own")
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                power, colour = self._power, self._colour
+            if power is None and (colour is None or self._closing):
+                if self._closing:
+                    self._exit()
+                    return
+                if not self._wakeup.wait(KEEPALIVE_SEC):
+                    self._keepalive()
+                self._wakeup.clear()
+                continue
+
+            # Power changes wait only for backoff; colours also for the update interval
+            delay = self._retry_at - time.monotonic()
+            if power is None:
+                delay = max(delay, self.state.time_until_next())
+            if delay > 0 and not self._closing:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue  # Pick up whatever is newest after the wait
+
+            with self._lock:
+                if power is not None:
+                    self._power = None
+                else:
+                    colour = self._colour
+                    self._colour = None
+            if power is None and not self.state.hue_changed(colour[0]):
+                self.skipped += 1
+                continue
+            self._send(power, colour)
+
+    def _exit(self) -> None:
+        """Close the transport, then let the next command start a fresh thread."""
+        try:
+            self.transport.close()
+        finally:
+            with self._lock:
+                self._thread = None
+                self._closing = False
+
+    def _keepalive(self) -> None:
+        """Keep an idle connection (e.g. the LAN socket) open between commands."""
+        try:
+            self.transport.keepalive()
+        except Exception:
+            pass  # Reconnects on the next command
+
+    def _send(self, power: Optional[bool], colour: Optional[Tuple[int, int, int]]) -> None:
+        start = time.perf_counter()
+        try:
+            if power is not None:
+                self.transport.set_power(power)
+            else:
+                self.transport.set_hsv(*colour)
+        except Exception as e:
+            self.failures += 1
+            if self._closing:
+                # Stopping: that was the final attempt
+                print(f"⚠️  Bulb command failed ({self.transport.name}): {e}")
+                return
+            print(f"⚠️  Bulb command failed ({self.transport.name}): {e}; retrying in {self._backoff:.1f}s")
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            # Retry unless a newer command arrived meanwhile
+            with self._lock:
+                if power is not None and self._power is None:
+                    self._power = power
+                elif power is None and self._colour is None:
+                    self._colour = colour
+            return
+
+        self.latency.record((time.perf_counter() - start) * 1e6)
+        self.sent += 1
+        self._backoff = 0.5
+        self._retry_at = 0.0
+        if power is None:
+            self.state.mark_sent(colour[0])
+
+    def stats(self) -> dict:
+        """Counters and send latency (ms) for debugging."""
+        return {
+            "transport": self.transport.name if self.transport else None,
+            "sent": self.sent,
+            "superseded": self.superseded,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "backoff_sec": self._backoff if self._retry_at else 0.0,
+            "latency": self.latency.to_dict(),
+            **(self.transport.stats() if self.transport else {}),
+        }
+
+
+# Global actor instance
+_actor = None
+
+
+def get_bulb_actor() -> BulbActor:
+    """Get or create the global bulb actor (a disabled no-op if the bulb is not configured)."""
+    global _actor
+    if _actor is None:
+        _actor = BulbActor(get_transport())
+    return _actor
@@ -51,9 +51,80 @@ ON fretcoach.sessions (start_timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_sessions_user_id
 ON fretcoach.sessions (user_id);
 
+-- Keyset pagination of a user's history (newest first) and rollup refreshes
+CREATE INDEX IF NOT EXISTS idx_sessions_user_recent
+ON fretcoach.sessions (user_id, start_timestamp DESC, session_id DESC);
+
 -- Enable RLS (no policies yet)
 ALTER TABLE fretcoach.sessions ENABLE ROW LEVEL SECURITY;
 
+-- ------------------------------------------------------------
+-- Table: fretcoach.session_frames
+-- Per-frame history bulk-loaded (binary COPY) by the session logger.
+-- Range-partitioned by month on frame_timestamp; the logger creates
+-- fretcoach.session_frames_YYYY_MM partitions on demand.
+-- ------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS fretcoach.session_frames
+(
+    session_id VARCHAR(255) NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    frame_index INTEGER NOT NULL,
+    frame_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+
+    pitch_accuracy DOUBLE PRECISION,
+    scale_conformity DOUBLE PRECISION,
+    timing_stability DOUBLE PRECISION,
+
+    note_detected BOOLEAN,
+    in_scale BOOLEAN,
+    pitch_class SMALLINT,
+
+    CONSTRAINT session_frames_pkey PRIMARY KEY (session_id, frame_index, frame_timestamp)
+) PARTITION BY RANGE (frame_timestamp);
+
+-- Indexes
+-- Frames arrive in time order, so a BRIN index stays tiny and still
+-- narrows time-range scans within a partition
+CREATE INDEX IF NOT EXISTS idx_session_frames_timestamp_brin
+ON fretcoach.session_frames USING brin (frame_timestamp) WITH (pages_per_range = 32);
+
+ALTER TABLE fretcoach.session_frames ENABLE ROW LEVEL SECURITY;
+
+-- ------------------------------------------------------------
+-- Table: fretcoach.session_rollups_daily
+-- Per-user, per-scale daily aggregates of fretcoach.sessions, refreshed
+-- by the session logger whenever it writes a session row. Metrics are
+-- stored as sums and non-null counts: average = SUM(x_sum) / SUM(x_count).
+-- ------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS fretcoach.session_rollups_daily
+(
+    user_id VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,
+    scale_chosen VARCHAR(100) NOT NULL,
+    scale_type VARCHAR(20) NOT NULL,
+
+    session_count INTEGER NOT NULL,
+    total_duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+
+    pitch_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    pitch_count INTEGER NOT NULL DEFAULT 0,
+    scale_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    scale_count INTEGER NOT NULL DEFAULT 0,
+    timing_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    timing_count INTEGER NOT NULL DEFAULT 0,
+
+    total_notes BIGINT NOT NULL DEFAULT 0,
+    correct_notes BIGINT NOT NULL DEFAULT 0,
+    bad_notes BIGINT NOT NULL DEFAULT 0,
+
+    last_practiced TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT session_rollups_daily_pkey PRIMARY KEY (user_id, day, scale_chosen, scale_type)
+);
+
+ALTER TABLE fretcoach.session_rollups_daily ENABLE ROW LEVEL SECURITY;
+
 -- ------------------------------------------------------------
 -- Table: fretcoach.ai_practice_plans
 -- ------------------------------------------------------------
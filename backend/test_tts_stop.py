@@ -0,0 +1,97 @@
+"""
+Test script for stopping streamed coaching speech
+Plays ToneTTSBackend audio through InterruptibleAudioPlayer on a fake output
+device, requests a stop mid-phrase and checks that playback ends promptly,
+queued audio is dropped and the partial clip is not cached.
+Run from the repo root: python backend/test_tts_stop.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "api", "services"))
+
+import sounddevice as sd
+from audio_player import SAMPLE_RATE, InterruptibleAudioPlayer
+from tts_cache import ClipCache, ToneTTSBackend
+
+BLOCK_FRAMES = 512
+PHRASE = " ".join(["slow down and count to create consistent spacing"] * 8)
+
+
+class FakeOutputStream:
+    """Calls the player's callback from a thread at real-time pace, like a sound card would."""
+
+    played_frames = 0
+
+    def __init__(self, samplerate, channels, dtype, callback):
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._closed.is_set():
+            outdata = np.zeros((BLOCK_FRAMES, self.channels), dtype=self.dtype)
+            try:
+                self.callback(outdata, BLOCK_FRAMES, None, None)
+            except sd.CallbackStop:
+                return
+            FakeOutputStream.played_frames += int(np.count_nonzero(outdata.any(axis=1)))
+            time.sleep(BLOCK_FRAMES / SAMPLE_RATE)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._closed.set()
+        self._thread.join()
+
+
+async def play(stop_after: float = None):
+    """Play PHRASE once; returns (seconds taken, frames played, clip cached)."""
+    stop = False
+    player = InterruptibleAudioPlayer(should_stop=lambda: stop, output_stream=FakeOutputStream)
+    FakeOutputStream.played_frames = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ClipCache(directory)
+        backend = ToneTTSBackend()
+        key = ClipCache.key(backend.name, PHRASE, "coral", 1.0, "")
+        chunks = backend.stream(PHRASE, "coral", 1.0, "")
+        playback = asyncio.create_task(player.play_stream(cache.stream_and_store(key, chunks, lambda: stop)))
+
+        started = time.monotonic()
+        if stop_after is not None:
+            await asyncio.sleep(stop_after)
+            stop = True
+        await asyncio.wait_for(playback, timeout=30)
+        return time.monotonic() - started, FakeOutputStream.played_frames, key in cache
+
+
+print("=" * 60)
+print("FretCoach TTS Stop - Test Suite")
+print("=" * 60)
+
+print("\n[Test 1] Playing a phrase to the end...")
+elapsed, frames, cached = asyncio.run(play())
+print(f"  {elapsed:.2f}s, {frames / SAMPLE_RATE:.2f}s of audio, cached={cached}")
+assert cached, "a completed phrase should be cached"
+full_frames = frames
+
+print("\n[Test 2] Stopping a phrase after 0.3s...")
+elapsed, frames, cached = asyncio.run(play(stop_after=0.3))
+print(f"  {elapsed:.2f}s, {frames / SAMPLE_RATE:.2f}s of audio, cached={cached}")
+assert elapsed < 0.3 + 0.2, "playback should end within a couple of output blocks of the stop"
+assert frames < full_frames / 2, "queued audio should be dropped, not played out"
+assert not cached, "a stopped phrase should not be cached"
+
+print("\n✅ All tests passed")
@@ -9,9 +9,7 @@ Shares core logic with the desktop application - no code duplication.
 import sys
 import os
 import time
-import threading
 import signal
-from collections import deque
 from datetime import datetime
 from typing import Optional, Dict, Any
 
@@ -19,7 +17,7 @@ import numpy as np
 import sounddevice as sd
 
 # Rich imports for beautiful TUI
-from rich.console import Console
+from rich.console import Console, Group
 from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
@@ -34,18 +32,19 @@ sys.path.insert(0, BACKEND_CORE)
 from audio_metrics import (
     QualityConfig,
     QualityState,
-    BulbState,
     process_audio_frame,
     score_to_hue,
     calculate_bulb_brightness,
 )
-from smart_bulb import set_bulb_hsv, bulb_on, bulb_off, SMART_BULB_ENABLED
+from smart_bulb import get_bulb_actor
 from scales import (
-    MAJOR_DIATONIC, MINOR_DIATONIC,
-    MAJOR_PENTATONIC, MINOR_PENTATONIC,
+    Scale,
+    find_scale,
     select_scale_interactive,
 )
 from session_logger import get_session_logger, SessionLogger
+from audio_buffer import RingBuffer
+from perf import get_profiler, FrameProfiler
 
 # Console for rich output
 console = Console()
@@ -56,6 +55,7 @@ BLOCK_SIZE = 128
 ANALYSIS_WINDOW_SEC = 0.30
 BUFFER_SIZE = int(SAMPLE_RATE * ANALYSIS_WINDOW_SEC)
 PHRASE_WINDOW = 0.8
+PITCH_ENGINE = os.environ.get("FRETCOACH_PITCH_ENGINE", "piptrack")  # "piptrack" or "yin" (faster on the Pi)
 
 # Global state for graceful shutdown
 running = True
@@ -198,6 +198,31 @@ def create_practice_display(
     )
 
 
+def create_perf_panel(profiler: FrameProfiler) -> Panel:
+    """Create the per-stage latency panel (shown when FRETCOACH_PERF=1)."""
+    table = Table(box=box.SIMPLE, show_header=True, header_style="bold cyan", padding=(0, 1))
+    table.add_column("Stage")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p99 ms", justify="right")
+    table.add_column("max ms", justify="right")
+    table.add_column("n", justify="right", style="dim")
+
+    for stage, stats in profiler.snapshot().items():
+        if not stats.get("count"):
+            continue
+        p99 = stats["p99_ms"]
+        color = "green" if p99 < 5 else "yellow" if p99 < 20 else "red"
+        table.add_row(
+            stage,
+            f"{stats['p50_ms']:.2f}",
+            f"[{color}]{p99:.2f}[/]",
+            f"{stats['max_ms']:.2f}",
+            str(stats["count"]),
+        )
+
+    return Panel(table, title="[bold white]PERF[/]", border_style="dim", box=box.ROUNDED)
+
+
 def create_progress_line(label: str, value: int, color: str, enabled: bool = True) -> str:
     """Create a single progress bar line."""
     # Pad label to 18 chars
@@ -241,9 +266,9 @@ class AudioProcessor:
         self.target_pitch_classes = target_pitch_classes
         self.ambient_lighting = ambient_lighting
 
-        # Audio buffer
-        self.buffer = deque(maxlen=BUFFER_SIZE)
-        self.buffer_lock = threading.Lock()
+        # Audio buffer (lock-free, single producer/single consumer)
+        self.buffer = RingBuffer(BUFFER_SIZE)
+        self.frame = np.empty(BUFFER_SIZE, dtype=np.float32)
 
         # Quality tracking (from shared module)
         self.quality_config = QualityConfig(
@@ -251,9 +276,12 @@ class AudioProcessor:
             sensitivity=sensitivity,
             sample_rate=SAMPLE_RATE,
             phrase_window=PHRASE_WINDOW,
+            pitch_engine=PITCH_ENGINE,
         )
         self.quality_state = QualityState()
-        self.bulb_state = BulbState()
+        self.bulb = get_bulb_actor()
+        self._clock_position = 0  # Ring buffer position the session clock has reached
+        self.input_time = 0.0  # perf_counter() of the newest callback in the last analysed frame
 
         # Latest result
         self.latest_result = None
@@ -272,8 +300,8 @@ class AudioProcessor:
         else:
             guitar = indata[:, self.guitar_channel]
 
-        with self.buffer_lock:
-            self.buffer.extend(guitar)
+        self.buffer.write(guitar)
+        get_profiler().note_input()
 
         outdata[:] = 0
 
@@ -289,12 +317,10 @@ class AudioProcessor:
         )
         self.stream.start()
 
-        # Turn on bulb if enabled
-        if self.ambient_lighting and SMART_BULB_ENABLED:
-            try:
-                bulb_on()
-            except Exception:
-                pass
+        # Turn on bulb if enabled (queued; the bulb actor does the network I/O)
+        if self.ambient_lighting:
+            self.bulb.reset()
+            self.bulb.power(True)
 
     def stop(self):
         """Stop the audio stream and release the device properly."""
@@ -313,19 +339,22 @@ class AudioProcessor:
         # The stream.stop() and stream.close() calls above properly release the device.
         # A full PortAudio terminate would require the underlying library access.
 
-        # Turn off bulb
-        if self.ambient_lighting and SMART_BULB_ENABLED:
-            try:
-                bulb_off()
-            except Exception:
-                pass
+        # Turn off bulb, waiting briefly for the command to go out
+        if self.ambient_lighting:
+            self.bulb.power(False)
+            self.bulb.stop()
 
     def process_frame(self) -> Optional[Any]:
         """Process current audio buffer and return result."""
-        with self.buffer_lock:
-            if len(self.buffer) < BUFFER_SIZE:
-                return None
-            audio = np.array(self.buffer)
+        if len(self.buffer) < BUFFER_SIZE:
+            return None
+        self.input_time = get_profiler().last_input_time
+        written = self.buffer.total_written
+        audio = self.buffer.read_latest(BUFFER_SIZE, out=self.frame)
+
+        # Drive the session clock by samples consumed, not wall-clock time
+        self.quality_state.clock.advance(written - self._clock_position)
+        self._clock_position = written
 
         result = process_audio_frame(
             audio=audio,
@@ -337,15 +366,14 @@ class AudioProcessor:
         self.latest_result = result
 
         # Update bulb if enabled
-        if result and self.ambient_lighting and SMART_BULB_ENABLED:
-            hue = score_to_hue(self.quality_state.ema_quality)
-            if self.bulb_state.should_update(hue):
-                try:
-                    brightness = calculate_bulb_brightness(self.quality_state.ema_quality)
-                    set_bulb_hsv(hue, v=brightness)
-                    self.bulb_state.mark_sent(hue)
-                except Exception:
-                    pass
+        profiler = get_profiler()
+        t0 = profiler.now()
+        if result and self.ambient_lighting:
+            self.bulb.set_hsv(
+                score_to_hue(self.quality_state.ema_quality),
+                v=calculate_bulb_brightness(self.quality_state.ema_quality),
+            )
+        profiler.record_since("bulb", t0)
 
         return result
 
@@ -442,21 +470,10 @@ def mark_practice_plan_executed(practice_id: str, session_id: str) -> bool:
     Same as desktop API endpoint.
     """
     try:
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api', 'services'))
-        from sqlalchemy import create_engine, text
-
-        # Get DB credentials
-        from dotenv import load_dotenv, find_dotenv
-        load_dotenv(find_dotenv())
-
-        db_user = os.getenv("DB_USER")
-        db_password = os.getenv("DB_PASSWORD")
-        db_host = os.getenv("DB_HOST")
-        db_port = os.getenv("DB_PORT")
-        db_name = os.getenv("DB_NAME")
+        from sqlalchemy import text
+        from db_pool import get_engine
 
-        db_uri = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-        engine = create_engine(db_uri, pool_pre_ping=True)
+        engine = get_engine()
 
         query = text("""
             UPDATE fretcoach.ai_practice_plans
@@ -526,18 +543,9 @@ def configure_metrics(user_id: str) -> dict:
         }
 
 
-def get_target_pitch_classes(scale_name: str, scale_type: str) -> set:
-    """Get pitch classes for a given scale (same as desktop)."""
-    # Remove type suffix if present
-    clean_name = scale_name.replace(" (Natural)", "").replace(" (Pentatonic)", "")
-    is_major = "Major" in clean_name
-
-    if scale_type == "natural":
-        scales_dict = MAJOR_DIATONIC if is_major else MINOR_DIATONIC
-    else:
-        scales_dict = MAJOR_PENTATONIC if is_major else MINOR_PENTATONIC
-
-    return set(scales_dict[clean_name])
+def get_target_pitch_classes(scale_name: str, scale_type: str) -> Scale:
+    """Get pitch classes for a given scale (same as desktop; type suffix is ignored)."""
+    return find_scale(scale_name, scale_type)
 
 
 # =========================================================
@@ -729,7 +737,7 @@ def get_practice_settings(audio_config: Dict[str, Any]) -> Dict[str, Any]:
     console.print("\n" + "=" * 60)
     console.print("[bold cyan]AMBIENT LIGHTING[/]")
     console.print("=" * 60)
-    if SMART_BULB_ENABLED:
+    if get_bulb_actor().enabled:
         enable_bulb = input("\nEnable smart bulb ambient lighting? (Y/n): ").strip().lower()
         audio_config['ambient_lighting'] = (enable_bulb != 'n')
     else:
@@ -858,6 +866,7 @@ def run_practice_session(
     _audio_processor_ref = processor
 
     session_start = datetime.now()
+    profiler = get_profiler()
 
     console.print(f"\n[bold green]Starting practice session: {scale_name}[/]")
     console.print(f"[dim]Press Ctrl+C to stop[/]\n")
@@ -884,6 +893,7 @@ def run_practice_session(
                 result = processor.process_frame()
 
                 # Log metric to session if available
+                t0 = profiler.now()
                 if session_logger and session_id and result:
                     try:
                         # Pass None for disabled metrics
@@ -904,14 +914,18 @@ def run_practice_session(
                         )
                     except Exception:
                         pass
+                profiler.record_since("db_log", t0)
 
                 # Update display
-                live.update(
-                    create_practice_display(
-                        scale_name, session_start,
-                        processor.quality_state, result, enabled_metrics
-                    )
+                display = create_practice_display(
+                    scale_name, session_start,
+                    processor.quality_state, result, enabled_metrics
                 )
+                if profiler.enabled:
+                    if result:
+                        profiler.record_latency(processor.input_time)
+                    display = Group(display, create_perf_panel(profiler))
+                live.update(display)
 
     finally:
         # Stop audio
@@ -1,58 +1,86 @@
 """
-Database connection pool for FretCoach Web Server
-Uses psycopg2's SimpleConnectionPool for connection reuse
+Async database connection pool for FretCoach Web Server
+Uses psycopg 3's AsyncConnectionPool so queries never block the event loop
 """
 
+import asyncio
 import os
-from contextlib import contextmanager
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-# Connection pool (lazy initialization)
-_connection_pool = None
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
 
+# Connection pool (opened on startup, or lazily on first use)
+_connection_pool: Optional[AsyncConnectionPool] = None
+_pool_lock = asyncio.Lock()
 
-def get_pool():
-    """Get or create the connection pool"""
+# Seconds a request waits for a free connection before failing
+POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+def get_conninfo() -> str:
+    """Connection string built from the DB_* environment variables"""
+    return make_conninfo(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "fretcoach"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        options="-c search_path=fretcoach,public",
+    )
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """Get or open the connection pool"""
     global _connection_pool
     if _connection_pool is None:
-        _connection_pool = pool.SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
-            host=os.getenv("DB_HOST", "localhost"),
-            port=os.getenv("DB_PORT", "5432"),
-            database=os.getenv("DB_NAME", "fretcoach"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            options="-c search_path=fretcoach,public"
-        )
+        async with _pool_lock:
+            if _connection_pool is None:
+                pool = AsyncConnectionPool(
+                    get_conninfo(),
+                    # No server-side prepared statements: they break behind
+                    # pgbouncer/Supavisor transaction pooling
+                    kwargs={"prepare_threshold": None},
+                    min_size=1,
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                    timeout=POOL_TIMEOUT_SEC,
+                    # Replace connections dropped by the server instead of failing the request
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                _connection_pool = pool
     return _connection_pool
 
 
-@contextmanager
-def get_db_connection():
+@asynccontextmanager
+async def get_db_connection() -> AsyncIterator[AsyncConnection]:
     """
-    Context manager for database connections with automatic cleanup.
+    Async context manager for pooled database connections.
+    The transaction is committed on success and rolled back on error when
+    the connection goes back to the pool.
 
     Usage:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM ...")
-            results = cursor.fetchall()
-            cursor.close()
+        async with get_db_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cursor:
+                await cursor.execute("SELECT * FROM ...")
+                results = await cursor.fetchall()
     """
-    conn = None
-    try:
-        conn = get_pool().getconn()
+    pool = await get_pool()
+    async with pool.connection() as conn:
         yield conn
-    finally:
-        if conn:
-            get_pool().putconn(conn)
 
 
-def close_pool():
+async def open_pool():
+    """Open the pool ahead of the first request (call on startup)"""
+    await get_pool()
+
+
+async def close_pool():
     """Close all connections in the pool (call on shutdown)"""
     global _connection_pool
     if _connection_pool:
-        _connection_pool.closeall()
+        await _connection_pool.close()
         _connection_pool = None
@@ -136,7 +136,7 @@ Response Style:
 def create_agent_node(llm):
     """Create the agent node that processes messages and decides on tool calls"""
 
-    def agent(state: AgentState) -> AgentState:
+    async def agent(state: AgentState) -> AgentState:
         messages = state["messages"]
         user_id = state["user_id"]
 
@@ -159,7 +159,7 @@ def create_agent_node(llm):
         messages = [system_message] + list(messages)
 
         # Invoke the LLM
-        response = llm.invoke(messages)
+        response = await llm.ainvoke(messages)
 
         return {
             "messages": [response],
@@ -277,7 +277,7 @@ def get_model_name(use_fallback: bool = False) -> str:
         return os.getenv("OPENAI_MODEL", "gpt-4o-mini") if use_openai else os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
 
 
-def invoke_workflow(
+async def invoke_workflow(
     messages: list,
     user_id: str = "default_user",
     thread_id: Optional[str] = None,
@@ -313,7 +313,7 @@ def invoke_workflow(
         workflow = fallback_workflow if use_fallback else primary_workflow
         try:
             # Check if this thread has existing state
-            state = workflow.get_state(config={"configurable": {"thread_id": thread_id}})
+            state = await workflow.aget_state(config={"configurable": {"thread_id": thread_id}})
             if state.values.get("messages"):
                 # Thread exists, only send the last message (new user message)
                 lc_messages = [lc_messages[-1]]
@@ -361,7 +361,7 @@ def invoke_workflow(
 
     # Invoke workflow
     try:
-        result = workflow.invoke(initial_state, config=config)
+        result = await workflow.ainvoke(initial_state, config=config)
 
         # Extract final message
         final_messages = result.get("messages", [])
@@ -391,10 +391,11 @@ def invoke_workflow(
                 tool_results = []
                 for msg in reversed(final_messages):
                     if isinstance(msg, ToolMessage):
-                        # Tool results are now strings (JSON or error messages)
+                        # Content is what the LLM saw; artifact carries raw rows (QueryResult) in-process
                         tool_results.append({
                             "tool": msg.name,
-                            "result": msg.content
+                            "result": msg.content,
+                            "artifact": msg.artifact
                         })
 
                 # Check if response contains a practice plan
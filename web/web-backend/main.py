@@ -4,6 +4,7 @@ FastAPI backend for FretCoach Hub with AI Coach
 """
 #uvicorn main:app --host 0.0.0.0 --port 8000
 
+import asyncio
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,6 +19,8 @@ configure()
 print("[Opik] Configured successfully")
 
 from routers import sessions, chat_langgraph
+from database import open_pool, close_pool
+from query_cache import listen_for_session_writes
 
 app = FastAPI(
     title="FretCoach Hub API",
@@ -48,6 +51,19 @@ app.add_middleware(
 app.include_router(sessions.router, prefix="/api", tags=["sessions"])
 app.include_router(chat_langgraph.router, prefix="/api", tags=["chat"])
 
+# Async connection pool and query cache invalidation lifecycle
+@app.on_event("startup")
+async def startup():
+    await open_pool()
+    app.state.query_cache_listener = asyncio.create_task(listen_for_session_writes())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.query_cache_listener.cancel()
+    await close_pool()
+
+
 # Healthcheck (Railway)
 @app.get("/health")
 def health():
@@ -0,0 +1,161 @@
+"""
+Result cache for the agent's execute_sql_query tool
+Results are keyed on normalized SQL and the user ids the query filters on,
+evicted by LRU/TTL, and invalidated per user when the desktop app writes a
+session or practice plan (it sends NOTIFY on SESSIONS_CHANNEL).
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from psycopg import AsyncConnection
+
+from database import get_conninfo
+
+# Must match NOTIFY_CHANNEL in backend/core/metric_writer.py
+SESSIONS_CHANNEL = "fretcoach_sessions"
+
+# Quoted literals/identifiers are kept verbatim; everything else is case- and whitespace-folded
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE = re.compile(r"\s+")
+_PUNCT_SPACE = re.compile(r"\s*([=<>!(),+*/-])\s*")
+_USER_FILTER = re.compile(r"user_id\s*(?:=\s*'((?:[^']|'')*)'|in\s*\(([^)]*)\))", re.IGNORECASE)
+_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+
+
+def normalize_sql(query: str) -> str:
+    """Fold case and whitespace outside quoted literals and drop trailing semicolons."""
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _PUNCT_SPACE.sub(r"\1", _WHITESPACE.sub(" ", parts[i])).lower()
+    return "".join(parts).strip()
+
+
+def query_users(query: str) -> FrozenSet[str]:
+    """User ids a query filters on (user_id = '...' or user_id IN (...)); empty if none."""
+    users: Set[str] = set()
+    for single, in_list in _USER_FILTER.findall(query):
+        if in_list:
+            users.update(value.replace("''", "'") for value in _LITERAL.findall(in_list))
+        else:
+            users.add(single.replace("''", "'"))
+    return frozenset(users)
+
+
+class QueryCache:
+    """
+    LRU/TTL cache of tool results with per-user invalidation.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl: Seconds an entry stays valid (bounds staleness if a NOTIFY is missed)
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[FrozenSet[str], str], Tuple[float, Any]]" = OrderedDict()
+        # Bumped on invalidation so a query that was running meanwhile cannot store a stale result
+        self._user_generations: Dict[str, int] = {}
+        self._generation = 0  # Any invalidation
+        self._clears = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(query: str) -> Tuple[FrozenSet[str], str]:
+        """Cache key: (users filtered on, normalized SQL); no users means any session write invalidates it."""
+        return query_users(query), normalize_sql(query)
+
+    def get(self, key: Tuple[FrozenSet[str], str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def generation(self, key: Tuple[FrozenSet[str], str]) -> Tuple[int, ...]:
+        """
+        Invalidation state for a key; take it before running the query and pass it to put().
+
+        Queries not filtered by user follow every invalidation, others only their users'.
+        """
+        users = key[0]
+        if not users:
+            return (self._generation,)
+        return (self._clears,) + tuple(self._user_generations.get(user, 0) for user in sorted(users))
+
+    def put(self, key: Tuple[FrozenSet[str], str], result: Any, generation: Optional[Tuple[int, ...]] = None) -> None:
+        """Store a result, unless the key was invalidated after `generation` was taken."""
+        if generation is not None and generation != self.generation(key):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop results for queries on `user_id` and those not filtered by user."""
+        self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+        self._generation += 1
+        stale = [key for key in self._entries if not key[0] or user_id in key[0]]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._clears += 1
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+query_cache = QueryCache(
+    max_entries=int(os.getenv("SQL_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("SQL_CACHE_TTL", "600")),
+)
+
+
+async def listen_for_session_writes():
+    """
+    Invalidate cached results as session and practice plan writes are announced on SESSIONS_CHANNEL.
+
+    Runs until cancelled on a dedicated connection (LISTEN needs a session,
+    so it bypasses the pool). Notifications sent while disconnected are lost,
+    so the cache is cleared on every reconnect.
+    """
+    backoff = 1.0
+    while True:
+        try:
+            conn = await AsyncConnection.connect(get_conninfo(), autocommit=True, prepare_threshold=None)
+            async with conn:
+                await conn.execute(f"LISTEN {SESSIONS_CHANNEL}")
+                query_cache.clear()
+                backoff = 1.0
+                print(f"[OK] Listening on {SESSIONS_CHANNEL} for query cache invalidation")
+                async for notify in conn.notifies():
+                    query_cache.invalidate_user(notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WARN] Query cache listener disconnected ({e}); retrying in {backoff:.0f}s")
+            query_cache.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
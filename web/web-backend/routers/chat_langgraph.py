@@ -11,9 +11,11 @@ import os
 import json
 import uuid
 import re
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 from database import get_db_connection
+from query_cache import query_cache
 from langgraph_workflow import invoke_workflow
+from tools.result_format import QueryResult
 
 # Import Opik for tracking
 from opik import track, opik_context
@@ -60,30 +62,22 @@ def safe_float(value: Any, default: float = 0.0) -> float:
 def extract_data_from_tool_results(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Extract query results from tool call results.
-    Looks for execute_sql_query tool calls and returns the data.
+    Reads the QueryResult artifacts of execute_sql_query calls, so the rows
+    arrive as Python values without re-parsing the JSON shown to the LLM.
     """
     all_data = []
 
     for tool_call in tool_calls:
-        tool_name = tool_call.get("tool", "")
-        result = tool_call.get("result", "")
-
-        if tool_name == "execute_sql_query" and isinstance(result, str):
-            try:
-                # Parse JSON result
-                parsed = json.loads(result)
-                if parsed.get("success") and parsed.get("data"):
-                    data = parsed["data"]
-                    # Sanitize numeric fields to prevent objects from being passed through
-                    for row in data:
-                        if isinstance(row, dict):
-                            for key in ['pitch_accuracy', 'scale_conformity', 'timing_stability']:
-                                if key in row:
-                                    row[key] = safe_float(row[key])
-                    all_data.extend(data)
-            except Exception as e:
-                print(f"[ERROR] Failed to parse tool result: {e}")
-                pass
+        artifact = tool_call.get("artifact")
+
+        if tool_call.get("tool", "") == "execute_sql_query" and isinstance(artifact, QueryResult):
+            data = artifact.records()
+            # Sanitize numeric fields to prevent objects from being passed through
+            for row in data:
+                for key in ['pitch_accuracy', 'scale_conformity', 'timing_stability']:
+                    if key in row:
+                        row[key] = safe_float(row[key])
+            all_data.extend(data)
 
     return all_data
 
@@ -136,10 +130,10 @@ def check_for_confirmation(message: str) -> bool:
     return any(word in message.lower() for word in confirmation_words)
 
 
-def save_practice_plan_to_db(plan_id: str, user_id: str, plan_json: Any) -> bool:
+async def save_practice_plan_to_db(plan_id: str, user_id: str, plan_json: Any) -> bool:
     """Save practice plan to database"""
     try:
-        with get_db_connection() as conn:
+        async with get_db_connection() as conn:
             cursor = conn.cursor()
             plan_str = json.dumps(plan_json) if not isinstance(plan_json, str) else plan_json
             query = """
@@ -147,33 +141,34 @@ def save_practice_plan_to_db(plan_id: str, user_id: str, plan_json: Any) -> bool
                 (practice_id, user_id, practice_plan, executed_session_id)
                 VALUES (%s, %s, %s, %s)
             """
-            cursor.execute(query, [plan_id, user_id, plan_str, None])
-            conn.commit()
-            return True
+            await cursor.execute(query, [plan_id, user_id, plan_str, None])
+            await conn.commit()
+        query_cache.invalidate_user(user_id)
+        return True
     except Exception as e:
         print(f"[ERROR] Failed to save practice plan: {e}")
         return False
 
 
-def get_quick_context(user_id: str) -> Dict[str, Any]:
+async def get_quick_context(user_id: str) -> Dict[str, Any]:
     """
     Get quick context about user for response enrichment.
     This provides metadata without using tools (for efficiency).
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            # Get basic stats
-            cursor.execute("""
-                SELECT COUNT(*) as total_sessions,
-                       COALESCE(AVG(pitch_accuracy), 0) as avg_pitch,
-                       COALESCE(AVG(scale_conformity), 0) as avg_scale,
-                       COALESCE(AVG(timing_stability), 0) as avg_timing
-                FROM fretcoach.sessions WHERE user_id = %s
+        async with get_db_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+
+            # Get basic stats from the daily rollups (one row per practice day and scale)
+            await cursor.execute("""
+                SELECT COALESCE(SUM(session_count), 0) as total_sessions,
+                       COALESCE(SUM(pitch_sum) / NULLIF(SUM(pitch_count), 0), 0) as avg_pitch,
+                       COALESCE(SUM(scale_sum) / NULLIF(SUM(scale_count), 0), 0) as avg_scale,
+                       COALESCE(SUM(timing_sum) / NULLIF(SUM(timing_count), 0), 0) as avg_timing
+                FROM fretcoach.session_rollups_daily WHERE user_id = %s
             """, [user_id])
 
-            stats = cursor.fetchone()
+            stats = await cursor.fetchone()
 
             # Safely extract numeric values
             avg_pitch = safe_float(stats.get('avg_pitch', 0))
@@ -244,7 +239,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
 
     try:
         # Get quick context for response enrichment
-        context = get_quick_context(request.user_id)
+        context = await get_quick_context(request.user_id)
 
         # Get the last user message
         last_user_msg = request.messages[-1].content if request.messages else ""
@@ -253,7 +248,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
         plan_saved = False
         if thread_id in pending_plans and check_for_confirmation(last_user_msg):
             pending = pending_plans[thread_id]
-            if save_practice_plan_to_db(pending['plan_id'], request.user_id, pending['plan_json']):
+            if await save_practice_plan_to_db(pending['plan_id'], request.user_id, pending['plan_json']):
                 plan_saved = True
                 del pending_plans[thread_id]
 
@@ -265,7 +260,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
 
         # Try primary model first, with automatic fallback on rate limits
         try:
-            result = invoke_workflow(
+            result = await invoke_workflow(
                 messages=workflow_messages,
                 user_id=request.user_id,
                 thread_id=thread_id,
@@ -278,7 +273,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
                 print(f"[WARNING] Primary model rate limited: {str(e)[:200]}")
                 print("[INFO] Automatically switching to fallback model (MiniMax)")
                 try:
-                    result = invoke_workflow(
+                    result = await invoke_workflow(
                         messages=workflow_messages,
                         user_id=request.user_id,
                         thread_id=thread_id,
@@ -324,7 +319,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
                     has_metrics = any(k in first_row_keys for k in ["pitch_accuracy", "scale_conformity", "timing_stability"])
 
                     if has_metrics:
-                        chart_result = create_performance_trend_chart.invoke({
+                        chart_result = await create_performance_trend_chart.ainvoke({
                             "sessions_data": query_data,
                             "metrics": ["pitch_accuracy", "scale_conformity", "timing_stability"]
                         })
@@ -338,7 +333,7 @@ async def chat(request: ChatRequest) -> Dict[str, Any]:
                     current = query_data[0] if "pitch_accuracy" in query_data[0] else {}
                     avg_metrics = context
                     if current:
-                        chart_result = create_comparison_chart.invoke({
+                        chart_result = await create_comparison_chart.ainvoke({
                             "current_metrics": {
                                 "pitch_accuracy": safe_float(current.get("pitch_accuracy", 0)),
                                 "scale_conformity": safe_float(current.get("scale_conformity", 0)),
@@ -458,7 +453,7 @@ async def save_plan(request: SavePlanRequest) -> Dict[str, Any]:
             raise HTTPException(status_code=404, detail="Practice plan not found or expired")
 
         # Save to database
-        success = save_practice_plan_to_db(
+        success = await save_practice_plan_to_db(
             plan_data['plan_id'],
             request.user_id,
             plan_data['plan_json']
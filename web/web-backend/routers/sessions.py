@@ -3,125 +3,205 @@ Sessions API Router
 Fetches practice session data from PostgreSQL
 """
 
+import base64
+import json
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 from database import get_db_connection
 
 router = APIRouter()
 
 
+SESSION_LIST_COLUMNS = """
+    session_id, user_id, start_timestamp, end_timestamp,
+    pitch_accuracy, scale_conformity, timing_stability,
+    scale_chosen, scale_type, sensitivity, strictness,
+    total_notes_played, correct_notes_played, bad_notes_played,
+    total_inscale_notes, duration_seconds, ambient_light_option
+"""
+
+
+def encode_cursor(start_timestamp: str, session_id: str) -> str:
+    """Opaque keyset cursor for the session after which the next page starts."""
+    raw = json.dumps([start_timestamp, session_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises HTTP 400 for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_timestamp, session_id = json.loads(raw)
+        datetime.fromisoformat(start_timestamp)
+        return start_timestamp, str(session_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/sessions")
 async def get_sessions(
     user_id: str = Query(default="default_user"),
     limit: int = Query(default=10, ge=1, le=50),
     include_aggregates: bool = Query(default=True),
     start_date: Optional[str] = Query(default=None, description="Start date filter (ISO format)"),
-    end_date: Optional[str] = Query(default=None, description="End date filter (ISO format)")
+    end_date: Optional[str] = Query(default=None, description="End date filter (ISO format)"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    points: Optional[int] = Query(default=None, ge=10, le=500, description="Return a trend downsampled to this many points")
 ) -> Dict[str, Any]:
     """
     Fetch practice sessions from the database
 
+    The page of sessions, the aggregates and the optional trend are built by
+    one CTE query. Pages are keyset-paginated on (start_timestamp, session_id)
+    newest first, so later pages cost the same as the first; aggregates and
+    the trend are only computed for the first page.
+
     Args:
         user_id: User identifier
-        limit: Number of sessions to fetch (1-50)
+        limit: Number of sessions to fetch per page (1-50)
         include_aggregates: Include aggregate statistics
         start_date: Filter sessions from this date (ISO format, e.g. 2024-01-01)
         end_date: Filter sessions until this date (ISO format, e.g. 2024-01-07)
+        cursor: Continue after the last session of a previous page
+        points: Downsample per-day averages over the range into at most this many points (10-500)
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        params: Dict[str, Any] = {"user_id": user_id, "limit": limit + 1, "points": points}
 
-            # Build date filter clause
-            date_filter = ""
-            params = [user_id]
+        # Build date filter clauses (sessions by timestamp, rollups by whole day)
+        date_filter = ""
+        rollup_filter = ""
+        if start_date:
+            date_filter += " AND start_timestamp >= %(start_date)s"
+            rollup_filter += " AND day >= %(start_date)s::date"
+            params["start_date"] = start_date
 
-            if start_date:
-                date_filter += " AND start_timestamp >= %s"
-                params.append(start_date)
+        if end_date:
+            # Add one day to include the end date fully
+            date_filter += " AND start_timestamp < %(end_date)s::date + interval '1 day'"
+            rollup_filter += " AND day <= %(end_date)s::date"
+            params["end_date"] = end_date
 
-            if end_date:
-                # Add one day to include the end date fully
-                date_filter += " AND start_timestamp < %s::date + interval '1 day'"
-                params.append(end_date)
+        if cursor:
+            params["cursor_timestamp"], params["cursor_session_id"] = decode_cursor(cursor)
+            date_filter += " AND (start_timestamp, session_id) < (%(cursor_timestamp)s::timestamp, %(cursor_session_id)s)"
 
-            # Fetch recent sessions
-            cursor.execute(f"""
-                SELECT
-                    session_id, user_id, start_timestamp, end_timestamp,
-                    pitch_accuracy, scale_conformity, timing_stability,
-                    scale_chosen, scale_type, sensitivity, strictness,
-                    total_notes_played, correct_notes_played, bad_notes_played,
-                    total_inscale_notes, duration_seconds, ambient_light_option
+        first_page = not cursor
+        with_aggregates = include_aggregates and first_page
+        with_trend = points is not None and first_page
+
+        # Keyset page (one extra row tells whether there is a next page),
+        # served by idx_sessions_user_recent
+        ctes = [f"""
+            page AS (
+                SELECT {SESSION_LIST_COLUMNS}
                 FROM fretcoach.sessions
-                WHERE user_id = %s{date_filter}
-                ORDER BY start_timestamp DESC
-                LIMIT %s
-            """, (*params, limit))
-
-            sessions = cursor.fetchall()
-
-            # Convert to list of dicts with proper serialization
-            sessions_list = []
-            for session in sessions:
-                session_dict = dict(session)
-                # Convert timestamps to ISO strings
-                if session_dict.get('start_timestamp'):
-                    session_dict['start_timestamp'] = session_dict['start_timestamp'].isoformat()
-                if session_dict.get('end_timestamp'):
-                    session_dict['end_timestamp'] = session_dict['end_timestamp'].isoformat()
-                sessions_list.append(session_dict)
-
-            aggregates = None
-            if include_aggregates:
-                # Fetch aggregates with same date filter
-                cursor.execute(f"""
-                    SELECT
-                        COUNT(*) as total_sessions,
-                        COALESCE(SUM(duration_seconds), 0) as total_practice_time,
-                        COALESCE(AVG(pitch_accuracy), 0) as avg_pitch_accuracy,
-                        COALESCE(AVG(scale_conformity), 0) as avg_scale_conformity,
-                        COALESCE(AVG(timing_stability), 0) as avg_timing_stability,
-                        COALESCE(SUM(total_notes_played), 0) as total_notes,
-                        COALESCE(SUM(correct_notes_played), 0) as total_correct
-                    FROM fretcoach.sessions
-                    WHERE user_id = %s{date_filter}
-                """, params)
-
-                agg_row = cursor.fetchone()
-
-                # Get unique scales practiced (within date range)
-                cursor.execute(f"""
-                    SELECT DISTINCT scale_chosen FROM fretcoach.sessions WHERE user_id = %s{date_filter}
-                """, params)
-
-                scales = [row['scale_chosen'] for row in cursor.fetchall() if row['scale_chosen']]
-
-                aggregates = {
-                    "total_sessions": int(agg_row['total_sessions'] or 0),
-                    "total_practice_time": float(agg_row['total_practice_time'] or 0),
-                    "avg_pitch_accuracy": float(agg_row['avg_pitch_accuracy'] or 0),
-                    "avg_scale_conformity": float(agg_row['avg_scale_conformity'] or 0),
-                    "avg_timing_stability": float(agg_row['avg_timing_stability'] or 0),
-                    "total_notes": int(agg_row['total_notes'] or 0),
-                    "total_correct": int(agg_row['total_correct'] or 0),
-                    "scales_practiced": scales
-                }
-
-            cursor.close()
+                WHERE user_id = %(user_id)s{date_filter}
+                ORDER BY start_timestamp DESC, session_id DESC
+                LIMIT %(limit)s
+            )"""]
 
-            return {
-                "success": True,
-                "sessions": sessions_list,
-                "aggregates": aggregates,
-                "dateRange": {
-                    "start": start_date,
-                    "end": end_date
-                }
+        if with_aggregates:
+            # Aggregates come from the daily rollups (one row per practice day and scale)
+            ctes.append(f"""
+            agg AS (
+                SELECT
+                    COALESCE(SUM(session_count), 0) as total_sessions,
+                    COALESCE(SUM(total_duration_seconds), 0) as total_practice_time,
+                    COALESCE(SUM(pitch_sum) / NULLIF(SUM(pitch_count), 0), 0) as avg_pitch_accuracy,
+                    COALESCE(SUM(scale_sum) / NULLIF(SUM(scale_count), 0), 0) as avg_scale_conformity,
+                    COALESCE(SUM(timing_sum) / NULLIF(SUM(timing_count), 0), 0) as avg_timing_stability,
+                    COALESCE(SUM(total_notes), 0) as total_notes,
+                    COALESCE(SUM(correct_notes), 0) as total_correct,
+                    ARRAY_AGG(DISTINCT scale_chosen) as scales_practiced
+                FROM fretcoach.session_rollups_daily
+                WHERE user_id = %(user_id)s{rollup_filter}
+            )""")
+
+        if with_trend:
+            # Per-day rollups split into at most `points` equal-sized runs of days
+            ctes.append(f"""
+            days AS (
+                SELECT
+                    day,
+                    SUM(session_count) AS session_count,
+                    SUM(total_duration_seconds) AS total_duration_seconds,
+                    SUM(pitch_sum) AS pitch_sum, SUM(pitch_count) AS pitch_count,
+                    SUM(scale_sum) AS scale_sum, SUM(scale_count) AS scale_count,
+                    SUM(timing_sum) AS timing_sum, SUM(timing_count) AS timing_count
+                FROM fretcoach.session_rollups_daily
+                WHERE user_id = %(user_id)s{rollup_filter}
+                GROUP BY day
+            ),
+            trend AS (
+                SELECT
+                    MIN(day) AS start_day,
+                    MAX(day) AS end_day,
+                    SUM(session_count) AS session_count,
+                    SUM(total_duration_seconds) AS total_practice_time,
+                    SUM(pitch_sum) / NULLIF(SUM(pitch_count), 0) AS avg_pitch_accuracy,
+                    SUM(scale_sum) / NULLIF(SUM(scale_count), 0) AS avg_scale_conformity,
+                    SUM(timing_sum) / NULLIF(SUM(timing_count), 0) AS avg_timing_stability
+                FROM (SELECT *, NTILE(%(points)s) OVER (ORDER BY day) AS bucket FROM days) bucketed
+                GROUP BY bucket
+            )""")
+
+        aggregates_sql = "(SELECT row_to_json(agg) FROM agg)" if with_aggregates else "NULL::json"
+        trend_sql = "(SELECT COALESCE(json_agg(trend ORDER BY start_day), '[]'::json) FROM trend)" if with_trend else "NULL::json"
+
+        async with get_db_connection() as conn:
+            db_cursor = conn.cursor(row_factory=dict_row)
+            await db_cursor.execute(f"""
+                WITH {",".join(ctes)}
+                SELECT
+                    (SELECT COALESCE(json_agg(page ORDER BY start_timestamp DESC, session_id DESC), '[]'::json) FROM page) AS sessions,
+                    {aggregates_sql} AS aggregates,
+                    {trend_sql} AS trend
+            """, params)
+            result = await db_cursor.fetchone()
+            await db_cursor.close()
+
+        # Timestamps arrive as ISO strings from json_agg
+        sessions_list = result['sessions']
+        next_cursor = None
+        if len(sessions_list) > limit:
+            sessions_list = sessions_list[:limit]
+            last = sessions_list[-1]
+            next_cursor = encode_cursor(last['start_timestamp'], last['session_id'])
+
+        aggregates = None
+        agg_row = result['aggregates']
+        if agg_row is not None:
+            aggregates = {
+                "total_sessions": int(agg_row['total_sessions'] or 0),
+                "total_practice_time": float(agg_row['total_practice_time'] or 0),
+                "avg_pitch_accuracy": float(agg_row['avg_pitch_accuracy'] or 0),
+                "avg_scale_conformity": float(agg_row['avg_scale_conformity'] or 0),
+                "avg_timing_stability": float(agg_row['avg_timing_stability'] or 0),
+                "total_notes": int(agg_row['total_notes'] or 0),
+                "total_correct": int(agg_row['total_correct'] or 0),
+                # Unique scales practiced (within date range)
+                "scales_practiced": [scale for scale in agg_row['scales_practiced'] or [] if scale]
+            }
+
+        response = {
+            "success": True,
+            "sessions": sessions_list,
+            "aggregates": aggregates,
+            "next_cursor": next_cursor,
+            "dateRange": {
+                "start": start_date,
+                "end": end_date
             }
+        }
+        if result['trend'] is not None:
+            response["trend"] = result['trend']
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to fetch sessions: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch sessions: {str(e)}")
@@ -131,15 +211,15 @@ async def get_sessions(
 async def get_session(session_id: str) -> Dict[str, Any]:
     """Fetch a single session by ID"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        async with get_db_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
 
-            cursor.execute("""
+            await cursor.execute("""
                 SELECT * FROM fretcoach.sessions WHERE session_id = %s
             """, (session_id,))
 
-            session = cursor.fetchone()
-            cursor.close()
+            session = await cursor.fetchone()
+            await cursor.close()
 
             if not session:
                 raise HTTPException(status_code=404, detail="Session not found")
@@ -156,3 +236,94 @@ async def get_session(session_id: str) -> Dict[str, Any]:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch session: {str(e)}")
+
+
+@router.get("/sessions/{session_id}/frames")
+async def get_session_frames(
+    session_id: str,
+    user_id: str = Query(default="default_user"),
+    points: int = Query(default=200, ge=10, le=2000, description="Maximum number of points to return")
+) -> Dict[str, Any]:
+    """
+    Fetch a downsampled per-frame series for one session
+
+    Frames are split into at most `points` equal-sized buckets and averaged.
+    The session's start timestamp bounds frame_timestamp from below so the
+    query skips the monthly partitions before the session. There is no upper
+    bound: end_timestamp is only the latest checkpoint while a session is
+    live, and frames written since then must still show.
+
+    Args:
+        session_id: Session identifier
+        user_id: User identifier
+        points: Maximum number of points to return (10-2000)
+    """
+    try:
+        async with get_db_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+
+            await cursor.execute("""
+                SELECT start_timestamp
+                FROM fretcoach.sessions
+                WHERE session_id = %s AND user_id = %s
+            """, (session_id, user_id))
+
+            session = await cursor.fetchone()
+            if not session:
+                await cursor.close()
+                raise HTTPException(status_code=404, detail="Session not found")
+
+            await cursor.execute("""
+                WITH frames AS (
+                    SELECT
+                        frame_timestamp, pitch_accuracy, scale_conformity, timing_stability,
+                        note_detected, in_scale,
+                        ROW_NUMBER() OVER (ORDER BY frame_index) - 1 AS rn,
+                        COUNT(*) OVER () AS total
+                    FROM fretcoach.session_frames
+                    WHERE session_id = %s
+                      AND frame_timestamp >= %s
+                )
+                SELECT
+                    rn * %s / total AS bucket,
+                    MIN(frame_timestamp) AS frame_timestamp,
+                    AVG(pitch_accuracy) AS pitch_accuracy,
+                    AVG(scale_conformity) AS scale_conformity,
+                    AVG(timing_stability) AS timing_stability,
+                    COUNT(*) AS frames,
+                    COUNT(*) FILTER (WHERE note_detected) AS notes_detected,
+                    COUNT(*) FILTER (WHERE in_scale) AS notes_in_scale
+                FROM frames
+                GROUP BY bucket
+                ORDER BY bucket
+            """, (session_id, session['start_timestamp'], points))
+
+            rows = await cursor.fetchall()
+            await cursor.close()
+
+            start = session['start_timestamp']
+            series = []
+            for row in rows:
+                series.append({
+                    "timestamp": row['frame_timestamp'].isoformat(),
+                    "offset_seconds": (row['frame_timestamp'] - start).total_seconds(),
+                    "pitch_accuracy": float(row['pitch_accuracy']) if row['pitch_accuracy'] is not None else None,
+                    "scale_conformity": float(row['scale_conformity']) if row['scale_conformity'] is not None else None,
+                    "timing_stability": float(row['timing_stability']) if row['timing_stability'] is not None else None,
+                    "frames": int(row['frames']),
+                    "notes_detected": int(row['notes_detected']),
+                    "notes_in_scale": int(row['notes_in_scale']),
+                })
+
+            return {
+                "success": True,
+                "session_id": session_id,
+                "total_frames": sum(point["frames"] for point in series),
+                "points": series
+            }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch session frames: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch session frames: {str(e)}")
@@ -6,6 +6,7 @@ from .database_tools import (
     save_practice_plan,
     get_database_schema
 )
+from .result_format import QueryResult
 from .plotting_tools import (
     create_performance_trend_chart,
     create_comparison_chart,
@@ -16,6 +17,7 @@ __all__ = [
     "execute_sql_query",
     "save_practice_plan",
     "get_database_schema",
+    "QueryResult",
     "create_performance_trend_chart",
     "create_comparison_chart",
     "create_practice_plan_chart"
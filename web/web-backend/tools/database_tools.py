@@ -1,13 +1,17 @@
 """
 Database tools for LangGraph agent to dynamically query FretCoach database
 """
-import json
+import os
 import uuid
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from langchain_core.tools import tool
-from datetime import datetime
-from psycopg2.extras import RealDictCursor
 from database import get_db_connection
+from query_cache import query_cache
+from .result_format import QueryResult, encode_result, to_json_value
+
+# Per-query limits for agent-written SQL
+SQL_TOOL_TIMEOUT_MS = int(os.getenv("SQL_TOOL_TIMEOUT_MS", "5000"))
+SQL_TOOL_MAX_ROWS = int(os.getenv("SQL_TOOL_MAX_ROWS", "500"))
 
 
 # Database schema information for the LLM
@@ -56,8 +60,8 @@ def get_database_schema() -> str:
     return DATABASE_SCHEMA
 
 
-@tool
-def execute_sql_query(query: str) -> str:
+@tool(response_format="content_and_artifact")
+async def execute_sql_query(query: str) -> Tuple[str, Optional[QueryResult]]:
     """
     Execute a SQL SELECT query against the fretcoach database and return results.
 
@@ -71,7 +75,9 @@ def execute_sql_query(query: str) -> str:
         query (str): A complete SQL SELECT query to execute
 
     Returns:
-        str: Query results as a formatted string, or error message if query failed
+        str: Compact JSON with "columns" listed once and "rows" as arrays in
+            that column order (large results list only the first and last rows
+            plus a per-column "summary"), or an error message if the query failed
 
     Example:
         execute_sql_query(query="SELECT AVG(pitch_accuracy) as avg_pitch FROM fretcoach.sessions WHERE user_id = 'user123'")
@@ -79,44 +85,55 @@ def execute_sql_query(query: str) -> str:
     # Security check: only allow SELECT queries
     query_upper = query.strip().upper()
     if not query_upper.startswith("SELECT"):
-        return "Error: Only SELECT queries are allowed. No INSERT, UPDATE, DELETE, or DDL operations permitted."
+        return "Error: Only SELECT queries are allowed. No INSERT, UPDATE, DELETE, or DDL operations permitted.", None
 
     # Block dangerous SQL keywords
     dangerous_keywords = ["DROP", "TRUNCATE", "ALTER", "CREATE", "INSERT", "UPDATE", "DELETE", "GRANT", "REVOKE"]
     for keyword in dangerous_keywords:
         if keyword in query_upper:
-            return f"Error: Query contains forbidden keyword: {keyword}"
+            return f"Error: Query contains forbidden keyword: {keyword}", None
+
+    # Repeat questions are answered without touching the database
+    cache_key = query_cache.key(query)
+    cached = query_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = query_cache.generation(cache_key)
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                # Execute query
-                cursor.execute(query)
+        async with get_db_connection() as conn:
+            # Bound runtime for this transaction only
+            await conn.execute(
+                "SELECT set_config('statement_timeout', %s, true)", [str(SQL_TOOL_TIMEOUT_MS)]
+            )
 
-                # Fetch all results
-                results = cursor.fetchall()
+            # Server-side cursor: rows past the cap are never sent to us
+            async with conn.cursor(name="sql_tool_query") as cursor:
+                # DECLARE takes a single statement without the trailing semicolon
+                await cursor.execute(query.strip().rstrip(";"))
 
-                # Convert to list of dictionaries
-                data = [dict(row) for row in results]
+                # Fetch at most SQL_TOOL_MAX_ROWS (one extra to detect truncation)
+                results = await cursor.fetchmany(SQL_TOOL_MAX_ROWS + 1)
+                columns = [column.name for column in cursor.description or []]
 
-                # Convert datetime objects to ISO strings
-                for row in data:
-                    for key, value in row.items():
-                        if isinstance(value, datetime):
-                            row[key] = value.isoformat()
+        # Raw rows go to the router as the artifact; the LLM sees the compact encoding
+        rows = [tuple(to_json_value(value) for value in row) for row in results[:SQL_TOOL_MAX_ROWS]]
+        artifact = QueryResult(columns=columns, rows=rows, truncated=len(results) > SQL_TOOL_MAX_ROWS)
 
-                # Return formatted results
-                if len(data) == 0:
-                    return "Query executed successfully. No results found."
+        if not rows:
+            content = "Query executed successfully. No results found."
+        else:
+            content = encode_result(artifact)
 
-                return json.dumps({"success": True, "data": data, "row_count": len(data)}, indent=2)
+        query_cache.put(cache_key, (content, artifact), generation)
+        return content, artifact
 
     except Exception as e:
-        return f"Error executing query: {str(e)}"
+        return f"Error executing query: {str(e)}", None
 
 
 @tool
-def save_practice_plan(
+async def save_practice_plan(
     user_id: str,
     practice_plan: str,
     executed_session_id: Optional[str] = None
@@ -138,15 +155,16 @@ def save_practice_plan(
     try:
         practice_id = str(uuid.uuid4())
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
+        async with get_db_connection() as conn:
+            async with conn.cursor() as cursor:
                 query = """
                     INSERT INTO fretcoach.ai_practice_plans
                     (practice_id, user_id, practice_plan, executed_session_id)
                     VALUES (%s, %s, %s, %s)
                 """
-                cursor.execute(query, [practice_id, user_id, practice_plan, executed_session_id])
-                conn.commit()
+                await cursor.execute(query, [practice_id, user_id, practice_plan, executed_session_id])
+                await conn.commit()
+        query_cache.invalidate_user(user_id)
 
         return {
             "success": True,
@@ -0,0 +1,100 @@
+"""
+Compact encoding of SQL tool results
+The LLM gets a columnar JSON string (header once, rows as arrays, rounded
+numbers, summarized when large); the raw rows ride along as a QueryResult
+artifact on the ToolMessage so chart builders never re-parse the text.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List
+
+# Decimal places kept for floats shown to the LLM
+RESULT_DECIMALS = int(os.getenv("SQL_RESULT_DECIMALS", "3"))
+# Results with more rows than this are summarized instead of listed in full
+RESULT_SUMMARY_ROWS = int(os.getenv("SQL_RESULT_SUMMARY_ROWS", "50"))
+# Leading/trailing rows kept verbatim in a summarized result
+SUMMARY_HEAD_ROWS = 10
+SUMMARY_TAIL_ROWS = 5
+
+
+@dataclass(frozen=True)
+class QueryResult:
+    """
+    Raw rows of one execute_sql_query call (the tool's artifact).
+
+    Attributes:
+        columns: Column names in select order
+        rows: Row tuples with JSON-ready values (timestamps as ISO strings)
+        truncated: True if the row cap cut the result short
+    """
+    columns: List[str]
+    rows: List[tuple] = field(default_factory=list)
+    truncated: bool = False
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Rows as fresh dicts keyed by column name"""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert a database value to a JSON-serializable one"""
+    if isinstance(value, Decimal):
+        # NUMERIC results (e.g. SUM of an integer column) stay integral when they are
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _round(value: Any) -> Any:
+    return round(value, RESULT_DECIMALS) if isinstance(value, float) else value
+
+
+def _summarize_columns(result: QueryResult) -> Dict[str, Dict[str, Any]]:
+    """min/max/avg for numeric columns, min/max for ISO timestamps"""
+    summary = {}
+    for i, column in enumerate(result.columns):
+        values = [row[i] for row in result.rows if row[i] is not None]
+        if not values:
+            continue
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            summary[column] = {
+                "min": _round(min(values)),
+                "max": _round(max(values)),
+                "avg": _round(sum(values) / len(values)),
+            }
+        elif all(isinstance(v, str) and v[:4].isdigit() for v in values):
+            summary[column] = {"min": min(values), "max": max(values)}
+    return summary
+
+
+def encode_result(result: QueryResult) -> str:
+    """
+    Encode a result for the LLM context.
+
+    Args:
+        result: Rows to encode
+
+    Returns:
+        str: Compact JSON {"columns", "rows", "row_count"[, "truncated"]}; above
+            RESULT_SUMMARY_ROWS rows, only the first and last rows are listed and
+            "summary" carries per-column ranges and averages
+    """
+    rows = [[_round(value) for value in row] for row in result.rows]
+    payload: Dict[str, Any] = {"columns": result.columns, "row_count": len(rows)}
+
+    if len(rows) > RESULT_SUMMARY_ROWS:
+        payload["rows"] = rows[:SUMMARY_HEAD_ROWS] + rows[-SUMMARY_TAIL_ROWS:]
+        payload["rows_omitted"] = len(rows) - SUMMARY_HEAD_ROWS - SUMMARY_TAIL_ROWS
+        payload["summary"] = _summarize_columns(result)
+    else:
+        payload["rows"] = rows
+
+    if result.truncated:
+        payload["truncated"] = True
+    return json.dumps(payload, separators=(",", ":"))
@@ -1,4 +1,4 @@
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
 import { fetchSessions, type SessionsResponse } from '@/lib/api';
 
 export interface DateRangeFilter {
@@ -19,6 +19,25 @@ export function useSessions(
   });
 }
 
+/**
+ * Session history with keyset pagination: call fetchNextPage() to load older
+ * sessions. Aggregates are only returned with the first page.
+ */
+export function useInfiniteSessions(
+  userId: string = 'default_user',
+  pageSize: number = 20,
+  dateRange?: DateRangeFilter
+) {
+  return useInfiniteQuery<SessionsResponse>({
+    queryKey: ['sessions-history', userId, pageSize, dateRange?.startDate, dateRange?.endDate],
+    queryFn: ({ pageParam }) =>
+      fetchSessions(userId, pageSize, true, dateRange?.startDate, dateRange?.endDate, pageParam as string | undefined),
+    initialPageParam: undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+    staleTime: 30000,
+  });
+}
+
 export function useSessionAggregates(userId: string = 'default_user', dateRange?: DateRangeFilter) {
   const { data, isLoading, error } = useSessions(userId, 10, dateRange);
 
@@ -38,6 +38,16 @@ export interface SessionAggregates {
   scales_practiced: string[];
 }
 
+export interface SessionTrendPoint {
+  start_day: string;
+  end_day: string;
+  session_count: number;
+  total_practice_time: number;
+  avg_pitch_accuracy: number | null;
+  avg_scale_conformity: number | null;
+  avg_timing_stability: number | null;
+}
+
 export interface DateRange {
   start: string | null;
   end: string | null;
@@ -47,6 +57,8 @@ export interface SessionsResponse {
   success: boolean;
   sessions: Session[];
   aggregates: SessionAggregates | null;
+  next_cursor?: string | null;
+  trend?: SessionTrendPoint[];
   dateRange?: DateRange;
   error?: string;
 }
@@ -88,7 +100,9 @@ export async function fetchSessions(
   limit: number = 10,
   includeAggregates: boolean = true,
   startDate?: string,
-  endDate?: string
+  endDate?: string,
+  cursor?: string,
+  points?: number
 ): Promise<SessionsResponse> {
   try {
     const params = new URLSearchParams({
@@ -103,6 +117,12 @@ export async function fetchSessions(
     if (endDate) {
       params.append('end_date', endDate);
     }
+    if (cursor) {
+      params.append('cursor', cursor);
+    }
+    if (points) {
+      params.append('points', points.toString());
+    }
 
     const response = await fetch(`${API_BASE}/sessions?${params}`);
 